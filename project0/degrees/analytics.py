@@ -0,0 +1,330 @@
+"""
+Sampled degrees of separation statistics for a whole dataset.
+
+Answering every pair with shortest_path is out of the question, so sources
+are sampled and a full BFS from each of them measures the distance to
+everyone else. The BFS is bit-parallel: up to 64 sources are searched at
+once, with one integer bitmask per person recording which of the sources
+have reached them. A level of the search ORs the frontier masks of each
+movie's stars together and hands the result to every star, so one pass over
+the edges advances all the sources in the batch. Batches run on separate
+cores.
+
+Examples:
+    $ python analytics.py small
+    $ python analytics.py large --sources 1024 --workers 4 --json
+"""
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+
+from graph import CompactGraph
+
+# Number of sources searched together by multi_source_bfs
+BATCH_SIZE = 64
+
+# Graph searched by worker processes, set before they are forked
+_graph = None
+
+
+def multi_source_bfs(graph: CompactGraph, sources: list) -> list:
+    """Runs a breadth first search from several people at once.
+
+    Args:
+        graph (CompactGraph): Graph to search.
+        sources (list): Source person indexes, at most BATCH_SIZE of them.
+
+    Raises:
+        ValueError: If there are more than BATCH_SIZE sources.
+
+    Returns:
+        list: For every source, a histogram list whose entry d is the number
+        of people exactly d degrees away from it.
+    """
+    if len(sources) > BATCH_SIZE:
+        raise ValueError(f'At most {BATCH_SIZE} sources per search, '
+                         f'got {len(sources)}')
+    # seen[person] has bit i set once sources[i] has reached the person
+    seen = [0] * graph.num_people
+    # bits of the sources each movie's cast has already been reached from
+    movie_seen = {}
+    frontier = {}
+    for bit, source in enumerate(sources):
+        seen[source] |= 1 << bit
+        frontier[source] = frontier.get(source, 0) | 1 << bit
+    levels = [[1] * len(sources)]
+    while frontier:
+        movie_masks = {}
+        for person, mask in frontier.items():
+            for movie in graph.movies_of(person):
+                movie_masks[movie] = movie_masks.get(movie, 0) | mask
+        next_frontier = {}
+        for movie, mask in movie_masks.items():
+            # like the bipartite search, a cast is only walked once per source
+            mask &= ~movie_seen.get(movie, 0)
+            if not mask:
+                continue
+            movie_seen[movie] = movie_seen.get(movie, 0) | mask
+            for person in graph.stars_of(movie):
+                new = mask & ~seen[person]
+                if new:
+                    seen[person] |= new
+                    next_frontier[person] = next_frontier.get(person, 0) | new
+        if next_frontier:
+            levels.append(_bit_counts(next_frontier.values(), len(sources)))
+        frontier = next_frontier
+
+    histograms = []
+    for bit in range(len(sources)):
+        histogram = [counts[bit] for counts in levels]
+        while histogram[-1] == 0:
+            histogram.pop()
+        histograms.append(histogram)
+    return histograms
+
+
+def _bit_counts(masks, width: int) -> list:
+    """Counts how many masks have each bit set.
+
+    The counts are kept bit-sliced: planes[j] holds bit j of all width
+    counters, so adding a mask is a ripple-carry add over a few big
+    integers rather than a loop over its bits.
+
+    Args:
+        masks (iterable): Integer bitmasks.
+        width (int): Number of bit positions to count.
+
+    Returns:
+        list: Number of masks with bit i set, for every i below width.
+    """
+    planes = []
+    for carry in masks:
+        for j, plane in enumerate(planes):
+            planes[j] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    return [
+        sum(((plane >> bit) & 1) << j for j, plane in enumerate(planes))
+        for bit in range(width)
+    ]
+
+
+def sample_sources(graph: CompactGraph, count: int, seed: int = 0) -> list:
+    """Samples distinct people that starred in at least one movie.
+
+    Args:
+        graph (CompactGraph): Graph to sample from.
+        count (int): Number of sources, capped at the number of candidates.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        list: Person indexes.
+    """
+    offsets = graph.person_offsets
+    candidates = [
+        person for person in range(graph.num_people)
+        if offsets[person + 1] > offsets[person]
+    ]
+    return random.Random(seed).sample(candidates, min(count, len(candidates)))
+
+
+def _search_batch(sources: list) -> list:
+    return multi_source_bfs(_graph, sources)
+
+
+def separation_histograms(graph: CompactGraph,
+                          sources: list,
+                          workers: int = None) -> list:
+    """Runs a full BFS from every source, BATCH_SIZE sources at a time.
+
+    Batches are spread over forked worker processes, which share the graph
+    copy-on-write. Platforms without fork search in this process.
+
+    Args:
+        graph (CompactGraph): Graph to search.
+        sources (list): Source person indexes.
+        workers (int, optional): Number of worker processes. Defaults to the
+        number of CPUs.
+
+    Returns:
+        list: Distance histogram of every source, in the order of sources.
+    """
+    global _graph
+    batches = [
+        sources[i:i + BATCH_SIZE] for i in range(0, len(sources), BATCH_SIZE)
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(batches))
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return [
+            histogram for batch in batches
+            for histogram in multi_source_bfs(graph, batch)
+        ]
+
+    _graph = graph
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    try:
+        with context.Pool(workers) as pool:
+            results = pool.map(_search_batch, batches, chunksize=1)
+    finally:
+        gc.unfreeze()
+        _graph = None
+    return [histogram for batch in results for histogram in batch]
+
+
+def _confidence_interval(values: list, z: float) -> list:
+    """Normal approximation confidence interval for the mean of values."""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return [mean, mean]
+    margin = z * statistics.stdev(values) / math.sqrt(len(values))
+    return [mean - margin, mean + margin]
+
+
+def summarize(histograms: list, confidence: float = 0.95) -> dict:
+    """Estimates separation statistics from sampled distance histograms.
+
+    The mean separation is averaged over all reachable (source, person)
+    pairs, so it is a ratio estimate whose confidence interval comes from
+    the delta method. Pairs in different components are left out.
+
+    Args:
+        histograms (list): Distance histogram of every sampled source, as
+        returned by multi_source_bfs.
+        confidence (float, optional): Confidence level of the intervals.
+        Defaults to 0.95.
+
+    Returns:
+        dict: JSON-serialisable statistics: the pooled "histogram" of
+        distances, "pairs" reached, "mean_separation" and
+        "mean_eccentricity" with their intervals, the "max_eccentricity"
+        seen (a lower bound on the diameter) and the "effective_diameter",
+        the smallest distance within which 90% of the pairs lie.
+
+    Raises:
+        ValueError: If histograms is empty.
+    """
+    if not histograms:
+        raise ValueError('No sources to summarize')
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    pooled = [0] * max(len(histogram) for histogram in histograms)
+    reached = []
+    totals = []
+    for histogram in histograms:
+        for distance, count in enumerate(histogram):
+            pooled[distance] += count
+        reached.append(sum(histogram[1:]))
+        totals.append(
+            sum(distance * count for distance, count in enumerate(histogram)))
+    eccentricities = [len(histogram) - 1 for histogram in histograms]
+    pairs = sum(reached)
+
+    result = {
+        "sources": len(histograms),
+        "confidence": confidence,
+        "histogram": pooled,
+        "pairs": pairs,
+        "mean_separation": None,
+        "mean_separation_interval": None,
+        "mean_eccentricity": statistics.fmean(eccentricities),
+        "mean_eccentricity_interval": _confidence_interval(eccentricities, z),
+        "max_eccentricity": max(eccentricities),
+        "effective_diameter": None
+    }
+    if pairs == 0:
+        return result
+
+    mean = sum(totals) / pairs
+    margin = 0.0
+    if len(histograms) > 1:
+        # linearised ratio estimator: residuals of each source's total
+        # distance against what the pooled mean predicts
+        residuals = [t - mean * r for t, r in zip(totals, reached)]
+        mean_reached = pairs / len(histograms)
+        margin = z * statistics.stdev(residuals) / (
+            mean_reached * math.sqrt(len(histograms)))
+    result["mean_separation"] = mean
+    result["mean_separation_interval"] = [mean - margin, mean + margin]
+    cumulative = 0
+    for distance, count in enumerate(pooled[1:], start=1):
+        cumulative += count
+        if cumulative >= 0.9 * pairs:
+            result["effective_diameter"] = distance
+            break
+    return result
+
+
+def analyze(graph: CompactGraph,
+            sources: int = 256,
+            seed: int = 0,
+            workers: int = None,
+            confidence: float = 0.95) -> dict:
+    """Samples sources and summarizes the distances from them.
+
+    Args:
+        graph (CompactGraph): Graph to analyze.
+        sources (int, optional): Number of sources to sample. Defaults to 256.
+        seed (int, optional): Random seed. Defaults to 0.
+        workers (int, optional): Number of worker processes. Defaults to the
+        number of CPUs.
+        confidence (float, optional): Confidence level of the intervals.
+        Defaults to 0.95.
+
+    Returns:
+        dict: Result of summarize.
+    """
+    sampled = sample_sources(graph, sources, seed)
+    return summarize(separation_histograms(graph, sampled, workers),
+                     confidence)
+
+
+def main() -> None:
+    import degrees
+
+    parser = argparse.ArgumentParser(
+        description="Estimate degrees of separation statistics.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--sources", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers",
+                        type=int,
+                        help="worker processes, defaults to the number of "
+                        "CPUs")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--json",
+                        action="store_true",
+                        help="print the statistics as JSON")
+    args = parser.parse_args()
+
+    degrees.load_data(args.directory, "compact")
+    result = analyze(degrees.compact_graph(), args.sources, args.seed,
+                     args.workers, args.confidence)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    percent = round(result["confidence"] * 100)
+    print(f"{result['sources']} sources, {result['pairs']} pairs reached.")
+    for distance, count in enumerate(result["histogram"][1:], start=1):
+        print(f"{distance}: {count}")
+    if result["mean_separation"] is not None:
+        low, high = result["mean_separation_interval"]
+        print(f"Mean separation: {result['mean_separation']:.3f} "
+              f"({percent}% CI {low:.3f} to {high:.3f})")
+        print(f"Effective diameter (90%): {result['effective_diameter']}")
+    low, high = result["mean_eccentricity_interval"]
+    print(f"Mean eccentricity: {result['mean_eccentricity']:.3f} "
+          f"({percent}% CI {low:.3f} to {high:.3f})")
+    print(f"Diameter: at least {result['max_eccentricity']}")
+
+
+if __name__ == "__main__":
+    main()
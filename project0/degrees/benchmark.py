@@ -0,0 +1,371 @@
+"""
+Compares the memory footprint and query time of the degrees.py backends.
+
+With --json, every search strategy is timed on every backend and the
+results are written as JSON together with the commit they were measured
+on, so runs can be compared between commits. Pair it with synthetic.py to
+measure at scale. With --weighted, breadth first search is compared with
+the weighted (Dijkstra) searches on one backend.
+
+Examples:
+    $ python benchmark.py small
+    $ python benchmark.py large --queries 200
+    $ python synthetic.py synthetic --people 1000000 --movies 400000
+    $ python benchmark.py synthetic --queries 500 --json results.json
+    $ python benchmark.py synthetic --queries 100 --weighted compact
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import degrees
+
+
+def sample_pairs(directory: str, count: int, seed: int = 0) -> list:
+    """Samples random (source, target) person ID pairs from a dataset.
+
+    Args:
+        directory (str): Directory where data is stored.
+        count (int): Number of pairs to sample.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        list: List of (source, target) person ID pairs.
+    """
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        person_ids = [row["id"] for row in csv.DictReader(f)]
+    rng = random.Random(seed)
+    return [(rng.choice(person_ids), rng.choice(person_ids))
+            for _ in range(count)]
+
+
+def measure_backend(directory: str,
+                    backend: str,
+                    pairs: list,
+                    strategy: str = "bfs",
+                    use_snapshot: bool = False) -> dict:
+    """Loads a dataset with one backend and times a set of queries on it.
+
+    Args:
+        directory (str): Directory where data is stored.
+        backend (str): One of degrees.BACKENDS.
+        pairs (list): List of (source, target) person ID pairs to answer.
+        strategy (str, optional): Search strategy. Defaults to "bfs".
+        use_snapshot (bool, optional): Load from the snapshot file when it is
+        up to date, and write it otherwise. Defaults to False.
+
+    Returns:
+        dict: Load time, traced memory after loading, peak traced memory while
+        loading and per-query times in seconds.
+    """
+    result = measure_load(directory, backend, use_snapshot)
+    result["query_seconds"] = time_queries(pairs, strategy)
+    return result
+
+
+def measure_load(directory: str,
+                 backend: str,
+                 use_snapshot: bool = False) -> dict:
+    """Loads a dataset with one backend, tracing its memory use.
+
+    Args:
+        directory (str): Directory where data is stored.
+        backend (str): One of degrees.BACKENDS.
+        use_snapshot (bool, optional): Load from the snapshot file when it is
+        up to date, and write it otherwise. Defaults to False.
+
+    Returns:
+        dict: Load time, traced memory after loading and peak traced memory
+        while loading.
+    """
+    degrees.clear_data()
+    tracemalloc.start()
+    start = time.perf_counter()
+    degrees.load_data(directory, backend, use_snapshot)
+    load_seconds = time.perf_counter() - start
+    memory_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "load_seconds": load_seconds,
+        "memory_bytes": memory_bytes,
+        "peak_bytes": peak_bytes
+    }
+
+
+def time_queries(pairs: list, strategy: str = "bfs") -> list:
+    """Times shortest_path on every pair with the loaded data.
+
+    Args:
+        pairs (list): List of (source, target) person ID pairs to answer.
+        strategy (str, optional): Search strategy. Defaults to "bfs".
+
+    Returns:
+        list: Time taken by each query in seconds.
+    """
+    query_seconds = []
+    for source, target in pairs:
+        start = time.perf_counter()
+        degrees.shortest_path(source, target, strategy)
+        query_seconds.append(time.perf_counter() - start)
+    return query_seconds
+
+
+def time_neighbors(person_ids: list) -> list:
+    """Times neighbors_for_person on every person with the loaded data.
+
+    Args:
+        person_ids (list): Person IDs to look up.
+
+    Returns:
+        list: Time taken by each lookup in seconds.
+    """
+    lookup_seconds = []
+    for person_id in person_ids:
+        start = time.perf_counter()
+        degrees.neighbors_for_person(person_id)
+        lookup_seconds.append(time.perf_counter() - start)
+    return lookup_seconds
+
+
+def latency_summary(seconds: list) -> dict:
+    """Summarizes a list of latencies.
+
+    Args:
+        seconds (list): Latencies in seconds.
+
+    Returns:
+        dict: The count, and the mean, p50, p90, p99 and max in
+        milliseconds.
+    """
+    ordered = sorted(seconds)
+    summary = {"count": len(ordered)}
+    if not ordered:
+        return summary
+    summary["mean_ms"] = 1000 * statistics.fmean(ordered)
+    for percentile in (50, 90, 99):
+        index = min(len(ordered) - 1, len(ordered) * percentile // 100)
+        summary[f"p{percentile}_ms"] = 1000 * ordered[index]
+    summary["max_ms"] = 1000 * ordered[-1]
+    return summary
+
+
+def compare_backends(directory: str,
+                     queries: int = 100,
+                     seed: int = 0,
+                     strategy: str = "bfs",
+                     use_snapshot: bool = False) -> dict:
+    """Measures every backend on the same sample of queries.
+
+    Args:
+        directory (str): Directory where data is stored.
+        queries (int, optional): Number of random queries. Defaults to 100.
+        seed (int, optional): Random seed. Defaults to 0.
+        strategy (str, optional): Search strategy. Defaults to "bfs".
+        use_snapshot (bool, optional): Load from the snapshot file when it is
+        up to date, and write it otherwise. Defaults to False.
+
+    Returns:
+        dict: Maps backend name to the result of measure_backend.
+    """
+    pairs = sample_pairs(directory, queries, seed)
+    return {
+        backend: measure_backend(directory, backend, pairs, strategy,
+                                 use_snapshot)
+        for backend in degrees.BACKENDS
+    }
+
+
+def compare_weighted(directory: str,
+                     queries: int = 100,
+                     seed: int = 0,
+                     backend: str = "compact",
+                     use_snapshot: bool = False) -> dict:
+    """Times breadth first search and every weighted search on the same
+    sample of queries.
+
+    Args:
+        directory (str): Directory where data is stored.
+        queries (int, optional): Number of random queries. Defaults to 100.
+        seed (int, optional): Random seed. Defaults to 0.
+        backend (str, optional): One of degrees.BACKENDS. Defaults to
+        "compact".
+        use_snapshot (bool, optional): Load from the snapshot file when it is
+        up to date, and write it otherwise. Defaults to False.
+
+    Returns:
+        dict: Maps "bfs" and every weight name to a latency summary with the
+        mean degrees, nodes expanded and (for weights) path weight of the
+        connected pairs. Weighted searches are timed after their weight
+        array is built; "setup_seconds" records how long that took.
+    """
+    pairs = sample_pairs(directory, queries, seed)
+    degrees.clear_data()
+    degrees.load_data(directory, backend, use_snapshot)
+    searches = {"bfs": None}
+    searches.update({name: name for name in degrees.WEIGHTS})
+    results = {}
+    for name, weight in searches.items():
+        setup_seconds = 0.0
+        if weight is not None and degrees.graph is not None:
+            start = time.perf_counter()
+            degrees.movie_weights(degrees.WEIGHTS[weight])
+            setup_seconds = time.perf_counter() - start
+        query_seconds = []
+        lengths = []
+        costs = []
+        stats = degrees.SearchStats()
+        for source, target in pairs:
+            start = time.perf_counter()
+            if weight is None:
+                path = degrees.shortest_path(source, target, "bfs", stats)
+            else:
+                path = degrees.weighted_path(source, target, weight, stats)
+            query_seconds.append(time.perf_counter() - start)
+            if path is not None:
+                lengths.append(len(path))
+                if weight is not None:
+                    costs.append(degrees.path_cost(path, weight))
+        result = latency_summary(query_seconds)
+        result["setup_seconds"] = setup_seconds
+        result["expanded"] = stats.expanded / len(pairs) if pairs else 0
+        result["mean_degrees"] = statistics.fmean(lengths) if lengths else None
+        result["mean_weight"] = statistics.fmean(costs) if costs else None
+        results[name] = result
+    degrees.clear_data()
+    return results
+
+
+def _git_commit() -> str:
+    """Returns the commit checked out next to this file, or None."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True,
+                              text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(directory: str,
+              queries: int = 100,
+              seed: int = 0,
+              backends: tuple = degrees.BACKENDS,
+              use_snapshot: bool = False) -> dict:
+    """Measures loading, neighbor lookups and every strategy on every backend.
+
+    Args:
+        directory (str): Directory where data is stored.
+        queries (int, optional): Number of random queries. Defaults to 100.
+        seed (int, optional): Random seed. Defaults to 0.
+        backends (tuple, optional): Backends to measure. Defaults to
+        degrees.BACKENDS.
+        use_snapshot (bool, optional): Load from the snapshot file when it is
+        up to date, and write it otherwise. Defaults to False.
+
+    Returns:
+        dict: JSON-serialisable results. "environment" records the commit,
+        Python version and dataset; "backends" maps every backend to its
+        load measurements, a "neighbors" latency summary and a "strategies"
+        dict of latency summaries.
+    """
+    pairs = sample_pairs(directory, queries, seed)
+    results = {
+        "environment": {
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "directory": os.path.abspath(directory),
+            "queries": queries,
+            "seed": seed,
+            "use_snapshot": use_snapshot
+        },
+        "backends": {}
+    }
+    for backend in backends:
+        result = measure_load(directory, backend, use_snapshot)
+        results["environment"]["people"] = len(degrees.people)
+        results["environment"]["movies"] = len(degrees.movies)
+        result["neighbors"] = latency_summary(
+            time_neighbors(sorted({source for source, _ in pairs})))
+        result["strategies"] = {
+            strategy: latency_summary(time_queries(pairs, strategy))
+            for strategy in degrees.available_strategies()
+        }
+        results["backends"][backend] = result
+    degrees.clear_data()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the degrees.py storage backends.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategy",
+                        choices=sorted(degrees.STRATEGIES),
+                        default="bfs")
+    parser.add_argument("--snapshot",
+                        dest="use_snapshot",
+                        action="store_true",
+                        help="load from a snapshot file next to the CSV "
+                        "files, writing it first if needed")
+    parser.add_argument("--json",
+                        metavar="FILE",
+                        help="time every strategy and write the results as "
+                        "JSON to FILE (or - for stdout)")
+    parser.add_argument("--weighted",
+                        choices=degrees.BACKENDS,
+                        metavar="BACKEND",
+                        help="compare breadth first search with every "
+                        "weighted search on one backend")
+    args = parser.parse_args()
+
+    if args.weighted:
+        results = compare_weighted(args.directory, args.queries, args.seed,
+                                   args.weighted, args.use_snapshot)
+        print(f"{'search':<10}{'mean (ms)':>12}{'p99 (ms)':>12}"
+              f"{'expanded':>12}{'degrees':>10}{'setup (s)':>12}")
+        for name, result in results.items():
+            mean_degrees = result["mean_degrees"] or 0
+            print(f"{name:<10}{result.get('mean_ms', 0):>12.3f}"
+                  f"{result.get('p99_ms', 0):>12.3f}"
+                  f"{result['expanded']:>12.1f}{mean_degrees:>10.2f}"
+                  f"{result['setup_seconds']:>12.2f}")
+        return
+
+    if args.json:
+        results = run_suite(args.directory, args.queries, args.seed,
+                            use_snapshot=args.use_snapshot)
+        if args.json == "-":
+            print(json.dumps(results, indent=2))
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        return
+
+    results = compare_backends(args.directory, args.queries, args.seed,
+                               args.strategy, args.use_snapshot)
+    print(f"{'backend':<10}{'load (s)':>10}{'memory (MB)':>14}"
+          f"{'peak (MB)':>12}{'mean query (ms)':>18}")
+    for backend, result in results.items():
+        mean_query = statistics.mean(result["query_seconds"] or [0])
+        print(f"{backend:<10}{result['load_seconds']:>10.2f}"
+              f"{result['memory_bytes'] / 2**20:>14.1f}"
+              f"{result['peak_bytes'] / 2**20:>12.1f}"
+              f"{mean_query * 1000:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
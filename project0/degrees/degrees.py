@@ -1,7 +1,20 @@
+import argparse
 import csv
+import gc
+import itertools
+import json
+import math
+import multiprocessing
+import os
 import sys
+import time
+from array import array
 
-from util import Node, QueueFrontier
+import metadata
+import snapshot
+from graph import CompactGraph, ComponentIndex, DistanceTree, GraphBuilder
+from landmarks import LANDMARKS_FILE, LandmarkIndex
+from util import LRUCache, Node, PriorityFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,22 +25,119 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph holding the star edges when the compact backend is loaded. The
+# people and movies dicts then only hold metadata (no movies/stars sets).
+graph = None
 
-def load_data(directory: str) -> None:
-    """Load data from CSV files into memory.
+# Maps person_ids to a frozenset of (movie_id, person_id) co-star pairs with
+# one witness movie per co-star, when precomputed with build_adjacency
+adjacency = None
+
+# LRUCache of the same co-star sets computed on demand, see
+# enable_neighbor_cache
+neighbor_cache = None
+
+# CompactGraph built from the dict backend for the indexes that need dense
+# integer IDs, see compact_graph
+derived_graph = None
+
+# ComponentIndex used by shortest_path to reject disconnected pairs without
+# searching, see build_components
+components = None
+
+# LandmarkIndex used by the "landmark" strategy, see build_landmarks
+landmark_index = None
+
+# Release year of every compact_graph() movie index as an int array, and an
+# LRUCache of the excluded-movie bitmaps built from it, see constrained_path
+movie_years = None
+year_filters = LRUCache(16)
+
+# LRUCache of per-movie weight arrays keyed by weight function, see
+# weighted_path
+weight_tables = LRUCache(8)
+
+# LRUCache of DistanceMap/DistanceTree BFS trees keyed by source person,
+# bounded by their size in bytes, see enable_tree_cache
+tree_cache = None
+
+# Entry of movie_years for movies without a numeric year
+UNKNOWN_YEAR = -1
+
+# Age in years recency_weight gives movies without a numeric year
+RECENCY_UNKNOWN_AGE = 100
+
+# Storage backends accepted by load_data
+BACKENDS = ("dict", "compact", "lazy")
+
+# Snapshot string tables the lazy backend decodes
+LAZY_TABLES = ("person_ids", "movie_ids")
+
+# Name of the binary snapshot written next to the CSV files
+SNAPSHOT_FILE = "degrees.snapshot"
+
+
+def load_data(directory: str,
+              backend: str = "dict",
+              use_snapshot: bool = False) -> None:
+    """Load data from CSV files into memory, replacing any dataset loaded
+    before.
+
+    When use_snapshot is set, the parsed indexes are saved to a binary
+    snapshot next to the CSV files, and later calls load that snapshot
+    instead of parsing the CSVs as long as their sizes and modification
+    times are unchanged.
 
     Args:
         directory (str): Directory where data is stored.
+        backend (str, optional): "dict" stores the star edges as sets inside
+        people and movies, "compact" stores them in an integer-indexed CSR
+        graph. "lazy" is "compact" without names or titles in memory: people,
+        movies and names then read the CSV files on demand, see metadata.py.
+        Defaults to "dict".
+        use_snapshot (bool, optional): Read and write the snapshot cache.
+        Defaults to False.
+
+    Raises:
+        ValueError: If backend is not one of BACKENDS.
     """
+    global graph, names, people, movies
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown backend: {backend}')
+    compact = backend != "dict"
+    lazy = backend == "lazy"
+    builder = GraphBuilder() if compact else None
+    graph = None
+    if not lazy:
+        # a previous lazy load left LazyNames and LazyTable objects here
+        names, people, movies = {}, {}, {}
+    invalidate_caches()
+
+    if use_snapshot:
+        snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        sources = source_stats(directory)
+        cached = snapshot.read_snapshot(snapshot_path, sources,
+                                        LAZY_TABLES if lazy else None)
+        if (cached is not None and "component_labels" in cached[1]
+                and (not lazy or "person_rows" in cached[1])):
+            _load_snapshot(*cached, backend, directory)
+            return
+
+    if lazy:
+        _load_lazy(directory, builder)
+        if use_snapshot:
+            _save_snapshot(snapshot_path, sources, lazy=True)
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
+            people[row["id"]] = {"name": row["name"], "birth": row["birth"]}
+            if compact:
+                builder.add_person(row["id"])
+            else:
+                people[row["id"]]["movies"] = set()
             if row["name"].lower() not in names:
                 names[row["name"].lower()] = {row["id"]}
             else:
@@ -37,22 +147,493 @@ def load_data(directory: str) -> None:
     with open(f"{directory}/movies.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+            movies[row["id"]] = {"title": row["title"], "year": row["year"]}
+            if compact:
+                builder.add_movie(row["id"])
+            else:
+                movies[row["id"]]["stars"] = set()
 
     # Load stars
     with open(f"{directory}/stars.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
+            if compact:
+                builder.add_star(row["person_id"], row["movie_id"])
+                continue
             try:
                 people[row["person_id"]]["movies"].add(row["movie_id"])
                 movies[row["movie_id"]]["stars"].add(row["person_id"])
             except KeyError:
                 pass
 
+    if compact:
+        graph = builder.build()
+
+    if use_snapshot:
+        _save_snapshot(snapshot_path, sources)
+
+
+def _load_lazy(directory: str, builder: GraphBuilder) -> None:
+    """Loads the star edges and only the byte offsets of the other rows.
+
+    Args:
+        directory (str): Directory where data is stored.
+        builder (GraphBuilder): Empty builder for the graph.
+    """
+    global graph
+    rows = {}
+    for name, add in (("people", builder.add_person), ("movies",
+                                                        builder.add_movie)):
+        ids, offsets = metadata.row_offsets(f"{directory}/{name}.csv")
+        rows[name] = array(metadata.OFFSET_TYPE)
+        for row_id, offset in zip(ids, offsets):
+            index = add(row_id)
+            # a repeated ID keeps its first index and its last row, like the
+            # dict backend
+            if index == len(rows[name]):
+                rows[name].append(offset)
+            else:
+                rows[name][index] = offset
+
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            builder.add_star(row["person_id"], row["movie_id"])
+    graph = builder.build()
+    _attach_metadata(directory, graph, rows["people"], rows["movies"])
+
+
+def _attach_metadata(directory: str, edges: CompactGraph, person_rows,
+                     movie_rows) -> None:
+    """Points people, movies and names at the CSV files for the lazy
+    backend.
+
+    Args:
+        directory (str): Directory where data is stored.
+        edges (CompactGraph): The loaded graph.
+        person_rows (array): Byte offset of every person index's row.
+        movie_rows (array): Byte offset of every movie index's row.
+    """
+    global names, people, movies
+    people_file = metadata.CSVRows(f"{directory}/people.csv")
+    people = metadata.LazyTable(people_file, edges.person_index, person_rows)
+    movies = metadata.LazyTable(metadata.CSVRows(f"{directory}/movies.csv"),
+                                edges.movie_index, movie_rows)
+    names = metadata.LazyNames(people_file)
+
+
+def _row_offsets(directory: str, edges: CompactGraph) -> dict:
+    """Returns the byte offset of every person's and movie's CSV row,
+    aligned with the graph's indexes, for the lazy backend.
+
+    Args:
+        directory (str): Directory where data is stored.
+        edges (CompactGraph): The loaded graph.
+
+    Returns:
+        dict: "person_rows" and "movie_rows" offset arrays.
+    """
+    arrays = {}
+    for key, name, index in (("person_rows", "people", edges.person_index),
+                             ("movie_rows", "movies", edges.movie_index)):
+        arrays[key] = array(metadata.OFFSET_TYPE, [-1]) * len(index)
+        ids, offsets = metadata.row_offsets(f"{directory}/{name}.csv")
+        for row_id, offset in zip(ids, offsets):
+            if row_id in index:
+                arrays[key][index[row_id]] = offset
+    return arrays
+
+
+def source_stats(directory: str) -> dict:
+    """Returns the sizes and modification times of a dataset's CSV files.
+
+    Args:
+        directory (str): Directory where data is stored.
+
+    Returns:
+        dict: Result of snapshot.source_stats for the three CSV files.
+    """
+    return snapshot.source_stats([
+        f"{directory}/{name}.csv" for name in ("people", "movies", "stars")
+    ])
+
+
+def _save_snapshot(path: str, sources: dict, lazy: bool = False) -> None:
+    """Writes the loaded indexes to a snapshot file, if the directory allows.
+
+    The component labels are computed here, unless already known, so they
+    are cached with the data.
+
+    Args:
+        path (str): Snapshot file path.
+        sources (dict): Sizes and modification times of the CSV files.
+        lazy (bool, optional): Also store the CSV row offsets the lazy
+        backend needs, which takes another pass over the CSV files. Defaults
+        to False.
+    """
+    edges = compact_graph()
+    labels = components if components is not None else build_components()
+    person_names, person_births = _columns(people, edges.person_ids,
+                                           ("name", "birth"))
+    movie_titles, movie_years = _columns(movies, edges.movie_ids,
+                                         ("title", "year"))
+    tables = {
+        "person_ids": edges.person_ids,
+        "person_names": person_names,
+        "person_births": person_births,
+        "movie_ids": edges.movie_ids,
+        "movie_titles": movie_titles,
+        "movie_years": movie_years
+    }
+    arrays = {
+        "person_offsets": edges.person_offsets,
+        "person_movies": edges.person_movies,
+        "movie_offsets": edges.movie_offsets,
+        "movie_people": edges.movie_people,
+        "component_labels": labels.labels,
+        "component_sizes": labels.sizes
+    }
+    if lazy:
+        arrays.update(_row_offsets(os.path.dirname(path) or ".", edges))
+    try:
+        snapshot.write_snapshot(path, sources, tables, arrays)
+    except OSError:
+        # the snapshot is only a cache, read-only data directories are fine
+        pass
+
+
+def _columns(table, keys: list, fields: tuple) -> list:
+    """Returns the values of some fields of people or movies for many IDs."""
+    if isinstance(table, metadata.LazyTable):
+        # one pass over the CSV file instead of a read per row
+        return table.columns(keys, fields)
+    return [[table[key][field] for key in keys] for field in fields]
+
+
+def _load_snapshot(tables: dict, arrays: dict, backend: str,
+                   directory: str) -> None:
+    """Populates the indexes from a snapshot instead of the CSV files.
+
+    The CSR arrays and component labels stay memory-mapped; the dict backend
+    rebuilds its sets from the CSR arrays.
+
+    Args:
+        tables (dict): String tables read from the snapshot.
+        arrays (dict): Integer arrays read from the snapshot.
+        backend (str): One of BACKENDS.
+        directory (str): Directory where data is stored.
+    """
+    global graph, derived_graph, components
+    person_ids = tables["person_ids"]
+    movie_ids = tables["movie_ids"]
+    if backend == "lazy":
+        graph = CompactGraph(person_ids, movie_ids, arrays["person_offsets"],
+                             arrays["person_movies"], arrays["movie_offsets"],
+                             arrays["movie_people"])
+        components = ComponentIndex(arrays["component_labels"],
+                                    arrays["component_sizes"],
+                                    graph.person_index)
+        _attach_metadata(directory, graph, arrays["person_rows"],
+                         arrays["movie_rows"])
+        return
+    for person_id, name, birth in zip(person_ids, tables["person_names"],
+                                      tables["person_births"]):
+        people[person_id] = {"name": name, "birth": birth}
+        names.setdefault(name.lower(), set()).add(person_id)
+    for movie_id, title, year in zip(movie_ids, tables["movie_titles"],
+                                     tables["movie_years"]):
+        movies[movie_id] = {"title": title, "year": year}
+
+    edges = CompactGraph(person_ids, movie_ids, arrays["person_offsets"],
+                         arrays["person_movies"], arrays["movie_offsets"],
+                         arrays["movie_people"])
+    components = ComponentIndex(arrays["component_labels"],
+                                arrays["component_sizes"], edges.person_index)
+    if backend == "compact":
+        graph = edges
+        return
+    derived_graph = edges
+    for person, person_id in enumerate(person_ids):
+        people[person_id]["movies"] = {
+            movie_ids[movie]
+            for movie in edges.movies_of(person)
+        }
+    for movie, movie_id in enumerate(movie_ids):
+        movies[movie_id]["stars"] = {
+            person_ids[person]
+            for person in edges.stars_of(movie)
+        }
+
+
+def _read_delta(directory: str, name: str) -> list:
+    """Returns the rows of one delta CSV file, or [] if it is missing."""
+    path = os.path.join(directory, f"{name}.csv")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def _append_rows(path: str, fields: list, rows: list) -> None:
+    """Appends rows to a CSV file, starting on a fresh line."""
+    with open(path, "rb") as f:
+        needs_newline = False
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) not in b"\r\n"
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        if needs_newline:
+            f.write("\n")
+        writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        writer.writerows(rows)
+
+
+def apply_delta(delta_directory: str, directory: str = None) -> dict:
+    """Adds new people, movies and stars to the loaded data without
+    reloading it.
+
+    The delta directory holds any of people.csv, movies.csv and stars.csv in
+    the usual format. Rows for people or movies that are already loaded are
+    skipped, as are stars that are already recorded or name unknown IDs.
+    Derived indexes are patched rather than rebuilt: the compact graph is
+    extended in place of a reload, component labels are merged, and only the
+    precomputed or cached co-stars of people in changed movies are
+    recomputed. Cached BFS trees are dropped for the components that
+    changed. The landmark index cannot be patched and is discarded, and the
+    movie years used by constrained_path are rebuilt on next use.
+
+    Args:
+        delta_directory (str): Directory with the delta CSV files.
+        directory (str, optional): Directory the data was loaded from. When
+        given, the accepted rows are appended to its CSV files and its
+        snapshot, if any, is rewritten from memory. Defaults to None.
+
+    Returns:
+        dict: Number of people, movies and stars added.
+    """
+    global graph, derived_graph, components, landmark_index, movie_years
+    # an ID repeated in a delta file keeps its first row
+    added_people = []
+    seen = set()
+    for row in _read_delta(delta_directory, "people"):
+        if row["id"] not in people and row["id"] not in seen:
+            seen.add(row["id"])
+            added_people.append(row)
+    for row in added_people:
+        people[row["id"]] = {"name": row["name"], "birth": row["birth"]}
+        if graph is None:
+            people[row["id"]]["movies"] = set()
+        names.setdefault(row["name"].lower(), set()).add(row["id"])
+    added_movies = []
+    seen = set()
+    for row in _read_delta(delta_directory, "movies"):
+        if row["id"] not in movies and row["id"] not in seen:
+            seen.add(row["id"])
+            added_movies.append(row)
+    for row in added_movies:
+        movies[row["id"]] = {"title": row["title"], "year": row["year"]}
+        if graph is None:
+            movies[row["id"]]["stars"] = set()
+
+    # the integer-indexed graph, if any, is extended rather than rebuilt;
+    # new people and movies are numbered after the existing ones
+    edges = graph if graph is not None else derived_graph
+    if edges is not None:
+        person_index = {
+            row["id"]: edges.num_people + i
+            for i, row in enumerate(added_people)
+        }
+        movie_index = {
+            row["id"]: edges.num_movies + i
+            for i, row in enumerate(added_movies)
+        }
+    added_stars = []
+    index_pairs = []
+    seen = set()
+    for row in _read_delta(delta_directory, "stars"):
+        person_id, movie_id = row["person_id"], row["movie_id"]
+        if person_id not in people or movie_id not in movies:
+            continue
+        if graph is not None:
+            person = graph.person_index.get(person_id)
+            movie = graph.movie_index.get(movie_id)
+            # new people and movies have no edges in the graph yet
+            known = (person is not None and movie is not None
+                     and movie in graph.movies_of(person))
+            if known or (person_id, movie_id) in seen:
+                continue
+            seen.add((person_id, movie_id))
+        elif movie_id in people[person_id]["movies"]:
+            continue
+        else:
+            people[person_id]["movies"].add(movie_id)
+            movies[movie_id]["stars"].add(person_id)
+        if edges is not None:
+            person = edges.person_index.get(person_id)
+            movie = edges.movie_index.get(movie_id)
+            index_pairs.append(
+                (person_index[person_id] if person is None else person,
+                 movie_index[movie_id] if movie is None else movie))
+        added_stars.append(row)
+
+    if edges is not None:
+        edges = edges.extended([row["id"] for row in added_people],
+                               [row["id"] for row in added_movies],
+                               index_pairs)
+        if graph is not None:
+            graph = edges
+        else:
+            derived_graph = edges
+        if components is not None:
+            components = components.extended(
+                edges, sorted({movie for _, movie in index_pairs}))
+    else:
+        components = None
+
+    # people whose co-stars changed: everyone in a movie that gained stars
+    changed_movie_ids = {row["movie_id"] for row in added_stars}
+    changed_people = set()
+    for movie_id in changed_movie_ids:
+        if graph is not None:
+            changed_people.update(edges.person_ids[person] for person in
+                                  edges.stars_of(edges.movie_index[movie_id]))
+        else:
+            changed_people.update(movies[movie_id]["stars"])
+    if adjacency is not None:
+        for person_id in changed_people:
+            adjacency[person_id] = co_stars(person_id)
+        for row in added_people:
+            adjacency.setdefault(row["id"], frozenset())
+    if neighbor_cache is not None:
+        for person_id in changed_people:
+            neighbor_cache.pop(person_id)
+    if tree_cache is not None:
+        if components is None:
+            tree_cache.clear()
+        else:
+            changed_labels = {
+                components.label(person_id)
+                for person_id in changed_people
+            }
+            for source in list(tree_cache.entries):
+                if components.label(source) in changed_labels:
+                    tree_cache.pop(source)
+    landmark_index = None
+    movie_years = None
+    year_filters.clear()
+    weight_tables.clear()
+
+    if directory is not None:
+        _append_rows(f"{directory}/people.csv", ["id", "name", "birth"],
+                     added_people)
+        _append_rows(f"{directory}/movies.csv", ["id", "title", "year"],
+                     added_movies)
+        _append_rows(f"{directory}/stars.csv", ["person_id", "movie_id"],
+                     added_stars)
+        snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            _save_snapshot(snapshot_path, source_stats(directory),
+                           isinstance(people, metadata.LazyTable))
+    return {
+        "people": len(added_people),
+        "movies": len(added_movies),
+        "stars": len(added_stars)
+    }
+
+
+def clear_data() -> None:
+    """Forgets any previously loaded dataset."""
+    global names, people, movies, graph
+    names = {}
+    people = {}
+    movies = {}
+    graph = None
+    invalidate_caches()
+
+
+def invalidate_caches() -> None:
+    """Drops every index derived from the loaded dataset."""
+    global adjacency, derived_graph, components, landmark_index, movie_years
+    adjacency = None
+    derived_graph = None
+    components = None
+    landmark_index = None
+    movie_years = None
+    year_filters.clear()
+    weight_tables.clear()
+    if neighbor_cache is not None:
+        neighbor_cache.clear()
+    if tree_cache is not None:
+        tree_cache.clear()
+
+
+def compact_graph() -> CompactGraph:
+    """Returns the loaded data as a CompactGraph.
+
+    With the compact backend this is the loaded graph itself. With the dict
+    backend it is built from people and movies on first use and kept until
+    the data changes.
+
+    Returns:
+        CompactGraph: Integer-indexed view of the loaded star edges.
+    """
+    global derived_graph
+    if graph is not None:
+        return graph
+    if derived_graph is None:
+        derived_graph = CompactGraph.from_dicts(people, movies)
+    return derived_graph
+
+
+def build_components() -> ComponentIndex:
+    """Labels the connected components of the loaded data.
+
+    load_data does this automatically when it writes or reads a snapshot.
+    Afterwards shortest_path answers pairs in different components without
+    searching.
+
+    Returns:
+        ComponentIndex: The component labels and sizes.
+    """
+    global components
+    components = ComponentIndex.build(compact_graph())
+    return components
+
+
+def build_landmarks(k: int = 16, selection: str = "farthest") -> LandmarkIndex:
+    """Builds a landmark index over the loaded data for the "landmark"
+    strategy.
+
+    Args:
+        k (int, optional): Number of landmarks. Defaults to 16.
+        selection (str, optional): One of landmarks.SELECTIONS. Defaults to
+        "farthest".
+
+    Returns:
+        LandmarkIndex: The index.
+    """
+    global landmark_index
+    landmark_index = LandmarkIndex.build(compact_graph(), k, selection)
+    return landmark_index
+
+
+def load_landmarks(directory: str, path: str = None) -> LandmarkIndex:
+    """Loads a landmark index written by landmarks.py for the "landmark"
+    strategy.
+
+    Args:
+        directory (str): Directory the data was loaded from.
+        path (str, optional): Index file. Defaults to LANDMARKS_FILE inside
+        directory.
+
+    Returns:
+        LandmarkIndex: The index, or None if it is missing or stale.
+    """
+    global landmark_index
+    path = path or os.path.join(directory, LANDMARKS_FILE)
+    landmark_index = LandmarkIndex.load(path, compact_graph(),
+                                        source_stats(directory))
+    return landmark_index
+
 
 def person_id_for_name(name: str) -> int:
     """Returns the IMDB id for a person's name, resolving ambiguities as needed.
@@ -84,17 +665,77 @@ def person_id_for_name(name: str) -> int:
         return person_ids[0]
 
 
-def neighbors_for_person(person_id: int) -> set:
+def candidate_ids(query: str) -> list:
+    """Returns every person ID a query could refer to, without prompting.
+
+    Args:
+        query (str): Person ID or (case-insensitive) name.
+
+    Returns:
+        list: Matching person IDs, sorted.
+    """
+    if query in people:
+        return [query]
+    return sorted(names.get(query.lower(), set()))
+
+
+class SearchStats():
+    def __init__(self) -> None:
+        """Counters describing how much work a single search performed."""
+        self.expanded = 0
+        self.generated = 0
+        # movies whose star set was walked, and walks avoided because the
+        # movie had already been walked in the same search
+        self.cast_scans = 0
+        self.cast_scans_skipped = 0
+
+
+def neighbors_for_person(person_id: int, stats: SearchStats = None) -> set:
     """Returns (movie_id, person_id) pairs for people who starred with a given 
     person.
 
+    With a precomputed adjacency or neighbor cache enabled, the result holds
+    one witness movie per co-star instead of every shared movie.
+
+    Args:
+        person_id (int): Person ID.
+        stats (SearchStats, optional): Counters to update with the cast scans
+        performed. Defaults to None.
+
+    Returns:
+        set: Set of neighbors.
+    """
+    if adjacency is not None:
+        return adjacency[person_id]
+    if neighbor_cache is not None:
+        neighbors = neighbor_cache.get(person_id)
+        if neighbors is None:
+            neighbors = co_stars(person_id, stats)
+            neighbor_cache.put(person_id, neighbors)
+        return neighbors
+    return _scan_neighbors(person_id, stats)
+
+
+def _scan_neighbors(person_id: int, stats: SearchStats = None) -> set:
+    """Returns every (movie_id, person_id) pair from the loaded edges.
+
     Args:
         person_id (int): Person ID.
+        stats (SearchStats, optional): Counters to update with the cast scans
+        performed. Defaults to None.
 
     Returns:
         set: Set of neighbors.
     """
+    if graph is not None:
+        neighbors = graph.neighbors_for_person(person_id)
+        if stats is not None:
+            stats.cast_scans += len(
+                graph.movies_of(graph.person_index[person_id]))
+        return neighbors
     movie_ids = people[person_id]["movies"]
+    if stats is not None:
+        stats.cast_scans += len(movie_ids)
     neighbors = set()
     for movie_id in movie_ids:
         for person_id in movies[movie_id]["stars"]:
@@ -102,6 +743,58 @@ def neighbors_for_person(person_id: int) -> set:
     return neighbors
 
 
+def co_stars(person_id: int, stats: SearchStats = None) -> frozenset:
+    """Returns each co-star of a person once, with one witness movie.
+
+    Args:
+        person_id (int): Person ID.
+        stats (SearchStats, optional): Counters to update with the cast scans
+        performed. Defaults to None.
+
+    Returns:
+        frozenset: Set of (movie_id, person_id) pairs, excluding the person.
+    """
+    witness = {}
+    for movie_id, neighbor_id in _scan_neighbors(person_id, stats):
+        if neighbor_id != person_id:
+            witness.setdefault(neighbor_id, movie_id)
+    return frozenset(
+        (movie_id, neighbor_id) for neighbor_id, movie_id in witness.items())
+
+
+def build_adjacency() -> None:
+    """Precomputes the co-stars of every loaded person.
+
+    Afterwards neighbors_for_person is a single dict lookup. Call it after
+    load_data; loading new data discards the adjacency.
+    """
+    global adjacency
+    adjacency = {person_id: co_stars(person_id) for person_id in people}
+
+
+def enable_neighbor_cache(maxsize: int = 10000) -> LRUCache:
+    """Caches co-stars on demand for at most maxsize people.
+
+    This is the low-memory alternative to build_adjacency: only recently
+    expanded people are kept, and the cache counts its hits and misses.
+
+    Args:
+        maxsize (int, optional): Number of people to keep. Defaults to 10000.
+
+    Returns:
+        LRUCache: The cache, whose info() reports hits and misses.
+    """
+    global neighbor_cache
+    neighbor_cache = LRUCache(maxsize)
+    return neighbor_cache
+
+
+def disable_neighbor_cache() -> None:
+    """Stops caching co-stars on demand."""
+    global neighbor_cache
+    neighbor_cache = None
+
+
 def get_path(node: Node) -> list:
     """Utility function to follow the linked list back to the source node.
 
@@ -124,7 +817,10 @@ def get_path(node: Node) -> list:
     return path
 
 
-def shortest_path(source: int, target: int) -> list:
+def shortest_path(source: int,
+                  target: int,
+                  strategy: str = "bfs",
+                  stats: SearchStats = None) -> list:
     """ Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
@@ -133,11 +829,47 @@ def shortest_path(source: int, target: int) -> list:
     Args:
         source (int): Source state.
         target (int): Target state.
+        strategy (str, optional): Name of the search strategy to use, one of
+        STRATEGIES. Defaults to "bfs". Ignored while the tree cache is
+        enabled.
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Raises:
+        ValueError: If strategy is not a known search strategy.
 
     Returns:
         list: List of (movie_id, person_id) pairs along the path back to the 
         source node.
     """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown search strategy: {strategy}')
+    if (components is not None and source != target
+            and not components.connected(source, target)):
+        return None
+    if tree_cache is not None:
+        return cached_tree_search(source, target, stats)
+    # the compact graph runs its own strategies directly on integer indexes
+    if graph is not None and strategy in graph.strategies:
+        return graph.shortest_path(source, target, strategy, stats)
+    return STRATEGIES[strategy](source, target, stats)
+
+
+def breadth_first_search(source: int,
+                         target: int,
+                         stats: SearchStats = None) -> list:
+    """Single-ended breadth first search from the source to the target.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
     node = Node(source, None, None)
     # return path if the node is the target node (case when source == target)
     if node.state == target:
@@ -151,7 +883,10 @@ def shortest_path(source: int, target: int) -> list:
     while not frontier.empty():
         node = frontier.remove()
         visited.add(node.state)
-        neighbors = neighbors_for_person(node.state)
+        neighbors = neighbors_for_person(node.state, stats)
+        if stats is not None:
+            stats.expanded += 1
+            stats.generated += len(neighbors)
         for neighbor in neighbors:
             # expand the node if not already visited and not in frontier
             if (neighbor[1] not in visited) and (not frontier.contains_state(
@@ -165,11 +900,938 @@ def shortest_path(source: int, target: int) -> list:
     return None
 
 
-def main(directory):
+def bidirectional_search(source: int,
+                         target: int,
+                         stats: SearchStats = None) -> list:
+    """Breadth first search grown from both the source and the target.
+
+    Each iteration expands one complete layer of whichever frontier is
+    smaller. Because every newly discovered person is checked against the
+    other side's visited set, the two visited sets stay disjoint until the
+    first meeting, which guarantees the joined path is a shortest one.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
+    if source == target:
+        return []
+    # map each visited person to the (movie_id, person_id) that discovered it
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = _expand_layer(forward_frontier,
+                                                      forward, backward,
+                                                      stats)
+        else:
+            backward_frontier, meeting = _expand_layer(backward_frontier,
+                                                       backward, forward,
+                                                       stats)
+        if meeting is not None:
+            return _join_paths(meeting, forward, backward)
+    # one side ran out of people to expand, no path found
+    return None
+
+
+def _expand_layer(frontier: list, parents: dict, other_parents: dict,
+                  stats: SearchStats) -> tuple:
+    """Expands every person in one frontier layer of a bidirectional search.
+
+    Args:
+        frontier (list): Person IDs in the layer being expanded.
+        parents (dict): Visited map for the side being expanded.
+        other_parents (dict): Visited map for the opposite side.
+        stats (SearchStats): Counters to update, may be None.
+
+    Returns:
+        tuple: The next frontier layer and the meeting person ID (or None).
+    """
+    next_frontier = []
+    for person_id in frontier:
+        neighbors = neighbors_for_person(person_id, stats)
+        if stats is not None:
+            stats.expanded += 1
+            stats.generated += len(neighbors)
+        for movie_id, neighbor_id in neighbors:
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id)
+            if neighbor_id in other_parents:
+                return next_frontier, neighbor_id
+            next_frontier.append(neighbor_id)
+    return next_frontier, None
+
+
+def _join_paths(meeting: int, forward: dict, backward: dict) -> list:
+    """Joins the two halves of a bidirectional search at the meeting person.
+
+    Args:
+        meeting (int): Person ID reached from both the source and the target.
+        forward (dict): Visited map grown from the source.
+        backward (dict): Visited map grown from the target.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs from source to target.
+    """
+    path = _trace_parents(meeting, forward)
+
+    # in the backward map the "parent" is the next person towards the target
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def _trace_parents(person_id: int, parents: dict) -> list:
+    """Follows a visited map from a person back to the search root.
+
+    Args:
+        person_id (int): Person ID to start from.
+        parents (dict): Maps person IDs to their (movie_id, parent_id), with
+        the root mapped to None.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs from the root to person_id.
+    """
+    path = []
+    while parents[person_id] is not None:
+        movie_id, parent_id = parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+    return path
+
+
+def bipartite_search(source: int,
+                     target: int,
+                     stats: SearchStats = None) -> list:
+    """Breadth first search over the person/movie graph that visits movies.
+
+    The first person to reach a movie walks its whole star set, which puts
+    every star at their final BFS depth. Any later person reaching the same
+    movie would only find people that are already visited, so each movie's
+    star set is walked at most once per search.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
+    if source == target:
+        return []
+    parents = {source: None}
+    visited_movies = set()
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for person_id in frontier:
+            if stats is not None:
+                stats.expanded += 1
+            for movie_id in people[person_id]["movies"]:
+                if movie_id in visited_movies:
+                    if stats is not None:
+                        stats.cast_scans_skipped += 1
+                    continue
+                visited_movies.add(movie_id)
+                stars = movies[movie_id]["stars"]
+                if stats is not None:
+                    stats.cast_scans += 1
+                    stats.generated += len(stars)
+                for neighbor_id in stars:
+                    if neighbor_id in parents:
+                        continue
+                    parents[neighbor_id] = (movie_id, person_id)
+                    if neighbor_id == target:
+                        return _trace_parents(target, parents)
+                    next_frontier.append(neighbor_id)
+        frontier = next_frontier
+    return None
+
+
+def landmark_search(source: int,
+                    target: int,
+                    stats: SearchStats = None) -> list:
+    """Goal-directed search guided by the loaded landmark index.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Raises:
+        ValueError: If no landmark index has been built or loaded.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
+    if landmark_index is None:
+        raise ValueError('The landmark strategy needs build_landmarks or '
+                         'load_landmarks first')
+    edges = compact_graph()
+    path = landmark_index.shortest_path(edges.person_index[source],
+                                        edges.person_index[target], stats)
+    return edges.path_ids(path)
+
+
+def distance_bounds(source: int, target: int) -> tuple:
+    """Estimates the degrees of separation from the landmark index in O(K).
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+
+    Raises:
+        ValueError: If no landmark index has been built or loaded.
+
+    Returns:
+        tuple: (lower, upper) as returned by LandmarkIndex.bounds.
+    """
+    if landmark_index is None:
+        raise ValueError('Distance bounds need build_landmarks or '
+                         'load_landmarks first')
+    edges = compact_graph()
+    return landmark_index.bounds(edges.person_index[source],
+                                 edges.person_index[target])
+
+
+def build_movie_years() -> array:
+    """Parses the year of every movie into an int array.
+
+    The array is aligned with the movie indexes of compact_graph(), so a
+    year filter becomes a single pass over it. Movies without a numeric year
+    get UNKNOWN_YEAR.
+
+    Returns:
+        array: Year of every movie index.
+    """
+    global movie_years
+    edges = compact_graph()
+    movie_years = array("i", [UNKNOWN_YEAR]) * edges.num_movies
+    for movie, movie_id in enumerate(edges.movie_ids):
+        year = movies[movie_id]["year"]
+        if year.isdigit():
+            movie_years[movie] = int(year)
+    return movie_years
+
+
+def excluded_movies(min_year: int = None, max_year: int = None) -> bytearray:
+    """Returns a bitmap of the movies outside a range of years.
+
+    Bitmaps are cached, so repeated queries over the same years do not pay
+    for building them again.
+
+    Args:
+        min_year (int, optional): Earliest allowed year. Defaults to None.
+        max_year (int, optional): Latest allowed year. Defaults to None.
+
+    Returns:
+        bytearray: 1 for every compact_graph() movie index outside the range
+        (including movies of unknown year), 0 otherwise.
+    """
+    key = (min_year, max_year)
+    bitmap = year_filters.get(key)
+    if bitmap is not None:
+        return bitmap
+    years = movie_years if movie_years is not None else build_movie_years()
+    low = UNKNOWN_YEAR + 1 if min_year is None else min_year
+    high = sys.maxsize if max_year is None else max_year
+    bitmap = bytearray(not low <= year <= high for year in years)
+    year_filters.put(key, bitmap)
+    return bitmap
+
+
+def constrained_path(source: int,
+                     target: int,
+                     min_year: int = None,
+                     max_year: int = None,
+                     exclude: list = (),
+                     stats: SearchStats = None) -> list:
+    """Finds a shortest path that only uses movies released in a range of
+    years and never goes through the excluded people.
+
+    The constraints are turned into an excluded-movie bitmap and a list of
+    excluded person indexes before the search starts, and the bipartite
+    search treats both as already visited. shortest_path itself is not
+    affected.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        min_year (int, optional): Earliest allowed year. Defaults to None.
+        max_year (int, optional): Latest allowed year. Defaults to None.
+        exclude (list, optional): Person IDs the path may not go through.
+        Defaults to ().
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Raises:
+        ValueError: If an excluded person is not loaded.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
+    edges = compact_graph()
+    excluded_people = []
+    for person_id in exclude:
+        if person_id not in edges.person_index:
+            raise ValueError(f'Unknown person: {person_id}')
+        excluded_people.append(edges.person_index[person_id])
+    # constraints only remove edges, so disconnected pairs stay disconnected
+    if (components is not None and source != target
+            and not components.connected(source, target)):
+        return None
+    bitmap = None
+    if min_year is not None or max_year is not None:
+        bitmap = excluded_movies(min_year, max_year)
+    path = edges.bipartite_search(edges.person_index[source],
+                                  edges.person_index[target], stats, bitmap,
+                                  excluded_people)
+    return edges.path_ids(path)
+
+
+def cast_size(movie_id: int) -> int:
+    """Returns the number of people that starred in a movie."""
+    if graph is not None:
+        return len(graph.stars_of(graph.movie_index[movie_id]))
+    return len(movies[movie_id]["stars"])
+
+
+def unit_weight(movie_id: int) -> float:
+    """Every movie costs 1, so the cheapest path is a shortest path."""
+    return 1.0
+
+
+def cast_weight(movie_id: int) -> float:
+    """Movies cost the log of their cast size, favouring small casts whose
+    members are more likely to actually know each other. A two person movie
+    costs 1, a cast of 64 costs 6."""
+    return math.log2(max(2, cast_size(movie_id)))
+
+
+def recency_weight(movie_id: int, reference_year: int = None) -> float:
+    """Movies cost 1 plus a tenth of their age in years, favouring recent
+    films. Movies without a numeric year are costed as RECENCY_UNKNOWN_AGE
+    years old.
+
+    Ages are counted up to the current calendar year by default, so the
+    same query can cost differently once the year changes. Pass
+    functools.partial(recency_weight, reference_year=...) to weighted_path
+    for weights that do not change.
+
+    Args:
+        movie_id (int): Movie ID.
+        reference_year (int, optional): Year ages are counted up to.
+        Defaults to None, which is the current year.
+
+    Returns:
+        float: Weight of the movie.
+    """
+    if reference_year is None:
+        reference_year = time.localtime().tm_year
+    year = movies[movie_id]["year"]
+    if year.isdigit():
+        age = max(0, reference_year - int(year))
+    else:
+        age = RECENCY_UNKNOWN_AGE
+    return 1 + age / 10
+
+
+# Maps weight names accepted by weighted_path to movie weight functions
+WEIGHTS = {
+    "unit": unit_weight,
+    "cast": cast_weight,
+    "recency": recency_weight,
+}
+
+
+def movie_weights(weight) -> array:
+    """Evaluates a weight function on every movie into a double array.
+
+    The array is aligned with the movie indexes of compact_graph() and
+    cached per weight function, like the year filters.
+
+    Args:
+        weight (callable): Function of a movie ID returning a non-negative
+        weight.
+
+    Returns:
+        array: Weight of every movie index.
+    """
+    weights = weight_tables.get(weight)
+    if weights is None:
+        edges = compact_graph()
+        weights = array("d", (weight(movie_id) for movie_id in edges.movie_ids))
+        weight_tables.put(weight, weights)
+    return weights
+
+
+def weighted_path(source: int,
+                  target: int,
+                  weight="cast",
+                  stats: SearchStats = None) -> list:
+    """Finds the cheapest path when going through a movie costs its weight.
+
+    The compact backends run Dijkstra's algorithm on the integer graph with
+    a precomputed weight array. The dict backend runs dijkstra_search on the
+    person IDs directly.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        weight (optional): Name of one of WEIGHTS, or a function of a movie
+        ID returning a non-negative weight. Defaults to "cast".
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Raises:
+        ValueError: If weight is not a known weight name.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
+    if not callable(weight):
+        if weight not in WEIGHTS:
+            raise ValueError(f'Unknown weight: {weight}')
+        weight = WEIGHTS[weight]
+    if (components is not None and source != target
+            and not components.connected(source, target)):
+        return None
+    if graph is None:
+        return dijkstra_search(source, target, weight, stats)
+    path = graph.weighted_search(graph.person_index[source],
+                                 graph.person_index[target],
+                                 movie_weights(weight), stats)
+    return graph.path_ids(path)
+
+
+def dijkstra_search(source: int,
+                    target: int,
+                    weight=unit_weight,
+                    stats: SearchStats = None) -> list:
+    """Dijkstra's algorithm over the loaded people and movies.
+
+    Every shared movie is considered, not only the witness movies kept by
+    the adjacency and neighbor cache, since the cheapest movie between two
+    co-stars is not necessarily the witness. Movie weights are computed at
+    most once per search.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        weight (callable, optional): Function of a movie ID returning a
+        non-negative weight. Defaults to unit_weight.
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
+    frontier = PriorityFrontier()
+    frontier.add(Node(source, None, None))
+    settled = set()
+    weights = {}
+    while not frontier.empty():
+        node = frontier.remove()
+        # the cheapest path to a node is known once it leaves the frontier
+        if node.state == target:
+            return get_path(node)
+        settled.add(node.state)
+        neighbors = _scan_neighbors(node.state, stats)
+        if stats is not None:
+            stats.expanded += 1
+            stats.generated += len(neighbors)
+        for movie_id, person_id in neighbors:
+            if person_id in settled:
+                continue
+            if movie_id not in weights:
+                weights[movie_id] = weight(movie_id)
+            frontier.add(
+                Node(person_id, node, movie_id,
+                     node.cost + weights[movie_id]))
+    return None
+
+
+def path_cost(path: list, weight="cast") -> float:
+    """Returns the total weight of the movies along a path.
+
+    Args:
+        path (list): List of (movie_id, person_id) pairs.
+        weight (optional): Name of one of WEIGHTS, or a movie weight
+        function. Defaults to "cast".
+
+    Returns:
+        float: Sum of the movie weights.
+    """
+    weight = weight if callable(weight) else WEIGHTS[weight]
+    return sum(weight(movie_id) for movie_id, _ in path)
+
+
+def count_shortest_paths(source: int, target: int) -> int:
+    """Returns how many distinct shortest paths connect two people.
+
+    Paths that go through different movies between the same people are
+    counted separately. The count is computed without listing the paths,
+    so it can be far larger than what could be enumerated.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+
+    Returns:
+        int: Number of shortest paths, 0 if the people are not connected.
+    """
+    if (components is not None and source != target
+            and not components.connected(source, target)):
+        return 0
+    edges = compact_graph()
+    return edges.shortest_paths(edges.person_index[source],
+                                edges.person_index[target]).count()
+
+
+def all_shortest_paths(source: int, target: int, stats: SearchStats = None):
+    """Yields every shortest path between two people, one at a time.
+
+    The paths are walked from a layered DAG of the people on some shortest
+    path, so only the current path is held in memory however many there
+    are. Use itertools.islice to take the first few.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        stats (SearchStats, optional): Counters to update while building the
+        DAG. Defaults to None.
+
+    Yields:
+        list: List of (movie_id, person_id) pairs, in the format returned by
+        shortest_path.
+    """
+    if (components is not None and source != target
+            and not components.connected(source, target)):
+        return
+    edges = compact_graph()
+    dag = edges.shortest_paths(edges.person_index[source],
+                               edges.person_index[target], stats)
+    for path in dag:
+        yield edges.path_ids(path)
+
+
+def k_shortest_paths(source: int,
+                     target: int,
+                     k: int = None,
+                     stats: SearchStats = None):
+    """Yields the k shortest simple paths between two people, shortest first.
+
+    Unlike all_shortest_paths, longer paths follow once the shortest ones
+    run out. No person or movie appears twice in a path. Each path costs a
+    few searches, so this suits small k.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        k (int, optional): Number of paths. Defaults to None, which yields
+        paths until every simple path has been listed.
+        stats (SearchStats, optional): Counters to update during the
+        searches. Defaults to None.
+
+    Yields:
+        list: List of (movie_id, person_id) pairs, in the format returned by
+        shortest_path.
+    """
+    if (components is not None and source != target
+            and not components.connected(source, target)):
+        return
+    edges = compact_graph()
+    paths = edges.k_shortest_paths(edges.person_index[source],
+                                   edges.person_index[target], stats)
+    for path in itertools.islice(paths, k):
+        yield edges.path_ids(path)
+
+
+class DistanceMap():
+    def __init__(self, source: int) -> None:
+        """Resumable BFS tree from one person, stored in dicts.
+
+        Args:
+            source (int): Source person ID.
+        """
+        self.source = source
+        self.distances = {source: 0}
+        # maps person IDs to the (movie_id, person_id) that discovered them
+        self.parents = {source: None}
+        self.frontier = [source]
+        self.level_sizes = [1]
+
+    @property
+    def depth(self) -> int:
+        """Number of levels explored so far."""
+        return len(self.level_sizes) - 1
+
+    @property
+    def complete(self) -> bool:
+        """True once the source's whole component has been explored."""
+        return not self.frontier
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def __contains__(self, person_id: int) -> bool:
+        return person_id in self.distances
+
+    def expand_level(self, stats: SearchStats = None) -> list:
+        """Explores one more level of the BFS.
+
+        Args:
+            stats (SearchStats, optional): Counters to update. Defaults to
+            None.
+
+        Returns:
+            list: Person IDs discovered at the new level.
+        """
+        depth = self.depth + 1
+        next_frontier = []
+        for person_id in self.frontier:
+            neighbors = neighbors_for_person(person_id, stats)
+            if stats is not None:
+                stats.expanded += 1
+                stats.generated += len(neighbors)
+            for movie_id, neighbor_id in neighbors:
+                if neighbor_id in self.parents:
+                    continue
+                self.parents[neighbor_id] = (movie_id, person_id)
+                self.distances[neighbor_id] = depth
+                next_frontier.append(neighbor_id)
+        self.frontier = next_frontier
+        if next_frontier:
+            self.level_sizes.append(len(next_frontier))
+        return next_frontier
+
+    def distance(self, person_id: int) -> int:
+        """Returns the degrees of separation to a person, or None if they
+        have not been reached."""
+        return self.distances.get(person_id)
+
+    def path_to(self, person_id: int) -> list:
+        """Returns the (movie_id, person_id) path from the source to a person,
+        or None if they have not been reached."""
+        if person_id not in self.parents:
+            return None
+        return _trace_parents(person_id, self.parents)
+
+
+def distances_from(person_id: int,
+                   max_depth: int = None,
+                   compact: bool = False):
+    """Runs one BFS from a person and returns the distance to everyone.
+
+    Any path from the person can be rebuilt from the result with path_to.
+
+    Args:
+        person_id (int): Source person ID.
+        max_depth (int, optional): Stop after this many degrees. Defaults to
+        None, which explores the whole component.
+        compact (bool, optional): Store the result in flat arrays indexed by
+        compact_graph() instead of dicts. Defaults to False.
+
+    Returns:
+        DistanceMap or DistanceTree: Distances, parent pointers and
+        level_sizes of the search.
+    """
+    if compact:
+        return compact_graph().distances_from(person_id, max_depth)
+    tree = DistanceMap(person_id)
+    while not tree.complete and (max_depth is None or tree.depth < max_depth):
+        tree.expand_level()
+    return tree
+
+
+def _tree_nbytes(tree) -> int:
+    """Estimates the memory held by a cached BFS tree."""
+    if isinstance(tree, DistanceMap):
+        # two dict slots plus a (movie_id, person_id) tuple per person
+        return (sys.getsizeof(tree.distances) + sys.getsizeof(tree.parents) +
+                64 * len(tree.parents) + 8 * len(tree.frontier))
+    return tree.nbytes() + 8 * len(tree.frontier)
+
+
+def enable_tree_cache(max_bytes: int = 256 * 2**20) -> LRUCache:
+    """Caches the BFS tree of every source shortest_path searches from.
+
+    A repeat query from a cached source only rebuilds the path from the
+    tree's parent pointers. If the target was not reached last time, the
+    search resumes from the saved frontier instead of starting over. Trees
+    are evicted least recently used first once their estimated size exceeds
+    max_bytes.
+
+    Args:
+        max_bytes (int, optional): Memory budget for the cached trees.
+        Defaults to 256 MiB.
+
+    Returns:
+        LRUCache: The cache, whose info() reports hits and misses.
+    """
+    global tree_cache
+    tree_cache = LRUCache(max_bytes, _tree_nbytes)
+    return tree_cache
+
+
+def disable_tree_cache() -> None:
+    """Stops caching BFS trees."""
+    global tree_cache
+    tree_cache = None
+
+
+def cached_tree_search(source: int,
+                       target: int,
+                       stats: SearchStats = None) -> list:
+    """Answers a query from the source's cached BFS tree, growing it as
+    needed.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+        stats (SearchStats, optional): Counters to update during the search.
+        Defaults to None.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs along the path back to the 
+        source node, or None if there is no path.
+    """
+    tree = tree_cache.get(source)
+    if tree is None:
+        # a tree grown from the target already holds the reverse path
+        reverse = tree_cache.entries.get(target)
+        if reverse is not None and source in reverse:
+            return _reverse_path(target, reverse.path_to(source))
+        if graph is not None:
+            tree = DistanceTree(graph, graph.person_index[source])
+        else:
+            tree = DistanceMap(source)
+    while target not in tree and not tree.complete:
+        tree.expand_level(stats)
+    # put again even on a hit, the tree may have grown
+    tree_cache.put(source, tree)
+    return tree.path_to(target)
+
+
+def _reverse_path(source: int, path: list) -> list:
+    """Reverses a (movie_id, person_id) path.
+
+    Args:
+        source (int): Person ID the path starts from.
+        path (list): List of (movie_id, person_id) pairs from source.
+
+    Returns:
+        list: List of (movie_id, person_id) pairs from the last person of path
+        back to source.
+    """
+    people_on_path = [source] + [person_id for _, person_id in path]
+    movies_on_path = [movie_id for movie_id, _ in path]
+    return list(zip(reversed(movies_on_path), reversed(people_on_path[:-1])))
+
+
+# Maps strategy names accepted by shortest_path to their implementations
+STRATEGIES = {
+    "bfs": breadth_first_search,
+    "bidirectional": bidirectional_search,
+    "bipartite": bipartite_search,
+    "landmark": landmark_search,
+}
+
+
+def available_strategies() -> list:
+    """Returns the strategies that can run on the currently loaded data.
+
+    Returns:
+        list: Names of STRATEGIES whose indexes are available.
+    """
+    return [
+        strategy for strategy in STRATEGIES
+        if strategy != "landmark" or landmark_index is not None
+    ]
+
+
+def compare_strategies(source: int, target: int) -> dict:
+    """Runs every search strategy on the same query and records its cost.
+
+    Args:
+        source (int): Source state.
+        target (int): Target state.
+
+    Returns:
+        dict: Maps strategy name to a dict of degrees, the SearchStats
+        counters and seconds.
+    """
+    global tree_cache
+    results = {}
+    # measure the strategies themselves, not the tree cache
+    cache, tree_cache = tree_cache, None
+    try:
+        for strategy in available_strategies():
+            stats = SearchStats()
+            start = time.perf_counter()
+            path = shortest_path(source, target, strategy, stats)
+            end = time.perf_counter()
+            results[strategy] = {
+                "degrees": None if path is None else len(path),
+                "expanded": stats.expanded,
+                "generated": stats.generated,
+                "cast_scans": stats.cast_scans,
+                "cast_scans_skipped": stats.cast_scans_skipped,
+                "seconds": end - start
+            }
+    finally:
+        tree_cache = cache
+    return results
+
+
+def answer_query(query: tuple) -> dict:
+    """Resolves and answers one batch query.
+
+    Args:
+        query (tuple): (source, target, strategy) where source and target are
+        person IDs or names.
+
+    Returns:
+        dict: JSON-serialisable result with the resolved IDs and either the
+        degrees and path, or an error message.
+    """
+    source, target, strategy = query
+    result = {"source": source, "target": target}
+    for key, value in (("source", source), ("target", target)):
+        person_ids = candidate_ids(value)
+        if len(person_ids) == 0:
+            result["error"] = f"Person not found: {value}"
+            return result
+        elif len(person_ids) > 1:
+            result["error"] = f"Ambiguous name: {value}"
+            result["candidates"] = person_ids
+            return result
+        result[f"{key}_id"] = person_ids[0]
+
+    try:
+        path = shortest_path(result["source_id"], result["target_id"],
+                             strategy)
+    except ValueError as err:
+        # an unknown strategy, or landmark without a loaded index
+        result["error"] = str(err)
+        return result
+    result["degrees"] = None if path is None else len(path)
+    result["path"] = path
+    return result
+
+
+def read_queries(path: str) -> list:
+    """Reads source/target pairs from a CSV file with two columns.
+
+    Names containing commas must be quoted. Blank lines and lines starting
+    with # are skipped.
+
+    Args:
+        path (str): File to read, or "-" for standard input.
+
+    Returns:
+        list: List of (source, target) pairs.
+    """
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        pairs = []
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) != 2:
+                raise ValueError(f"Expected two columns, got: {row}")
+            pairs.append((row[0].strip(), row[1].strip()))
+        return pairs
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run_batch(pairs: list,
+              output=sys.stdout,
+              strategy: str = "bfs",
+              workers: int = None) -> None:
+    """Answers many queries and streams the results as JSON lines.
+
+    Workers are forked after the data is loaded, so they all read the
+    parent's copy of the graph copy-on-write instead of loading their own.
+    Results are written in input order as soon as they are ready. Platforms
+    without fork answer the queries in this process.
+
+    Args:
+        pairs (list): List of (source, target) person IDs or names.
+        output (file, optional): Where to write JSON lines. Defaults to
+        sys.stdout.
+        strategy (str, optional): Search strategy. Defaults to "bfs".
+        workers (int, optional): Number of worker processes. Defaults to the
+        number of CPUs.
+    """
+    queries = [(source, target, strategy) for source, target in pairs]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for query in queries:
+            output.write(json.dumps(answer_query(query)) + "\n")
+        return
+
+    # keep the garbage collector from touching (and so copying) the pages
+    # holding the loaded graph in every worker
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    chunksize = max(1, min(64, len(queries) // (workers * 4)))
+    try:
+        with context.Pool(workers) as pool:
+            for result in pool.imap(answer_query, queries, chunksize):
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+    finally:
+        gc.unfreeze()
+
+
+def main(directory: str,
+         strategy: str = "bfs",
+         compare: bool = False,
+         backend: str = "dict",
+         use_snapshot: bool = False,
+         adjacency: str = None,
+         cache_size: int = 10000,
+         landmarks: str = None,
+         show_components: bool = False,
+         min_year: int = None,
+         max_year: int = None,
+         exclude: list = (),
+         weight: str = None,
+         paths: int = None,
+         k_shortest: bool = False) -> None:
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, backend, use_snapshot)
+    prepare_neighbors(adjacency, cache_size)
+    if landmarks is not None and load_landmarks(directory, landmarks) is None:
+        sys.exit(f"No up to date landmark index at {landmarks}.")
     print("Data loaded.")
+    if show_components:
+        report_components()
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -178,23 +1840,239 @@ def main(directory):
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if landmark_index is not None:
+        lower, upper = distance_bounds(source, target)
+        if lower is not None:
+            print(f"Landmark estimate: {lower} to {upper} degrees.")
+
+    exclude_ids = []
+    for query in exclude:
+        person_ids = candidate_ids(query)
+        if len(person_ids) != 1:
+            sys.exit(f"Person not found or ambiguous: {query}")
+        exclude_ids.append(person_ids[0])
+
+    if min_year is not None or max_year is not None or exclude_ids:
+        path = constrained_path(source, target, min_year, max_year,
+                                exclude_ids)
+    elif weight is not None:
+        path = weighted_path(source, target, weight)
+    else:
+        path = shortest_path(source, target, strategy)
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print(f"{len(path)} degrees of separation.")
+        if weight is not None:
+            print(f"Path weight: {path_cost(path, weight):.2f} ({weight}).")
+        print_path(source, path)
+
+    if path is not None and paths:
+        if k_shortest:
+            print(f"{paths} shortest simple paths:")
+            alternatives = k_shortest_paths(source, target, paths)
+        else:
+            print(f"{count_shortest_paths(source, target)} shortest paths, "
+                  f"first {paths}:")
+            alternatives = itertools.islice(
+                all_shortest_paths(source, target), paths)
+        for n, alternative in enumerate(alternatives, start=1):
+            print(f"Path {n} ({len(alternative)} degrees):")
+            print_path(source, alternative)
+
+    if compare:
+        for name, result in compare_strategies(source, target).items():
+            print(f"{name}: {result['degrees']} degrees, "
+                  f"{result['expanded']} nodes expanded, "
+                  f"{result['cast_scans']} cast scans "
+                  f"({result['cast_scans_skipped']} skipped), "
+                  f"{result['seconds']:.4f}s")
+        if neighbor_cache is not None:
+            info = neighbor_cache.info()
+            print(f"neighbor cache: {info['hits']} hits, "
+                  f"{info['misses']} misses")
+
+
+def print_path(source: int, path: list) -> None:
+    """Prints a path one movie per line.
+
+    Args:
+        source (int): Source person ID.
+        path (list): List of (movie_id, person_id) pairs from the source.
+    """
+    path = [(None, source)] + path
+    for i in range(len(path) - 1):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
+def report_components(n: int = 5) -> None:
+    """Prints the number of connected components and the largest sizes.
+
+    Args:
+        n (int, optional): Number of component sizes to print. Defaults to 5.
+    """
+    labels = components if components is not None else build_components()
+    sizes = ", ".join(str(size) for size in labels.largest(n))
+    print(f"{len(labels)} components, largest: {sizes}")
+
+
+def report_distances(query: str, max_depth: int = None) -> None:
+    """Prints how many people are at each distance from a person.
+
+    Args:
+        query (str): Person ID or name, which must be unambiguous.
+        max_depth (int, optional): Deepest level to explore. Defaults to None.
+    """
+    person_ids = candidate_ids(query)
+    if len(person_ids) != 1:
+        sys.exit(f"Person not found or ambiguous: {query}")
+    tree = distances_from(person_ids[0], max_depth, compact=True)
+    for depth, size in enumerate(tree.level_sizes):
+        print(f"{depth}: {size}")
+    print(f"{len(tree)} people reached.")
+
+
+def prepare_neighbors(mode: str = None, cache_size: int = 10000) -> None:
+    """Sets up co-star lookups for the loaded data.
+
+    Args:
+        mode (str, optional): "precomputed" to build the full adjacency, "lru"
+        to cache co-stars on demand, None to scan the edges on every call.
+        Defaults to None.
+        cache_size (int, optional): Number of people kept by the "lru" mode.
+        Defaults to 10000.
+
+    Raises:
+        ValueError: If mode is not recognised.
+    """
+    if mode is None:
+        disable_neighbor_cache()
+    elif mode == "precomputed":
+        disable_neighbor_cache()
+        build_adjacency()
+    elif mode == "lru":
+        enable_neighbor_cache(cache_size)
+    else:
+        raise ValueError(f'Unknown adjacency mode: {mode}')
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
-    main(directory)
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two people.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--strategy",
+                        choices=sorted(STRATEGIES),
+                        default="bfs",
+                        help="search strategy used to answer the query")
+    parser.add_argument("--compare",
+                        action="store_true",
+                        help="report node expansions and wall time of every "
+                        "strategy for the query")
+    parser.add_argument("--backend",
+                        choices=BACKENDS,
+                        default="dict",
+                        help="in-memory representation of the star edges")
+    parser.add_argument("--snapshot",
+                        dest="use_snapshot",
+                        action="store_true",
+                        help="cache the parsed data in a snapshot file next "
+                        "to the CSV files and load it on later runs")
+    parser.add_argument("--adjacency",
+                        choices=("precomputed", "lru"),
+                        help="precompute every person's co-stars, or cache "
+                        "them on demand in an LRU cache")
+    parser.add_argument("--cache-size",
+                        type=int,
+                        default=10000,
+                        help="people kept by --adjacency lru")
+    parser.add_argument("--landmarks",
+                        metavar="FILE",
+                        help="landmark index built by landmarks.py, enables "
+                        "--strategy landmark")
+    parser.add_argument("--components",
+                        action="store_true",
+                        help="report the number and sizes of connected "
+                        "components")
+    parser.add_argument("--distances-from",
+                        metavar="PERSON",
+                        help="print how many people are at each distance from "
+                        "PERSON instead of answering a query")
+    parser.add_argument("--max-depth",
+                        type=int,
+                        help="deepest level explored by --distances-from")
+    parser.add_argument("--batch",
+                        metavar="FILE",
+                        help="answer the source,target pairs in a CSV file "
+                        "(or - for stdin) and print JSON lines")
+    parser.add_argument("--workers",
+                        type=int,
+                        help="worker processes for --batch, defaults to the "
+                        "number of CPUs")
+    parser.add_argument("--min-year",
+                        type=int,
+                        help="only connect people through movies released "
+                        "in or after this year")
+    parser.add_argument("--max-year",
+                        type=int,
+                        help="only connect people through movies released "
+                        "in or before this year")
+    parser.add_argument("--exclude",
+                        action="append",
+                        default=[],
+                        metavar="PERSON",
+                        help="never connect people through PERSON, may be "
+                        "repeated")
+    parser.add_argument("--weight",
+                        choices=sorted(WEIGHTS),
+                        help="find the cheapest path instead, where going "
+                        "through a movie costs its weight")
+    parser.add_argument("--paths",
+                        type=int,
+                        metavar="K",
+                        help="also count the shortest paths and print the "
+                        "first K of them")
+    parser.add_argument("--k-shortest",
+                        action="store_true",
+                        help="with --paths, print the K shortest simple paths "
+                        "instead, including longer ones")
+    parser.add_argument("--apply-delta",
+                        metavar="DELTA",
+                        help="add the people, movies and stars CSVs in "
+                        "directory DELTA to the dataset and its snapshot")
+    parser.add_argument("--tree-cache",
+                        type=int,
+                        metavar="MB",
+                        help="keep the BFS trees of recent --batch sources in "
+                        "an LRU cache of this many megabytes")
+    args = parser.parse_args()
+    if args.apply_delta:
+        load_data(args.directory, args.backend, args.use_snapshot)
+        counts = apply_delta(args.apply_delta, args.directory)
+        print(f"Added {counts['people']} people, {counts['movies']} movies "
+              f"and {counts['stars']} stars.")
+    elif args.distances_from:
+        load_data(args.directory, args.backend, args.use_snapshot)
+        report_distances(args.distances_from, args.max_depth)
+    elif args.batch:
+        # keep stdout clean for the JSON lines
+        print("Loading data...", file=sys.stderr)
+        load_data(args.directory, args.backend, args.use_snapshot)
+        prepare_neighbors(args.adjacency, args.cache_size)
+        if args.tree_cache:
+            enable_tree_cache(args.tree_cache * 2**20)
+        if args.landmarks is not None and load_landmarks(
+                args.directory, args.landmarks) is None:
+            sys.exit(f"No up to date landmark index at {args.landmarks}.")
+        print("Data loaded.", file=sys.stderr)
+        run_batch(read_queries(args.batch), sys.stdout, args.strategy,
+                  args.workers)
+    else:
+        main(args.directory, args.strategy, args.compare, args.backend,
+             args.use_snapshot, args.adjacency, args.cache_size,
+             args.landmarks, args.components, args.min_year,
+             args.max_year, args.exclude, args.weight, args.paths,
+             args.k_shortest)
@@ -0,0 +1,1126 @@
+"""
+Compact integer-indexed graph of the people and movies in a degrees dataset.
+
+People and movies are assigned dense integer indexes in the order they are
+first seen. The star edges are stored twice in compressed sparse row (CSR)
+form: person_offsets/person_movies list the movies of every person and
+movie_offsets/movie_people list the stars of every movie. The IMDB string IDs
+are only kept in the person_ids/movie_ids side tables (and their reverse
+lookups), so the graph itself is a handful of flat int32 arrays.
+"""
+import heapq
+import itertools
+import math
+import operator
+from array import array
+
+# int32 for indexes, int64 for offsets so edge counts can exceed 2**31
+INDEX_TYPE = "i"
+OFFSET_TYPE = "q"
+
+# Value of a distance_array entry for people the source cannot reach
+UNREACHABLE = 255
+
+
+class GraphBuilder():
+    def __init__(self) -> None:
+        """Accumulates people, movies and star edges for a CompactGraph."""
+        self.person_ids = []
+        self.movie_ids = []
+        self.person_index = {}
+        self.movie_index = {}
+        self.edge_people = array(INDEX_TYPE)
+        self.edge_movies = array(INDEX_TYPE)
+        self.edges = set()
+
+    def add_person(self, person_id: str) -> int:
+        """Registers a person, returning their dense index.
+
+        Args:
+            person_id (str): IMDB person ID.
+
+        Returns:
+            int: Dense person index.
+        """
+        if person_id not in self.person_index:
+            self.person_index[person_id] = len(self.person_ids)
+            self.person_ids.append(person_id)
+        return self.person_index[person_id]
+
+    def add_movie(self, movie_id: str) -> int:
+        """Registers a movie, returning its dense index.
+
+        Args:
+            movie_id (str): IMDB movie ID.
+
+        Returns:
+            int: Dense movie index.
+        """
+        if movie_id not in self.movie_index:
+            self.movie_index[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+        return self.movie_index[movie_id]
+
+    def add_star(self, person_id: str, movie_id: str) -> bool:
+        """Records that a person starred in a movie.
+
+        Unknown people or movies are ignored, matching load_data.
+
+        Args:
+            person_id (str): IMDB person ID.
+            movie_id (str): IMDB movie ID.
+
+        Returns:
+            bool: True if the edge was added.
+        """
+        person = self.person_index.get(person_id)
+        movie = self.movie_index.get(movie_id)
+        if person is None or movie is None:
+            return False
+        # stars.csv may repeat a credit, the dict backend dedupes with sets
+        key = (person, movie)
+        if key in self.edges:
+            return False
+        self.edges.add(key)
+        self.edge_people.append(person)
+        self.edge_movies.append(movie)
+        return True
+
+    def build(self) -> "CompactGraph":
+        """Packs the accumulated edges into CSR arrays.
+
+        Returns:
+            CompactGraph: The packed graph.
+        """
+        person_offsets, person_movies = _pack(len(self.person_ids),
+                                              self.edge_people,
+                                              self.edge_movies)
+        movie_offsets, movie_people = _pack(len(self.movie_ids),
+                                            self.edge_movies,
+                                            self.edge_people)
+        return CompactGraph(self.person_ids, self.movie_ids, person_offsets,
+                            person_movies, movie_offsets, movie_people)
+
+
+def _merge(old_offsets: array, old_values: array, new_offsets: array,
+           new_values: array) -> tuple:
+    """Merges values added to some rows into a CSR structure.
+
+    Args:
+        old_offsets (array): Offsets of the existing rows.
+        old_values (array): Values of the existing rows.
+        new_offsets (array): Offsets of the added values, over at least as
+        many rows.
+        new_values (array): Added values.
+
+    Returns:
+        tuple: Offsets and values arrays where every row holds its old values
+        followed by its new ones.
+    """
+    old_rows = len(old_offsets) - 1
+    num_rows = len(new_offsets) - 1
+    ends = array(OFFSET_TYPE, old_offsets)
+    ends.extend([ends[-1]] * (num_rows - old_rows))
+    offsets = array(OFFSET_TYPE, map(operator.add, ends, new_offsets))
+    values = array(INDEX_TYPE)
+    # old values are copied in one slice per run of untouched rows
+    copied = 0
+    for row in range(num_rows):
+        if new_offsets[row + 1] == new_offsets[row]:
+            continue
+        values.extend(old_values[copied:ends[row + 1]])
+        copied = ends[row + 1]
+        values.extend(new_values[new_offsets[row]:new_offsets[row + 1]])
+    values.extend(old_values[copied:])
+    return offsets, values
+
+
+def _pack(num_rows: int, rows: array, columns: array) -> tuple:
+    """Counting sort of (row, column) edges into CSR offset and value arrays.
+
+    Args:
+        num_rows (int): Number of rows.
+        rows (array): Row index of each edge.
+        columns (array): Column index of each edge.
+
+    Returns:
+        tuple: Offsets array of length num_rows + 1 and values array.
+    """
+    offsets = array(OFFSET_TYPE, [0]) * (num_rows + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for row in range(num_rows):
+        offsets[row + 1] += offsets[row]
+    values = array(INDEX_TYPE, [0]) * len(rows)
+    cursor = offsets[:-1]
+    for row, column in zip(rows, columns):
+        values[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, values
+
+
+class CompactGraph():
+    def __init__(self, person_ids: list, movie_ids: list,
+                 person_offsets: array, person_movies: array,
+                 movie_offsets: array, movie_people: array) -> None:
+        """Bipartite person/movie graph stored as CSR arrays.
+
+        Args:
+            person_ids (list): IMDB ID of every person index.
+            movie_ids (list): IMDB ID of every movie index.
+            person_offsets (array): Start of each person's movies.
+            person_movies (array): Movie indexes, grouped by person.
+            movie_offsets (array): Start of each movie's stars.
+            movie_people (array): Person indexes, grouped by movie.
+        """
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_index = {
+            person_id: i
+            for i, person_id in enumerate(person_ids)
+        }
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+        self.strategies = {
+            "bfs": self.breadth_first_search,
+            "bidirectional": self.bidirectional_search,
+            "bipartite": self.bipartite_search,
+        }
+
+    @classmethod
+    def from_dicts(cls, people: dict, movies: dict) -> "CompactGraph":
+        """Builds a compact graph from the dict backend indexes.
+
+        Args:
+            people (dict): Maps person_ids to name, birth and movies.
+            movies (dict): Maps movie_ids to title, year and stars.
+
+        Returns:
+            CompactGraph: The packed graph.
+        """
+        builder = GraphBuilder()
+        for person_id in people:
+            builder.add_person(person_id)
+        for movie_id in movies:
+            builder.add_movie(movie_id)
+        for person_id, person in people.items():
+            for movie_id in person["movies"]:
+                builder.add_star(person_id, movie_id)
+        return builder.build()
+
+    def extended(self, person_ids: list, movie_ids: list,
+                 edges: list) -> "CompactGraph":
+        """Returns a copy of the graph with people, movies and edges added.
+
+        Existing people and movies keep their indexes, new ones are numbered
+        after them, so arrays indexed by person stay valid for the old
+        people.
+
+        Args:
+            person_ids (list): IMDB IDs of the new people.
+            movie_ids (list): IMDB IDs of the new movies.
+            edges (list): New (person, movie) index pairs, which must not
+            already be in the graph.
+
+        Returns:
+            CompactGraph: The extended graph.
+        """
+        all_person_ids = list(self.person_ids) + list(person_ids)
+        all_movie_ids = list(self.movie_ids) + list(movie_ids)
+        edge_people = array(INDEX_TYPE, (person for person, _ in edges))
+        edge_movies = array(INDEX_TYPE, (movie for _, movie in edges))
+        person_offsets, person_movies = _merge(
+            self.person_offsets, self.person_movies,
+            *_pack(len(all_person_ids), edge_people, edge_movies))
+        movie_offsets, movie_people = _merge(
+            self.movie_offsets, self.movie_people,
+            *_pack(len(all_movie_ids), edge_movies, edge_people))
+        return CompactGraph(all_person_ids, all_movie_ids, person_offsets,
+                            person_movies, movie_offsets, movie_people)
+
+    @property
+    def num_people(self) -> int:
+        return len(self.person_ids)
+
+    @property
+    def num_movies(self) -> int:
+        return len(self.movie_ids)
+
+    def movies_of(self, person: int) -> array:
+        """Returns the movie indexes a person starred in."""
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie: int) -> array:
+        """Returns the person indexes that starred in a movie."""
+        offsets = self.movie_offsets
+        return self.movie_people[offsets[movie]:offsets[movie + 1]]
+
+    def nbytes(self) -> int:
+        """Returns the size in bytes of the CSR edge arrays."""
+        return sum(
+            len(values) * values.itemsize
+            for values in (self.person_offsets, self.person_movies,
+                           self.movie_offsets, self.movie_people))
+
+    def distance_array(self, source: int) -> bytearray:
+        """Returns the degrees of separation from a person to everyone.
+
+        Args:
+            source (int): Source person index.
+
+        Raises:
+            ValueError: If some distance does not fit in a byte.
+
+        Returns:
+            bytearray: Distance of every person index, UNREACHABLE if the
+            person is in another component.
+        """
+        distances = bytearray([UNREACHABLE]) * self.num_people
+        visited_movies = bytearray(self.num_movies)
+        distances[source] = 0
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth += 1
+            if depth >= UNREACHABLE:
+                raise ValueError(f'Distance {depth} does not fit in a byte')
+            next_frontier = []
+            for person in frontier:
+                for movie in self.movies_of(person):
+                    if visited_movies[movie]:
+                        continue
+                    visited_movies[movie] = 1
+                    for neighbor in self.stars_of(movie):
+                        if distances[neighbor] == UNREACHABLE:
+                            distances[neighbor] = depth
+                            next_frontier.append(neighbor)
+            frontier = next_frontier
+        return distances
+
+    def distances_from(self, person_id: str,
+                       max_depth: int = None) -> "DistanceTree":
+        """Runs a level-synchronous BFS from a person.
+
+        Args:
+            person_id (str): Source person ID.
+            max_depth (int, optional): Stop after this many degrees. Defaults
+            to None, which explores the whole component.
+
+        Returns:
+            DistanceTree: Distances and parent pointers of every person
+            reached.
+        """
+        tree = DistanceTree(self, self.person_index[person_id])
+        while not tree.complete and (max_depth is None
+                                     or tree.depth < max_depth):
+            tree.expand_level()
+        return tree
+
+    def neighbors_for_person(self, person_id: str) -> set:
+        """Returns (movie_id, person_id) pairs for people who starred with a
+        given person, using IMDB string IDs like the dict backend.
+
+        Args:
+            person_id (str): Person ID.
+
+        Returns:
+            set: Set of neighbors.
+        """
+        neighbors = set()
+        for movie in self.movies_of(self.person_index[person_id]):
+            movie_id = self.movie_ids[movie]
+            for person in self.stars_of(movie):
+                neighbors.add((movie_id, self.person_ids[person]))
+        return neighbors
+
+    def shortest_path(self,
+                      source: str,
+                      target: str,
+                      strategy: str = "bfs",
+                      stats=None) -> list:
+        """Runs a search on the integer graph and translates the result back
+        into (movie_id, person_id) pairs of IMDB string IDs.
+
+        Args:
+            source (str): Source person ID.
+            target (str): Target person ID.
+            strategy (str, optional): Key of self.strategies. Defaults to
+            "bfs".
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+
+        Raises:
+            ValueError: If strategy is not supported by the compact graph.
+
+        Returns:
+            list: List of (movie_id, person_id) pairs, or None if there is no
+            path.
+        """
+        if strategy not in self.strategies:
+            raise ValueError(f'Unknown search strategy: {strategy}')
+        path = self.strategies[strategy](self.person_index[source],
+                                         self.person_index[target], stats)
+        return self.path_ids(path)
+
+    def path_ids(self, path: list) -> list:
+        """Translates a path of integer indexes into IMDB string IDs.
+
+        Args:
+            path (list): List of (movie, person) index pairs, or None.
+
+        Returns:
+            list: List of (movie_id, person_id) pairs, or None.
+        """
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+    def breadth_first_search(self, source: int, target: int,
+                             stats=None) -> list:
+        """Single-ended breadth first search over person indexes.
+
+        Args:
+            source (int): Source person index.
+            target (int): Target person index.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+
+        Returns:
+            list: List of (movie, person) index pairs, or None if there is no
+            path.
+        """
+        if source == target:
+            return []
+        parent_person = array(INDEX_TYPE, [-1]) * self.num_people
+        parent_movie = array(INDEX_TYPE, [-1]) * self.num_people
+        parent_person[source] = source
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                if stats is not None:
+                    stats.expanded += 1
+                for movie in self.movies_of(person):
+                    stars = self.stars_of(movie)
+                    if stats is not None:
+                        stats.cast_scans += 1
+                        stats.generated += len(stars)
+                    for neighbor in stars:
+                        if parent_person[neighbor] != -1:
+                            continue
+                        parent_person[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        if neighbor == target:
+                            return _trace(target, source, parent_person,
+                                          parent_movie)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return None
+
+    def bidirectional_search(self, source: int, target: int,
+                             stats=None) -> list:
+        """Breadth first search grown from both ends, always expanding the
+        smaller frontier layer, joined at the first meeting person.
+
+        Args:
+            source (int): Source person index.
+            target (int): Target person index.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+
+        Returns:
+            list: List of (movie, person) index pairs, or None if there is no
+            path.
+        """
+        if source == target:
+            return []
+        n = self.num_people
+        # side[i] is 1 for people reached from the source, 2 from the target
+        side = bytearray(n)
+        parent_person = array(INDEX_TYPE, [-1]) * n
+        parent_movie = array(INDEX_TYPE, [-1]) * n
+        side[source] = 1
+        side[target] = 2
+        parent_person[source] = source
+        parent_person[target] = target
+        frontiers = {1: [source], 2: [target]}
+
+        while frontiers[1] and frontiers[2]:
+            this = 1 if len(frontiers[1]) <= len(frontiers[2]) else 2
+            next_frontier = []
+            for person in frontiers[this]:
+                if stats is not None:
+                    stats.expanded += 1
+                for movie in self.movies_of(person):
+                    stars = self.stars_of(movie)
+                    if stats is not None:
+                        stats.cast_scans += 1
+                        stats.generated += len(stars)
+                    for neighbor in stars:
+                        if side[neighbor] == this:
+                            continue
+                        if side[neighbor] != 0:
+                            # the two searches meet across this movie
+                            if this == 1:
+                                near, far = person, neighbor
+                            else:
+                                near, far = neighbor, person
+                            path = _trace(near, source, parent_person,
+                                          parent_movie)
+                            path.append((movie, far))
+                            person = far
+                            while person != target:
+                                path.append((parent_movie[person],
+                                             parent_person[person]))
+                                person = parent_person[person]
+                            return path
+                        side[neighbor] = this
+                        parent_person[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        next_frontier.append(neighbor)
+            frontiers[this] = next_frontier
+        return None
+
+    def bipartite_search(self,
+                         source: int,
+                         target: int,
+                         stats=None,
+                         excluded_movies: bytearray = None,
+                         excluded_people: list = None) -> list:
+        """Breadth first search that also marks visited movies, so each
+        movie's star list is walked at most once per search.
+
+        Exclusions are applied by marking the excluded movies and people as
+        already visited before the search starts, so they cost nothing per
+        expansion.
+
+        Args:
+            source (int): Source person index.
+            target (int): Target person index.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+            excluded_movies (bytearray, optional): Nonzero for every movie
+            index the path may not use. Defaults to None.
+            excluded_people (list, optional): Person indexes the path may not
+            go through. Defaults to None.
+
+        Returns:
+            list: List of (movie, person) index pairs, or None if there is no
+            path.
+        """
+        if source == target:
+            return []
+        parent_person = array(INDEX_TYPE, [-1]) * self.num_people
+        parent_movie = array(INDEX_TYPE, [-1]) * self.num_people
+        if excluded_movies is None:
+            visited_movies = bytearray(self.num_movies)
+        else:
+            visited_movies = bytearray(excluded_movies)
+        for person in excluded_people or ():
+            if person in (source, target):
+                return None
+            parent_person[person] = person
+        parent_person[source] = source
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                if stats is not None:
+                    stats.expanded += 1
+                for movie in self.movies_of(person):
+                    if visited_movies[movie]:
+                        if stats is not None:
+                            stats.cast_scans_skipped += 1
+                        continue
+                    visited_movies[movie] = 1
+                    stars = self.stars_of(movie)
+                    if stats is not None:
+                        stats.cast_scans += 1
+                        stats.generated += len(stars)
+                    for neighbor in stars:
+                        if parent_person[neighbor] != -1:
+                            continue
+                        parent_person[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        if neighbor == target:
+                            return _trace(target, source, parent_person,
+                                          parent_movie)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return None
+
+    def weighted_search(self,
+                        source: int,
+                        target: int,
+                        movie_weights: array,
+                        stats=None) -> list:
+        """Dijkstra's algorithm where going through a movie costs its weight.
+
+        The frontier is a binary heap of (cost, person) entries. A person
+        whose cost drops is pushed again rather than updated in place, and
+        the stale entry is skipped when popped. A movie's stars are only
+        relaxed from the first (cheapest) person that reaches the movie, as
+        anyone settled later could only offer them a higher cost.
+
+        Like the breadth first searches, the search can stop as soon as the
+        target is reached rather than when it is settled: once its cost is
+        at most the cost being expanded plus the lightest movie weight, no
+        path found later can be cheaper. With unit weights this stops at the
+        same point as breadth first search.
+
+        Args:
+            source (int): Source person index.
+            target (int): Target person index.
+            movie_weights (array): Non-negative weight of every movie index.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+
+        Returns:
+            list: List of (movie, person) index pairs of a cheapest path, or
+            None if there is no path.
+        """
+        if source == target:
+            return []
+        parent_person = array(INDEX_TYPE, [-1]) * self.num_people
+        parent_movie = array(INDEX_TYPE, [-1]) * self.num_people
+        costs = array("d", [math.inf]) * self.num_people
+        costs[source] = 0.0
+        settled = bytearray(self.num_people)
+        visited_movies = bytearray(self.num_movies)
+        parent_person[source] = source
+        lightest = min(movie_weights, default=0.0)
+        heap = [(0.0, source)]
+        while heap:
+            cost, person = heapq.heappop(heap)
+            if settled[person]:
+                continue
+            settled[person] = 1
+            if person == target:
+                return _trace(target, source, parent_person, parent_movie)
+            if stats is not None:
+                stats.expanded += 1
+            for movie in self.movies_of(person):
+                if visited_movies[movie]:
+                    if stats is not None:
+                        stats.cast_scans_skipped += 1
+                    continue
+                visited_movies[movie] = 1
+                stars = self.stars_of(movie)
+                if stats is not None:
+                    stats.cast_scans += 1
+                    stats.generated += len(stars)
+                neighbor_cost = cost + movie_weights[movie]
+                for neighbor in stars:
+                    if settled[neighbor] or costs[neighbor] <= neighbor_cost:
+                        continue
+                    costs[neighbor] = neighbor_cost
+                    parent_person[neighbor] = person
+                    parent_movie[neighbor] = movie
+                    if neighbor == target and neighbor_cost <= cost + lightest:
+                        return _trace(target, source, parent_person,
+                                      parent_movie)
+                    heapq.heappush(heap, (neighbor_cost, neighbor))
+        return None
+
+    def shortest_paths(self, source: int, target: int,
+                       stats=None) -> "ShortestPathDAG":
+        """Returns the layered DAG of every shortest path between two people.
+
+        Args:
+            source (int): Source person index.
+            target (int): Target person index.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+
+        Returns:
+            ShortestPathDAG: Counts and enumerates the paths.
+        """
+        return ShortestPathDAG(self, source, target, stats)
+
+    def k_shortest_paths(self, source: int, target: int, stats=None):
+        """Yields the simple paths between two people, shortest first.
+
+        This is Yen's algorithm on the bipartite graph, so a path never
+        visits a person or a movie twice. Every node of the last path found
+        is tried as a spur: the candidate follows the path up to the spur,
+        then leaves it through an edge that no path found so far with the
+        same root has taken, along the shortest route that avoids the root.
+        The shortest candidate is the next path.
+
+        Only the paths yielded so far and the pending candidates are kept,
+        so taking the first k paths costs memory for O(k) paths.
+
+        Args:
+            source (int): Source person index.
+            target (int): Target person index.
+            stats (SearchStats, optional): Counters to update during the
+            searches. Defaults to None.
+
+        Yields:
+            list: List of (movie, person) index pairs.
+        """
+        first = self.bipartite_search(source, target, stats)
+        if first is None:
+            return
+        yield first
+        found = [first]
+        seen = {tuple(first)}
+        candidates = []
+        counter = itertools.count()
+        blocked_people = bytearray(self.num_people)
+        blocked_movies = bytearray(self.num_movies)
+        while True:
+            last = found[-1]
+            people_on_path = [source] + [person for _, person in last]
+            for i, (movie, _) in enumerate(last):
+                root = last[:i]
+                spur = people_on_path[i]
+                same_root = [path for path in found if path[:i] == root]
+                for person in people_on_path[:i + 1]:
+                    blocked_people[person] = 1
+                for root_movie, _ in root:
+                    blocked_movies[root_movie] = 1
+                # spur at the person: leave through a movie not taken yet
+                taken = {path[i][0] for path in same_root}
+                seeds = [(other, neighbor)
+                         for other in self.movies_of(spur)
+                         if other not in taken and not blocked_movies[other]
+                         for neighbor in self.stars_of(other)]
+                spurs = [self._search_from(spur, seeds, target,
+                                           blocked_people, blocked_movies,
+                                           stats)]
+                # spur at the movie: leave it towards a person not taken yet
+                taken = {
+                    path[i][1]
+                    for path in same_root if path[i][0] == movie
+                }
+                blocked_movies[movie] = 1
+                seeds = [(movie, neighbor)
+                         for neighbor in self.stars_of(movie)
+                         if neighbor not in taken]
+                spurs.append(
+                    self._search_from(spur, seeds, target, blocked_people,
+                                      blocked_movies, stats))
+                # unblock for the next spur instead of allocating new arrays
+                for person in people_on_path[:i + 1]:
+                    blocked_people[person] = 0
+                for root_movie, _ in last[:i + 1]:
+                    blocked_movies[root_movie] = 0
+                for spur_path in spurs:
+                    if spur_path is None:
+                        continue
+                    path = root + spur_path
+                    if tuple(path) not in seen:
+                        seen.add(tuple(path))
+                        heapq.heappush(candidates,
+                                       (len(path), next(counter), path))
+            if not candidates:
+                return
+            _, _, path = heapq.heappop(candidates)
+            found.append(path)
+            yield path
+
+    def _search_from(self, spur: int, seeds: list, target: int,
+                     blocked_people: bytearray, blocked_movies: bytearray,
+                     stats=None) -> list:
+        """Bipartite search from a spur person whose first steps are given,
+        avoiding the blocked people and movies.
+
+        Args:
+            spur (int): Person index the path starts from.
+            seeds (list): Allowed first (movie, person) steps.
+            target (int): Target person index.
+            blocked_people (bytearray): Nonzero for people the path may not
+            visit, including the spur.
+            blocked_movies (bytearray): Nonzero for movies the path may not
+            use.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+
+        Returns:
+            list: List of (movie, person) index pairs from the spur, or None
+            if there is no path.
+        """
+        parent_person = array(INDEX_TYPE, [-1]) * self.num_people
+        parent_movie = array(INDEX_TYPE, [-1]) * self.num_people
+        visited_movies = bytearray(blocked_movies)
+        parent_person[spur] = spur
+        frontier = []
+        for movie, person in seeds:
+            visited_movies[movie] = 1
+            if parent_person[person] != -1 or blocked_people[person]:
+                continue
+            parent_person[person] = spur
+            parent_movie[person] = movie
+            if person == target:
+                return [(movie, person)]
+            frontier.append(person)
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                if stats is not None:
+                    stats.expanded += 1
+                for movie in self.movies_of(person):
+                    if visited_movies[movie]:
+                        continue
+                    visited_movies[movie] = 1
+                    stars = self.stars_of(movie)
+                    if stats is not None:
+                        stats.cast_scans += 1
+                        stats.generated += len(stars)
+                    for neighbor in stars:
+                        if (parent_person[neighbor] != -1
+                                or blocked_people[neighbor]):
+                            continue
+                        parent_person[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        if neighbor == target:
+                            return _trace(target, spur, parent_person,
+                                          parent_movie)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return None
+
+
+def _trace(person: int, source: int, parent_person: array,
+           parent_movie: array) -> list:
+    """Follows parent pointers from a person back to the source.
+
+    Args:
+        person (int): Person index to start from.
+        source (int): Source person index, whose parent is itself.
+        parent_person (array): Parent person index of every reached person.
+        parent_movie (array): Movie index linking every person to its parent.
+
+    Returns:
+        list: List of (movie, person) index pairs from source to person.
+    """
+    path = []
+    while person != source:
+        path.append((parent_movie[person], person))
+        person = parent_person[person]
+    path.reverse()
+    return path
+
+
+class ComponentIndex():
+    def __init__(self, labels, sizes, person_index: dict) -> None:
+        """Connected component of every person.
+
+        Args:
+            labels (array): Component label of every person index.
+            sizes (array): Number of people in every component label.
+            person_index (dict): Maps IMDB person IDs to person indexes.
+        """
+        self.labels = labels
+        self.sizes = sizes
+        self.person_index = person_index
+
+    @classmethod
+    def build(cls, graph: CompactGraph) -> "ComponentIndex":
+        """Labels the components of a graph with one BFS sweep.
+
+        Args:
+            graph (CompactGraph): Graph to label.
+
+        Returns:
+            ComponentIndex: The labels.
+        """
+        labels = array(INDEX_TYPE, [-1]) * graph.num_people
+        sizes = array(INDEX_TYPE)
+        visited_movies = bytearray(graph.num_movies)
+        for root in range(graph.num_people):
+            if labels[root] != -1:
+                continue
+            label = len(sizes)
+            labels[root] = label
+            size = 1
+            frontier = [root]
+            while frontier:
+                next_frontier = []
+                for person in frontier:
+                    for movie in graph.movies_of(person):
+                        if visited_movies[movie]:
+                            continue
+                        visited_movies[movie] = 1
+                        for neighbor in graph.stars_of(movie):
+                            if labels[neighbor] == -1:
+                                labels[neighbor] = label
+                                size += 1
+                                next_frontier.append(neighbor)
+                frontier = next_frontier
+            sizes.append(size)
+        return cls(labels, sizes, graph.person_index)
+
+    def extended(self, graph: CompactGraph,
+                 movies: list) -> "ComponentIndex":
+        """Labels an extended graph by merging the existing components.
+
+        Instead of searching the whole graph again, every new person starts
+        in a component of their own and the components joined by the casts
+        of the given movies are merged.
+
+        Args:
+            graph (CompactGraph): Result of CompactGraph.extended on the
+            labelled graph.
+            movies (list): Indexes of the movies that gained stars.
+
+        Returns:
+            ComponentIndex: The labels of the extended graph.
+        """
+        sizes = list(self.sizes)
+        labels = array(INDEX_TYPE, self.labels)
+        for _ in range(len(labels), graph.num_people):
+            labels.append(len(sizes))
+            sizes.append(1)
+        # union-find over component labels
+        parent = list(range(len(sizes)))
+
+        def find(label):
+            while parent[label] != label:
+                parent[label] = parent[parent[label]]
+                label = parent[label]
+            return label
+
+        for movie in movies:
+            stars = graph.stars_of(movie)
+            if not stars:
+                continue
+            root = find(labels[stars[0]])
+            for person in stars[1:]:
+                other = find(labels[person])
+                if other != root:
+                    parent[other] = root
+        # renumber the surviving components densely
+        renumbered = {}
+        merged_sizes = array(INDEX_TYPE)
+        for label, size in enumerate(sizes):
+            root = find(label)
+            if root not in renumbered:
+                renumbered[root] = len(merged_sizes)
+                merged_sizes.append(0)
+            merged_sizes[renumbered[root]] += size
+        mapping = [renumbered[find(label)] for label in range(len(sizes))]
+        merged_labels = array(INDEX_TYPE, (mapping[label] for label in labels))
+        return ComponentIndex(merged_labels, merged_sizes, graph.person_index)
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def label(self, person_id: str) -> int:
+        """Returns the component label of a person."""
+        return self.labels[self.person_index[person_id]]
+
+    def size(self, person_id: str) -> int:
+        """Returns the number of people in a person's component."""
+        return self.sizes[self.label(person_id)]
+
+    def connected(self, source: str, target: str) -> bool:
+        """Returns True if a path exists between two people."""
+        return self.label(source) == self.label(target)
+
+    def largest(self, n: int = 10) -> list:
+        """Returns the sizes of the n largest components, largest first."""
+        return sorted(self.sizes, reverse=True)[:n]
+
+
+class DistanceTree():
+    def __init__(self, graph: CompactGraph, source: int) -> None:
+        """Resumable BFS tree from one person, stored in flat arrays.
+
+        Args:
+            graph (CompactGraph): Graph to search.
+            source (int): Source person index.
+        """
+        self.graph = graph
+        self.source = source
+        self.distances = bytearray([UNREACHABLE]) * graph.num_people
+        self.parent_person = array(INDEX_TYPE, [-1]) * graph.num_people
+        self.parent_movie = array(INDEX_TYPE, [-1]) * graph.num_people
+        self.visited_movies = bytearray(graph.num_movies)
+        self.distances[source] = 0
+        self.parent_person[source] = source
+        self.frontier = [source]
+        self.level_sizes = [1]
+
+    @property
+    def depth(self) -> int:
+        """Number of levels explored so far."""
+        return len(self.level_sizes) - 1
+
+    @property
+    def complete(self) -> bool:
+        """True once the source's whole component has been explored."""
+        return not self.frontier
+
+    def __len__(self) -> int:
+        return sum(self.level_sizes)
+
+    def __contains__(self, person_id: str) -> bool:
+        return self.distance(person_id) is not None
+
+    def expand_level(self, stats=None) -> list:
+        """Explores one more level of the BFS.
+
+        Args:
+            stats (SearchStats, optional): Counters to update. Defaults to
+            None.
+
+        Returns:
+            list: Person indexes discovered at the new level.
+        """
+        graph = self.graph
+        depth = self.depth + 1
+        if depth >= UNREACHABLE:
+            raise ValueError(f'Distance {depth} does not fit in a byte')
+        distances = self.distances
+        visited_movies = self.visited_movies
+        next_frontier = []
+        for person in self.frontier:
+            if stats is not None:
+                stats.expanded += 1
+            for movie in graph.movies_of(person):
+                if visited_movies[movie]:
+                    if stats is not None:
+                        stats.cast_scans_skipped += 1
+                    continue
+                visited_movies[movie] = 1
+                stars = graph.stars_of(movie)
+                if stats is not None:
+                    stats.cast_scans += 1
+                    stats.generated += len(stars)
+                for neighbor in stars:
+                    if distances[neighbor] == UNREACHABLE:
+                        distances[neighbor] = depth
+                        self.parent_person[neighbor] = person
+                        self.parent_movie[neighbor] = movie
+                        next_frontier.append(neighbor)
+        self.frontier = next_frontier
+        if next_frontier:
+            self.level_sizes.append(len(next_frontier))
+        return next_frontier
+
+    def distance(self, person_id: str) -> int:
+        """Returns the degrees of separation to a person, or None if they
+        have not been reached."""
+        index = self.graph.person_index.get(person_id)
+        if index is None or self.distances[index] == UNREACHABLE:
+            return None
+        return self.distances[index]
+
+    def path_to(self, person_id: str) -> list:
+        """Returns the (movie_id, person_id) path from the source to a person,
+        or None if they have not been reached."""
+        if person_id not in self:
+            return None
+        return self.graph.path_ids(
+            _trace(self.graph.person_index[person_id], self.source,
+                   self.parent_person, self.parent_movie))
+
+    def nbytes(self) -> int:
+        """Returns the size in bytes of the tree's arrays."""
+        return (len(self.distances) + len(self.visited_movies) +
+                len(self.parent_person) * self.parent_person.itemsize * 2)
+
+
+class ShortestPathDAG():
+    def __init__(self, graph: CompactGraph, source: int, target: int,
+                 stats=None) -> None:
+        """Every shortest path between two people, as a layered DAG.
+
+        A BFS from the source assigns distances up to the target's. A
+        backward sweep over those layers then counts, for every person, the
+        shortest paths from them to the target, keeping only the people that
+        have one. Distinct movies linking the same two people make distinct
+        paths. Only the DAG edges are stored, never the paths: iterating
+        walks the DAG depth first, one path at a time.
+
+        Args:
+            graph (CompactGraph): Graph to search.
+            source (int): Source person index.
+            target (int): Target person index.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+        """
+        self.graph = graph
+        self.source = source
+        self.target = target
+        self.distances = array(INDEX_TYPE, [-1]) * graph.num_people
+        self.distances[source] = 0
+        # number of shortest paths from every person on one to the target,
+        # and their (movie, person) steps to the next layer of the DAG
+        self.counts = {}
+        self.steps = {}
+        self.distance = None
+        layers = [[source]]
+        visited_movies = bytearray(graph.num_movies)
+        while self.distances[target] == -1 and layers[-1]:
+            depth = len(layers)
+            next_layer = []
+            for person in layers[-1]:
+                if stats is not None:
+                    stats.expanded += 1
+                for movie in graph.movies_of(person):
+                    if visited_movies[movie]:
+                        continue
+                    visited_movies[movie] = 1
+                    for neighbor in graph.stars_of(movie):
+                        if self.distances[neighbor] == -1:
+                            self.distances[neighbor] = depth
+                            next_layer.append(neighbor)
+            layers.append(next_layer)
+        if self.distances[target] == -1:
+            return
+        self.distance = self.distances[target]
+        self.counts[target] = 1
+        self.steps[target] = []
+        for depth in range(self.distance - 1, -1, -1):
+            for person in layers[depth]:
+                steps = list(self.successors(person))
+                if steps:
+                    self.counts[person] = sum(self.counts[neighbor]
+                                              for _, neighbor in steps)
+                    self.steps[person] = steps
+
+    def successors(self, person: int):
+        """Yields the (movie, person) steps from a person to the next layer
+        that lead to the target, judged by the layers counted so far."""
+        depth = self.distances[person] + 1
+        distances = self.distances
+        counts = self.counts
+        return ((movie, neighbor) for movie in self.graph.movies_of(person)
+                for neighbor in self.graph.stars_of(movie)
+                if distances[neighbor] == depth and neighbor in counts)
+
+    def count(self) -> int:
+        """Returns the number of shortest paths, 0 if there are none."""
+        return self.counts.get(self.source, 0)
+
+    def __iter__(self):
+        """Yields every shortest path as a list of (movie, person) index
+        pairs, holding only the current path and an iterator per step."""
+        if self.source not in self.counts:
+            return
+        if self.source == self.target:
+            yield []
+            return
+        path = []
+        stack = [iter(self.steps[self.source])]
+        while stack:
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+            path.append(step)
+            if step[1] == self.target:
+                yield list(path)
+                path.pop()
+            else:
+                stack.append(iter(self.steps[step[1]]))
@@ -0,0 +1,309 @@
+"""
+Landmark-based distance oracle for the degrees graph.
+
+K landmark people are chosen and the degrees of separation from each of them
+to everyone else are stored. By the triangle inequality, for any landmark L:
+
+    |d(L, u) - d(L, v)| <= d(u, v) <= d(L, u) + d(L, v)
+
+so the best bounds over all landmarks estimate any pair's distance in O(K)
+without searching. LandmarkIndex.shortest_path also uses them to prune an
+exact search.
+
+Examples:
+    $ python landmarks.py large --k 16
+    $ python landmarks.py large --query "Kevin Bacon" "Emma Watson"
+"""
+import argparse
+import os
+import random
+import sys
+
+import snapshot
+from graph import UNREACHABLE, CompactGraph, _trace
+
+# Name of the index file written next to the CSV files
+LANDMARKS_FILE = "degrees.landmarks"
+
+# Ways of choosing landmarks accepted by LandmarkIndex.build
+SELECTIONS = ("farthest", "degree", "random")
+
+
+class LandmarkIndex():
+    def __init__(self, graph: CompactGraph, landmarks: list,
+                 distances: list) -> None:
+        """Distances from a few landmark people to every person.
+
+        Args:
+            graph (CompactGraph): Graph the distances were computed on.
+            landmarks (list): Person index of every landmark.
+            distances (list): For every landmark, a bytearray (or memoryview)
+            with the distance to each person index.
+        """
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls,
+              graph: CompactGraph,
+              k: int = 16,
+              selection: str = "farthest",
+              seed: int = 0) -> "LandmarkIndex":
+        """Chooses k landmarks and runs a BFS from each of them.
+
+        Args:
+            graph (CompactGraph): Graph to index.
+            k (int, optional): Number of landmarks. Defaults to 16.
+            selection (str, optional): "farthest" starts from the best
+            connected person and repeatedly adds the person farthest from all
+            chosen landmarks, "degree" takes the k best connected people and
+            "random" samples people with at least one movie. Defaults to
+            "farthest".
+            seed (int, optional): Random seed for "random". Defaults to 0.
+
+        Raises:
+            ValueError: If selection is not one of SELECTIONS.
+
+        Returns:
+            LandmarkIndex: The built index.
+        """
+        if selection not in SELECTIONS:
+            raise ValueError(f'Unknown landmark selection: {selection}')
+        # rank people by how many co-star edges they have
+        degree = [
+            sum(len(graph.stars_of(movie)) for movie in graph.movies_of(person))
+            for person in range(graph.num_people)
+        ]
+        candidates = [person for person in range(graph.num_people)
+                      if degree[person] > 0]
+        k = min(k, len(candidates))
+        if selection == "degree":
+            landmarks = sorted(candidates, key=lambda p: -degree[p])[:k]
+            return cls(graph, landmarks,
+                       [graph.distance_array(p) for p in landmarks])
+        if selection == "random":
+            landmarks = random.Random(seed).sample(candidates, k)
+            return cls(graph, landmarks,
+                       [graph.distance_array(p) for p in landmarks])
+
+        landmarks = []
+        distances = []
+        # distance from every person to the closest chosen landmark
+        closest = [UNREACHABLE] * graph.num_people
+
+        def spread(person):
+            # stay in the components already covered, so tiny components of
+            # a single movie do not use up the landmarks
+            distance = closest[person]
+            return (0 if distance == UNREACHABLE else distance, degree[person])
+
+        person = max(candidates, key=lambda p: degree[p]) if k else None
+        while len(landmarks) < k:
+            landmarks.append(person)
+            distances.append(graph.distance_array(person))
+            for other, distance in enumerate(distances[-1]):
+                if distance < closest[other]:
+                    closest[other] = distance
+            person = max(candidates, key=spread)
+            if closest[person] in (0, UNREACHABLE):
+                break
+        return cls(graph, landmarks, distances)
+
+    def save(self, path: str, sources: dict) -> None:
+        """Writes the index to a file.
+
+        Args:
+            path (str): Index file path.
+            sources (dict): snapshot.source_stats of the CSV files the graph
+            was loaded from, used to detect a stale index.
+        """
+        tables = {
+            "landmarks":
+            [self.graph.person_ids[person] for person in self.landmarks]
+        }
+        arrays = {
+            f"distances{i}": memoryview(distances)
+            for i, distances in enumerate(self.distances)
+        }
+        snapshot.write_snapshot(path, sources, tables, arrays)
+
+    @classmethod
+    def load(cls, path: str, graph: CompactGraph,
+             sources: dict) -> "LandmarkIndex":
+        """Memory-maps an index written by save.
+
+        Args:
+            path (str): Index file path.
+            graph (CompactGraph): Graph loaded from the same CSV files.
+            sources (dict): snapshot.source_stats of those CSV files.
+
+        Returns:
+            LandmarkIndex: The index, or None if the file is missing or was
+            built from different CSV files.
+        """
+        cached = snapshot.read_snapshot(path, sources)
+        if cached is None:
+            return None
+        tables, arrays = cached
+        landmarks = [graph.person_index[i] for i in tables["landmarks"]]
+        distances = [arrays[f"distances{i}"] for i in range(len(landmarks))]
+        if any(len(d) != graph.num_people for d in distances):
+            return None
+        return cls(graph, landmarks, distances)
+
+    def bounds(self, u: int, v: int) -> tuple:
+        """Returns lower and upper bounds on the distance between two people.
+
+        Args:
+            u (int): Person index.
+            v (int): Person index.
+
+        Returns:
+            tuple: (lower, upper). Both are None when some landmark shows the
+            two people are in different components. upper is None when no
+            landmark reaches them.
+        """
+        if u == v:
+            return 0, 0
+        lower = 1
+        upper = None
+        for distances in self.distances:
+            du = distances[u]
+            dv = distances[v]
+            if du == UNREACHABLE and dv == UNREACHABLE:
+                continue
+            if du == UNREACHABLE or dv == UNREACHABLE:
+                # exactly one of them shares a component with the landmark
+                return None, None
+            lower = max(lower, abs(du - dv))
+            if upper is None or du + dv < upper:
+                upper = du + dv
+        return lower, upper
+
+    def shortest_path(self, source: int, target: int, stats=None) -> list:
+        """Goal-directed breadth first search pruned by the landmark bounds.
+
+        A person discovered at depth d is dropped when d plus their lower
+        bound to the target exceeds the landmark upper bound for the query,
+        since no shortest path can run through them. Every layer is expanded
+        in order of lower bound, so people that look closest to the target
+        are tried first. Movies are marked visited as in the bipartite
+        strategy; pruning only depends on depth, so this stays exact.
+
+        Args:
+            source (int): Source person index.
+            target (int): Target person index.
+            stats (SearchStats, optional): Counters to update during the
+            search. Defaults to None.
+
+        Returns:
+            list: List of (movie, person) index pairs, or None if there is no
+            path.
+        """
+        if source == target:
+            return []
+        lower, upper = self.bounds(source, target)
+        if lower is None:
+            return None
+        graph = self.graph
+        # landmarks outside the query's component cannot tighten its bounds
+        landmarks = [(distances, distances[target])
+                     for distances in self.distances
+                     if distances[target] != UNREACHABLE]
+        parent_person = {source: source}
+        parent_movie = {}
+        visited_movies = bytearray(graph.num_movies)
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth += 1
+            candidates = []
+            for person in frontier:
+                if stats is not None:
+                    stats.expanded += 1
+                for movie in graph.movies_of(person):
+                    if visited_movies[movie]:
+                        if stats is not None:
+                            stats.cast_scans_skipped += 1
+                        continue
+                    visited_movies[movie] = 1
+                    stars = graph.stars_of(movie)
+                    if stats is not None:
+                        stats.cast_scans += 1
+                        stats.generated += len(stars)
+                    for neighbor in stars:
+                        if neighbor in parent_person:
+                            continue
+                        parent_person[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        if neighbor == target:
+                            return _trace(target, source, parent_person,
+                                          parent_movie)
+                        if upper is not None and depth >= upper:
+                            # the bound is at least 1, so this is pruned
+                            continue
+                        bound = 1
+                        for distances, target_distance in landmarks:
+                            gap = distances[neighbor] - target_distance
+                            if gap > bound:
+                                bound = gap
+                            elif -gap > bound:
+                                bound = -gap
+                        if upper is None or depth + bound <= upper:
+                            candidates.append((bound, neighbor))
+            candidates.sort()
+            frontier = [person for _, person in candidates]
+        return None
+
+
+def main() -> None:
+    import degrees
+
+    parser = argparse.ArgumentParser(
+        description="Build or query a landmark distance index.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--k", type=int, default=16)
+    parser.add_argument("--selection", choices=SELECTIONS, default="farthest")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output",
+                        help="index file, defaults to "
+                        f"DIRECTORY/{LANDMARKS_FILE}")
+    parser.add_argument("--query",
+                        nargs=2,
+                        metavar="PERSON",
+                        help="print distance bounds for two people instead "
+                        "of building")
+    args = parser.parse_args()
+    path = args.output or os.path.join(args.directory, LANDMARKS_FILE)
+
+    degrees.load_data(args.directory, "compact")
+    graph = degrees.compact_graph()
+    sources = degrees.source_stats(args.directory)
+    if args.query:
+        index = LandmarkIndex.load(path, graph, sources)
+        if index is None:
+            sys.exit(f"No up to date landmark index at {path}.")
+        people = []
+        for query in args.query:
+            person_ids = degrees.candidate_ids(query)
+            if len(person_ids) != 1:
+                sys.exit(f"Person not found or ambiguous: {query}")
+            people.append(graph.person_index[person_ids[0]])
+        lower, upper = index.bounds(*people)
+        if lower is None:
+            print("Not connected.")
+        else:
+            print(f"Between {lower} and {upper} degrees of separation.")
+        return
+
+    index = LandmarkIndex.build(graph, args.k, args.selection, args.seed)
+    index.save(path, sources)
+    names = [degrees.people[graph.person_ids[p]]["name"]
+             for p in index.landmarks]
+    print(f"Wrote {len(index.landmarks)} landmarks to {path}: "
+          f"{', '.join(names)}")
+
+
+if __name__ == "__main__":
+    main()
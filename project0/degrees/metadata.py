@@ -0,0 +1,178 @@
+"""
+On-demand access to the people and movies CSV files.
+
+Finding a path only needs the star edges; names, birth years, titles and
+release years are only needed to print a result. The "lazy" backend of
+degrees.py therefore keeps just the byte offset of every CSV row in memory
+and reads a row back when it is asked for. Rows are read with os.pread, so
+processes forked after loading can share the open file safely.
+
+Rows must fit on one line, as they do in the IMDB exports.
+"""
+import csv
+import os
+from array import array
+
+# Typecode of the byte offset arrays
+OFFSET_TYPE = "q"
+
+
+def row_offsets(path: str) -> tuple:
+    """Scans a CSV file for the ID and byte offset of every row.
+
+    The ID is the unquoted first column, which is all that is parsed.
+
+    Args:
+        path (str): CSV file with an id first column and a header row.
+
+    Returns:
+        tuple: (ids, offsets) with the ID and offset of every non-empty row,
+        in file order.
+    """
+    ids = []
+    offsets = array(OFFSET_TYPE)
+    with open(path, "rb") as f:
+        offset = len(f.readline())
+        for line in f:
+            if line.strip():
+                ids.append(line.split(b",", 1)[0].strip().strip(b'"').decode(
+                    "utf-8"))
+                offsets.append(offset)
+            offset += len(line)
+    return ids, offsets
+
+
+class CSVRows():
+    def __init__(self, path: str) -> None:
+        """Reads single rows of a CSV file by byte offset.
+
+        Args:
+            path (str): CSV file with a header row.
+        """
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.fields = self.read(0)
+
+    def read(self, offset: int) -> list:
+        """Returns the parsed row starting at a byte offset."""
+        line = b""
+        chunk_size = 256
+        while True:
+            chunk = os.pread(self.fd, chunk_size, offset + len(line))
+            end = chunk.find(b"\n")
+            if end != -1 or len(chunk) < chunk_size:
+                line += chunk if end == -1 else chunk[:end]
+                break
+            line += chunk
+        return next(csv.reader([line.rstrip(b"\r").decode("utf-8")]), [])
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except (AttributeError, OSError):
+            pass
+
+
+class LazyTable():
+    def __init__(self, rows: CSVRows, index: dict, offsets: array) -> None:
+        """Read-mostly mapping from ID to the other columns of a CSV row.
+
+        It stands in for the people or movies dict of degrees.py, returning
+        a fresh dict such as {"name": ..., "birth": ...} on every lookup.
+        Rows assigned after loading (by apply_delta) are kept in memory.
+
+        Args:
+            rows (CSVRows): The CSV file.
+            index (dict): Maps IDs to row numbers, such as
+            CompactGraph.person_index.
+            offsets (array): Byte offset of every row number.
+        """
+        self.rows = rows
+        self.index = index
+        self.offsets = offsets
+        self.added = {}
+
+    def __getitem__(self, key: str) -> dict:
+        if key in self.added:
+            return self.added[key]
+        values = self.rows.read(self.offsets[self.index[key]])
+        return dict(zip(self.rows.fields[1:], values[1:]))
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        self.added[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index or key in self.added
+
+    def __iter__(self):
+        yield from self.index
+        yield from (key for key in self.added if key not in self.index)
+
+    def __len__(self) -> int:
+        return len(self.index) + sum(1 for key in self.added
+                                     if key not in self.index)
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self else default
+
+    def columns(self, keys: list, fields: list) -> list:
+        """Reads some columns for many IDs in one sequential pass.
+
+        Args:
+            keys (list): IDs to read.
+            fields (list): Column names to read.
+
+        Returns:
+            list: For every field, the list of its values for keys.
+        """
+        position = {key: i for i, key in enumerate(keys)}
+        columns = [self.rows.fields.index(field) for field in fields]
+        values = [[""] * len(keys) for _ in fields]
+        with open(self.rows.path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                i = position.get(row[0]) if row else None
+                if i is not None:
+                    for field_values, column in zip(values, columns):
+                        field_values[i] = row[column]
+        for key, row in self.added.items():
+            if key in position:
+                for field_values, field in zip(values, fields):
+                    field_values[position[key]] = row[field]
+        return values
+
+
+class LazyNames():
+    def __init__(self, rows: CSVRows, column: str = "name") -> None:
+        """Mapping from lowercased name to the set of matching IDs, answered
+        by scanning the CSV file instead of holding every name in memory.
+
+        Args:
+            rows (CSVRows): The people CSV file.
+            column (str, optional): Name column. Defaults to "name".
+        """
+        self.rows = rows
+        self.column = self.rows.fields.index(column)
+        self.added = {}
+
+    def get(self, key: str, default=None) -> set:
+        """Returns the IDs of everyone whose lowercased name is key."""
+        person_ids = set(self.added.get(key, ()))
+        with open(self.rows.path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if len(row) > self.column and row[self.column].lower() == key:
+                    person_ids.add(row[0])
+        return person_ids if person_ids else default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def setdefault(self, key: str, default: set) -> set:
+        """Returns the in-memory set of IDs added under a name."""
+        return self.added.setdefault(key, default)
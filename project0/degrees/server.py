@@ -0,0 +1,299 @@
+"""
+Long-running degrees query server.
+
+The dataset is loaded once, then queries are answered over HTTP on
+localhost or on a Unix socket. Searches run in a pool of worker processes
+forked after loading, so a slow query never holds up name lookups or other
+searches. Every response is timed, and /metrics reports latency percentiles
+per endpoint.
+
+Endpoints (GET only, JSON responses):
+    /path?source=A&target=B[&strategy=S]  Same result as degrees.py --batch.
+    /people?name=N                        People matching an ID or name.
+    /metrics                              Request counts and latencies.
+
+Examples:
+    $ python server.py large --port 8000
+    $ curl 'localhost:8000/path?source=Kevin+Bacon&target=Tom+Hanks'
+    $ python server.py large --unix /tmp/degrees.sock
+    $ curl --unix-socket /tmp/degrees.sock 'localhost/people?name=Tom+Hanks'
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import gc
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import degrees
+
+
+class LatencyMetrics():
+    def __init__(self, window: int = 1000) -> None:
+        """Request counts and recent latencies per endpoint.
+
+        Args:
+            window (int, optional): Number of latest requests per endpoint
+            the percentiles are computed over. Defaults to 1000.
+        """
+        self.window = window
+        self.counts = {}
+        self.errors = {}
+        self.latencies = {}
+
+    def record(self, endpoint: str, seconds: float, status: int) -> None:
+        """Records one answered request.
+
+        Args:
+            endpoint (str): Request path.
+            seconds (float): Time taken to answer.
+            status (int): HTTP status code of the response.
+        """
+        if endpoint not in self.counts:
+            self.counts[endpoint] = 0
+            self.errors[endpoint] = 0
+            self.latencies[endpoint] = deque(maxlen=self.window)
+        self.counts[endpoint] += 1
+        if status >= 400:
+            self.errors[endpoint] += 1
+        self.latencies[endpoint].append(seconds)
+
+    def summary(self) -> dict:
+        """Returns the count, error count and latency percentiles in
+        milliseconds of every endpoint."""
+        summary = {}
+        for endpoint, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            summary[endpoint] = {
+                "requests": self.counts[endpoint],
+                "errors": self.errors[endpoint],
+                "mean_ms": 1000 * sum(ordered) / len(ordered),
+                "max_ms": 1000 * ordered[-1]
+            }
+            for percentile in (50, 95, 99):
+                index = min(len(ordered) - 1, len(ordered) * percentile // 100)
+                summary[endpoint][f"p{percentile}_ms"] = 1000 * ordered[index]
+        return summary
+
+
+def lookup_people(query: str) -> list:
+    """Returns the ID, name and birth year of everyone matching a query.
+
+    Args:
+        query (str): Person ID or name.
+
+    Returns:
+        list: List of dicts, sorted by ID.
+    """
+    return [{
+        "id": person_id,
+        "name": degrees.people[person_id]["name"],
+        "birth": degrees.people[person_id]["birth"]
+    } for person_id in degrees.candidate_ids(query)]
+
+
+class DegreesServer():
+    def __init__(self, strategy: str = "bfs", workers: int = None) -> None:
+        """Answers HTTP queries against the data loaded in degrees.
+
+        Args:
+            strategy (str, optional): Default search strategy. Defaults to
+            "bfs".
+            workers (int, optional): Number of search worker processes.
+            Defaults to the number of CPUs.
+        """
+        self.strategy = strategy
+        self.workers = workers
+        self.metrics = LatencyMetrics()
+        self.executor = None
+
+    async def start(self,
+                    host: str = "127.0.0.1",
+                    port: int = 8000,
+                    unix: str = None) -> asyncio.AbstractServer:
+        """Starts listening on a TCP port, or on a Unix socket if given.
+
+        Args:
+            host (str, optional): Address to bind. Defaults to "127.0.0.1".
+            port (int, optional): TCP port, 0 picks a free one. Defaults to
+            8000.
+            unix (str, optional): Unix socket path. Defaults to None.
+
+        Returns:
+            asyncio.AbstractServer: The listening server.
+        """
+        if self.executor is None:
+            # the workers are forked from this process, so they share the
+            # loaded graph copy-on-write instead of loading their own
+            gc.freeze()
+            context = None
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=context)
+            # fork every worker now, before any client socket is open, or
+            # the workers would inherit connections and hold them open
+            self.executor.submit(int).result()
+        if unix is not None:
+            return await asyncio.start_unix_server(self.handle, unix)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self) -> None:
+        """Shuts down the search workers."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+            gc.unfreeze()
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """Answers one HTTP request and closes the connection."""
+        start = time.perf_counter()
+        endpoint = None
+        try:
+            request_line = await reader.readline()
+            # the headers are not needed, but must be read before replying
+            while (await reader.readline()).strip():
+                pass
+            try:
+                method, target, _ = request_line.decode("latin-1").split()
+            except ValueError:
+                status, body = HTTPStatus.BAD_REQUEST, {
+                    "error": "Malformed request line"
+                }
+            else:
+                url = urlsplit(target)
+                endpoint = url.path
+                status, body = await self.route(method, url.path,
+                                                parse_qs(url.query))
+        except Exception as error:
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {
+                "error": str(error)
+            }
+
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+        seconds = time.perf_counter() - start
+        if endpoint is not None:
+            self.metrics.record(endpoint, seconds, status.value)
+        print(f"{status.value} {endpoint} {seconds * 1000:.2f}ms",
+              file=sys.stderr)
+
+    async def route(self, method: str, path: str, params: dict) -> tuple:
+        """Dispatches a request to its endpoint.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Request path.
+            params (dict): Parsed query string, as returned by parse_qs.
+
+        Returns:
+            tuple: (HTTPStatus, JSON-serialisable body).
+        """
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {
+                "error": f"Unsupported method: {method}"
+            }
+        if path == "/metrics":
+            return HTTPStatus.OK, self.metrics.summary()
+        if path == "/people":
+            if "name" not in params:
+                return HTTPStatus.BAD_REQUEST, {"error": "Missing name"}
+            # name lookups can scan the CSV files under the lazy backend
+            loop = asyncio.get_running_loop()
+            people = await loop.run_in_executor(self.executor, lookup_people,
+                                                params["name"][0])
+            return HTTPStatus.OK, people
+        if path == "/path":
+            if "source" not in params or "target" not in params:
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": "Missing source or target"
+                }
+            strategy = params.get("strategy", [self.strategy])[0]
+            if strategy not in degrees.available_strategies():
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": f"Unknown strategy: {strategy}"
+                }
+            query = (params["source"][0], params["target"][0], strategy)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor,
+                                                degrees.answer_query, query)
+            if "error" in result:
+                return HTTPStatus.NOT_FOUND, result
+            return HTTPStatus.OK, result
+        return HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint: {path}"}
+
+
+async def serve(server: DegreesServer,
+                host: str = "127.0.0.1",
+                port: int = 8000,
+                unix: str = None) -> None:
+    """Runs the server until it is cancelled."""
+    listener = await server.start(host, port, unix)
+    address = unix or f"http://{host}:{listener.sockets[0].getsockname()[1]}"
+    print(f"Listening on {address}", file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve degrees queries over HTTP.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix",
+                        metavar="PATH",
+                        help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--strategy",
+                        choices=sorted(degrees.STRATEGIES),
+                        default="bfs")
+    parser.add_argument("--backend",
+                        choices=degrees.BACKENDS,
+                        default="compact")
+    parser.add_argument("--snapshot",
+                        dest="use_snapshot",
+                        action="store_true",
+                        help="cache the parsed data in a snapshot file next "
+                        "to the CSV files and load it on later runs")
+    parser.add_argument("--workers",
+                        type=int,
+                        help="search worker processes, defaults to the "
+                        "number of CPUs")
+    parser.add_argument("--landmarks",
+                        metavar="FILE",
+                        help="landmark index built by landmarks.py")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, args.backend, args.use_snapshot)
+    if args.landmarks is not None and degrees.load_landmarks(
+            args.directory, args.landmarks) is None:
+        sys.exit(f"No up to date landmark index at {args.landmarks}.")
+    print("Data loaded.", file=sys.stderr)
+    try:
+        asyncio.run(
+            serve(DegreesServer(args.strategy, args.workers), args.host,
+                  args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
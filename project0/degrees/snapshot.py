@@ -0,0 +1,143 @@
+"""
+Binary snapshot files that let degrees.py skip parsing the CSVs at startup.
+
+A snapshot file is laid out as:
+
+    MAGIC | header length (8 bytes, little endian) | JSON header | sections
+
+The JSON header records the size and modification time of every source file
+the snapshot was built from, plus the offset, length and type of each
+section. Sections are either string tables (NUL separated UTF-8) or integer
+arrays in native byte order. Arrays are 8-byte aligned so that read_snapshot
+can expose them as zero-copy memoryviews over a memory map of the file.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"DEGREES-SNAPSHOT"
+VERSION = 1
+SEPARATOR = "\0"
+
+
+def source_stats(paths: list) -> dict:
+    """Returns the size and modification time of every source file.
+
+    Args:
+        paths (list): Paths of the files a snapshot is built from.
+
+    Returns:
+        dict: Maps file name to [size, mtime_ns].
+    """
+    stats = {}
+    for path in paths:
+        stat = os.stat(path)
+        stats[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+
+def write_snapshot(path: str, sources: dict, tables: dict,
+                   arrays: dict) -> None:
+    """Writes string tables and integer arrays to a snapshot file.
+
+    The file is written next to its final location and renamed into place,
+    so readers never observe a partially written snapshot.
+
+    Args:
+        path (str): Snapshot file path.
+        sources (dict): Result of source_stats for the files the data came
+        from.
+        tables (dict): Maps section name to a list of strings.
+        arrays (dict): Maps section name to an array (or memoryview).
+    """
+    blobs = []
+    sections = {}
+    offset = 0
+    for name, strings in tables.items():
+        blob = SEPARATOR.join(strings).encode("utf-8")
+        sections[name] = {"kind": "table", "offset": offset,
+                          "length": len(blob), "count": len(strings)}
+        blobs.append(blob)
+        offset += len(blob)
+    for name, values in arrays.items():
+        padding = -offset % 8
+        if padding:
+            blobs.append(b"\0" * padding)
+            offset += padding
+        blob = memoryview(values).cast("B")
+        sections[name] = {"kind": "array", "offset": offset,
+                          "length": len(blob), "typecode": values.typecode
+                          if hasattr(values, "typecode") else values.format}
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "sources": sources,
+        "sections": sections
+    }).encode("utf-8")
+    # pad the header so the first section starts 8-byte aligned
+    prefix_length = len(MAGIC) + 8 + len(header)
+    header += b" " * (-prefix_length % 8)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path: str,
+                  sources: dict,
+                  table_names: list = None) -> tuple:
+    """Maps a snapshot file into memory if it matches the source files.
+
+    Args:
+        path (str): Snapshot file path.
+        sources (dict): Result of source_stats for the current source files.
+        table_names (list, optional): String tables to decode, the others
+        are skipped. Defaults to None, which decodes every table.
+
+    Returns:
+        tuple: (tables, arrays) where tables maps section name to a list of
+        strings and arrays maps section name to a memoryview over the file,
+        or None if the snapshot is missing, stale or unreadable.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_length, ) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length))
+            if (header["version"] != VERSION
+                    or header["byteorder"] != sys.byteorder
+                    or header["sources"] != sources):
+                return None
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    base = len(MAGIC) + 8 + header_length
+    view = memoryview(data)
+    tables = {}
+    arrays = {}
+    for name, section in header["sections"].items():
+        start = base + section["offset"]
+        end = start + section["length"]
+        if section["kind"] == "table":
+            if table_names is not None and name not in table_names:
+                continue
+            if section["count"] == 0:
+                tables[name] = []
+            else:
+                tables[name] = str(view[start:end],
+                                   "utf-8").split(SEPARATOR)
+        else:
+            arrays[name] = view[start:end].cast(section["typecode"])
+    return tables, arrays
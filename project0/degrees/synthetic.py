@@ -0,0 +1,158 @@
+"""
+Generates synthetic people.csv, movies.csv and stars.csv files at any scale.
+
+Real filmographies and casts are heavy tailed: most people appear in one or
+two movies while a few appear in hundreds, and most casts are small while a
+few are huge. Both are reproduced here. Every movie draws its cast size from
+a discrete power law, and fills it with people picked in proportion to a
+power law "popularity" weight, so filmography sizes follow a power law too.
+Rows are written as they are generated, so only the per-person weights are
+held in memory.
+
+Examples:
+    $ python synthetic.py synthetic --people 200000 --movies 60000
+    $ python synthetic.py huge --people 5000000 --movies 2000000 --seed 1
+"""
+import argparse
+import bisect
+import csv
+import os
+import random
+from array import array
+from itertools import accumulate
+
+FIRST_NAMES = ("Ada", "Alan", "Ana", "Ben", "Carla", "Chen", "Dana", "Emma",
+               "Felix", "Grace", "Hugo", "Ines", "Ivan", "Jin", "Kate", "Leo",
+               "Maria", "Nia", "Omar", "Priya", "Rosa", "Sam", "Tom", "Yuki")
+LAST_NAMES = ("Bacon", "Costa", "Diaz", "Evans", "Fischer", "Garcia", "Hall",
+              "Ito", "Jones", "Kim", "Lopez", "Moreau", "Novak", "Okafor",
+              "Park", "Quinn", "Rossi", "Smith", "Tanaka", "Weber", "Zhang")
+WORDS = ("Night", "City", "Last", "Return", "Dark", "Summer", "Secret",
+         "River", "Fire", "Lost", "Blue", "Kingdom", "Road", "Silent", "Star",
+         "Heart", "Winter", "Game", "Shadow", "Island")
+
+
+def power_law(rng: random.Random, exponent: float, minimum: int,
+              maximum: int) -> int:
+    """Samples an integer from minimum to maximum with P(k) roughly
+    k**-exponent.
+
+    Args:
+        rng (random.Random): Random number generator.
+        exponent (float): Power law exponent, greater than 1.
+        minimum (int): Smallest value returned, at least 1.
+        maximum (int): Largest value returned.
+
+    Returns:
+        int: The sample.
+    """
+    # inverse transform sampling of a continuous Pareto on [minimum, inf)
+    value = int(minimum * (1 - rng.random())**(-1 / (exponent - 1)))
+    return min(value, maximum)
+
+
+def generate(directory: str,
+             people: int = 100000,
+             movies: int = 30000,
+             cast_exponent: float = 2.5,
+             popularity_exponent: float = 2.5,
+             min_cast: int = 2,
+             max_cast: int = 200,
+             max_popularity: int = 1000,
+             seed: int = 0) -> dict:
+    """Writes a synthetic dataset in the format load_data reads.
+
+    Args:
+        directory (str): Output directory, created if missing.
+        people (int, optional): Number of people. Defaults to 100000.
+        movies (int, optional): Number of movies. Defaults to 30000.
+        cast_exponent (float, optional): Power law exponent of cast sizes.
+        Defaults to 2.5.
+        popularity_exponent (float, optional): Power law exponent of the
+        weights people are cast by, which shapes filmography sizes. Defaults
+        to 2.5.
+        min_cast (int, optional): Smallest cast size. Defaults to 2.
+        max_cast (int, optional): Largest cast size. Defaults to 200.
+        max_popularity (int, optional): Largest weight, relative to the least
+        popular person. Defaults to 1000.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Raises:
+        ValueError: If there are no people, min_cast is below 1 or the
+        exponents are not greater than 1.
+
+    Returns:
+        dict: Number of people, movies and stars rows written.
+    """
+    if people < 1 or min_cast < 1:
+        raise ValueError('At least one person per movie is needed')
+    if cast_exponent <= 1 or popularity_exponent <= 1:
+        raise ValueError('Power law exponents must be greater than 1')
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    popularity = (power_law(rng, popularity_exponent, 1, max_popularity)
+                  for _ in range(people))
+    cumulative = array("d", accumulate(popularity))
+    total = cumulative[-1]
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8",
+              newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(1, people + 1):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            writer.writerow([person, name, rng.randint(1900, 2010)])
+
+    stars = 0
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8",
+              newline="") as movies_file, open(
+                  os.path.join(directory, "stars.csv"), "w",
+                  encoding="utf-8", newline="") as stars_file:
+        movie_writer = csv.writer(movies_file)
+        star_writer = csv.writer(stars_file)
+        movie_writer.writerow(["id", "title", "year"])
+        star_writer.writerow(["person_id", "movie_id"])
+        # person IDs are 1 to people, movie IDs follow on so they never clash
+        for movie in range(people + 1, people + movies + 1):
+            title = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+            movie_writer.writerow([movie, title, rng.randint(1920, 2024)])
+            size = min(power_law(rng, cast_exponent, min_cast, max_cast),
+                       people)
+            cast = set()
+            # popular people are redrawn often, so give up on duplicates
+            # after a few tries rather than looping on tiny datasets
+            for _ in range(4 * size):
+                if len(cast) == size:
+                    break
+                index = bisect.bisect(cumulative, rng.random() * total)
+                cast.add(min(index, people - 1) + 1)
+            for person in sorted(cast):
+                star_writer.writerow([person, movie])
+            stars += len(cast)
+    return {"people": people, "movies": movies, "stars": stars}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic degrees dataset.")
+    parser.add_argument("directory")
+    parser.add_argument("--people", type=int, default=100000)
+    parser.add_argument("--movies", type=int, default=30000)
+    parser.add_argument("--cast-exponent", type=float, default=2.5)
+    parser.add_argument("--popularity-exponent", type=float, default=2.5)
+    parser.add_argument("--min-cast", type=int, default=2)
+    parser.add_argument("--max-cast", type=int, default=200)
+    parser.add_argument("--max-popularity", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.directory, args.people, args.movies,
+                      args.cast_exponent, args.popularity_exponent,
+                      args.min_cast, args.max_cast, args.max_popularity,
+                      args.seed)
+    print(f"Wrote {counts['people']} people, {counts['movies']} movies and "
+          f"{counts['stars']} stars to {args.directory}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,20 @@
+import asyncio
+import functools
+import io
+import json
+import shutil
+
 import pytest
 
+import analytics
+import benchmark
 import degrees
+import graph as graph_module
+import metadata
+import server
+import synthetic
+from util import (LRUCache, Node, PriorityFrontier, QueueFrontier,
+                  StackFrontier)
 
 def test_multiple_paths_small(capsys):
     input_values = ['Kevin Bacon', 'Sally Field']
@@ -134,4 +148,934 @@ def test_degree_multiple_runs(capsys, directory):
     degrees2 = out2.split('\n')[2].split('Name: Name: ')[1]
 
     assert (degrees1 == degrees2)
-    assert (err1 == '') & (err2 == '')
\ No newline at end of file
+    assert (err1 == '') & (err2 == '')
+
+
+@pytest.fixture()
+def small_data():
+    # this is a hack that should really be avoided. best to keep global vars inside functions or classes
+    degrees.names = {}
+    degrees.people = {}
+    degrees.movies = {}
+    degrees.load_data('small')
+
+
+def assert_valid_path(source, target, path, movies=None):
+    movies = degrees.movies if movies is None else movies
+    person_id = source
+    for movie_id, next_person_id in path:
+        assert person_id in movies[movie_id]['stars']
+        assert next_person_id in movies[movie_id]['stars']
+        person_id = next_person_id
+    assert person_id == target
+
+
+def test_bidirectional_matches_bfs(small_data):
+    for source in degrees.people:
+        for target in degrees.people:
+            bfs_path = degrees.shortest_path(source, target, 'bfs')
+            path = degrees.shortest_path(source, target, 'bidirectional')
+            if bfs_path is None:
+                assert path is None
+            else:
+                assert len(path) == len(bfs_path)
+                assert_valid_path(source, target, path)
+
+
+def test_bidirectional_expands_fewer_nodes(small_data):
+    # Tom Hanks and Dustin Hoffman are 3 degrees apart, and Tom Hanks's side
+    # of the graph is much bushier than Dustin Hoffman's
+    bfs_stats = degrees.SearchStats()
+    bidirectional_stats = degrees.SearchStats()
+    degrees.shortest_path('158', '163', 'bfs', bfs_stats)
+    degrees.shortest_path('158', '163', 'bidirectional', bidirectional_stats)
+    assert bidirectional_stats.expanded < bfs_stats.expanded
+
+
+def test_search_stats(small_data):
+    # Dustin Hoffman and Robin Wright are 4 degrees apart
+    for strategy in degrees.available_strategies():
+        stats = degrees.SearchStats()
+        degrees.shortest_path('163', '705', strategy, stats)
+        # the path has three intermediate people who must all be expanded
+        assert stats.expanded >= 3
+        assert stats.generated >= stats.expanded
+
+
+def test_compare_strategies_bypasses_tree_cache(small_data):
+    cache = degrees.enable_tree_cache()
+    try:
+        results = degrees.compare_strategies('163', '705')
+        assert set(results) == set(degrees.available_strategies())
+        for result in results.values():
+            assert result['degrees'] == 4
+            assert result['expanded'] > 0
+        assert len(cache) == 0
+        assert degrees.tree_cache is cache
+    finally:
+        degrees.disable_tree_cache()
+
+
+def test_unknown_strategy(small_data):
+    with pytest.raises(ValueError, match='Unknown search strategy'):
+        degrees.shortest_path('102', '398', 'dijkstra')
+
+
+def test_queue_frontier_order_and_membership():
+    frontier = QueueFrontier()
+    for state in ['a', 'b', 'a']:
+        frontier.add(Node(state, None, None))
+    assert frontier.contains_state('a')
+    assert frontier.remove().state == 'a'
+    # a second copy of 'a' is still queued
+    assert frontier.contains_state('a')
+    assert frontier.remove().state == 'b'
+    assert not frontier.contains_state('b')
+    assert frontier.remove().state == 'a'
+    assert not frontier.contains_state('a')
+    assert frontier.empty()
+    with pytest.raises(Exception, match='empty frontier'):
+        frontier.remove()
+
+
+def test_stack_frontier_order_and_membership():
+    frontier = StackFrontier()
+    for state in ['a', 'b']:
+        frontier.add(Node(state, None, None))
+    assert frontier.remove().state == 'b'
+    assert not frontier.contains_state('b')
+    assert frontier.contains_state('a')
+    assert frontier.remove().state == 'a'
+    assert frontier.empty()
+
+
+def test_priority_frontier_lazy_deletion():
+    frontier = PriorityFrontier()
+    assert frontier.add(Node('a', None, None, 5))
+    assert frontier.add(Node('b', None, None, 3))
+    # a cheaper 'a' replaces the queued one, a dearer 'b' is ignored
+    assert frontier.add(Node('a', None, None, 1))
+    assert not frontier.add(Node('b', None, None, 4))
+    assert frontier.cost('a') == 1
+    assert frontier.remove().cost == 1
+    assert not frontier.contains_state('a')
+    assert frontier.remove().state == 'b'
+    # the stale 'a' is still in the heap but not in the frontier
+    assert frontier.empty()
+    with pytest.raises(Exception, match='empty frontier'):
+        frontier.remove()
+
+
+@pytest.fixture()
+def reset_data():
+    degrees.clear_data()
+    yield
+    degrees.clear_data()
+
+
+def test_compact_graph_matches_dicts(small_data):
+    people = degrees.people
+    movies = degrees.movies
+    dict_neighbors = {
+        person_id: degrees.neighbors_for_person(person_id)
+        for person_id in people
+    }
+    dict_paths = {(source, target): degrees.shortest_path(source, target)
+                  for source in people for target in people}
+
+    degrees.clear_data()
+    degrees.load_data('small', 'compact')
+    assert degrees.graph.num_people == len(people)
+    assert degrees.graph.num_movies == len(movies)
+    for person_id, neighbors in dict_neighbors.items():
+        assert degrees.neighbors_for_person(person_id) == neighbors
+    for strategy in degrees.graph.strategies:
+        for (source, target), dict_path in dict_paths.items():
+            path = degrees.shortest_path(source, target, strategy)
+            if dict_path is None:
+                assert path is None
+            else:
+                assert len(path) == len(dict_path)
+                assert_valid_path(source, target, path, movies)
+    degrees.clear_data()
+
+
+def test_compact_main(capsys, reset_data):
+    input_values = ['Tom Cruise', 'Jack Nicholson']
+
+    def mock_input(s):
+        print(s, end='')
+        return input_values.pop(0)
+
+    degrees.input = mock_input
+    degrees.main('small', backend='compact')
+
+    out, err = capsys.readouterr()
+    assert out.endswith(
+        '1: Tom Cruise and Jack Nicholson starred in A Few Good Men\n')
+    assert 'stars' not in degrees.movies['104257']
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match='Unknown backend'):
+        degrees.load_data('small', 'sqlite')
+
+
+@pytest.fixture()
+def data_copy(tmp_path, reset_data):
+    for name in ['people', 'movies', 'stars']:
+        shutil.copy(f'small/{name}.csv', tmp_path / f'{name}.csv')
+    return tmp_path
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact'])
+def test_snapshot_round_trip(data_copy, monkeypatch, backend):
+    degrees.load_data(str(data_copy), backend, use_snapshot=True)
+    assert (data_copy / degrees.SNAPSHOT_FILE).exists()
+    expected_names = degrees.names
+    expected_people = {
+        person_id: degrees.neighbors_for_person(person_id)
+        for person_id in degrees.people
+    }
+
+    # the second load must not parse any CSV
+    def fail(*args, **kwargs):
+        raise AssertionError('CSV parsed despite a valid snapshot')
+
+    monkeypatch.setattr(degrees.csv, 'DictReader', fail)
+    degrees.clear_data()
+    degrees.load_data(str(data_copy), backend, use_snapshot=True)
+    assert degrees.names == expected_names
+    assert degrees.people['102']['name'] == 'Kevin Bacon'
+    assert degrees.movies['112384']['title'] == 'Apollo 13'
+    for person_id, neighbors in expected_people.items():
+        assert degrees.neighbors_for_person(person_id) == neighbors
+    assert len(degrees.shortest_path('163', '705')) == 4
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact', 'lazy'])
+def test_no_snapshot_by_default(data_copy, backend):
+    degrees.load_data(str(data_copy), backend)
+    assert not (data_copy / degrees.SNAPSHOT_FILE).exists()
+
+
+def test_snapshot_invalidated_by_csv_change(data_copy):
+    degrees.load_data(str(data_copy), use_snapshot=True)
+    with open(data_copy / 'people.csv', 'a', encoding='utf-8') as f:
+        f.write('999,"New Person",2000\n')
+    degrees.clear_data()
+    degrees.load_data(str(data_copy), use_snapshot=True)
+    assert degrees.people['999']['name'] == 'New Person'
+
+
+def test_no_snapshot(data_copy):
+    degrees.load_data(str(data_copy), use_snapshot=False)
+    assert not (data_copy / degrees.SNAPSHOT_FILE).exists()
+
+
+def test_candidate_ids(small_data):
+    assert degrees.candidate_ids('kevin bacon') == ['102']
+    assert degrees.candidate_ids('102') == ['102']
+    assert degrees.candidate_ids('Nobody') == []
+
+
+def test_read_queries(tmp_path):
+    path = tmp_path / 'pairs.csv'
+    path.write_text('"Bacon, Kevin",Tom Hanks\n\n# skipped\n102, 398\n')
+    assert degrees.read_queries(str(path)) == [('Bacon, Kevin', 'Tom Hanks'),
+                                               ('102', '398')]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch(small_data, workers):
+    pairs = [('Kevin Bacon', 'Sally Field'), ('Tom Cruise', '197'),
+             ('Nobody', 'Tom Hanks'), ('Emma Watson', 'Kevin Bacon')]
+    output = io.StringIO()
+    degrees.run_batch(pairs, output, workers=workers)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result['source'] for result in results] == [
+        'Kevin Bacon', 'Tom Cruise', 'Nobody', 'Emma Watson'
+    ]
+    assert results[0]['degrees'] == 2
+    assert results[1]['path'] == [['104257', '197']]
+    assert results[2]['error'] == 'Person not found: Nobody'
+    assert results[3]['degrees'] is None
+
+
+def test_run_batch_strategy_error(small_data):
+    output = io.StringIO()
+    degrees.run_batch([('Kevin Bacon', 'Tom Hanks')], output,
+                      strategy='landmark', workers=1)
+    result = json.loads(output.getvalue())
+    assert result['source_id'] == '102'
+    assert 'landmark' in result['error']
+    assert 'degrees' not in result
+
+
+def test_build_adjacency(small_data):
+    full = {
+        person_id: degrees.neighbors_for_person(person_id)
+        for person_id in degrees.people
+    }
+    degrees.build_adjacency()
+    for person_id, neighbors in full.items():
+        adjacent = degrees.neighbors_for_person(person_id)
+        co_stars = [neighbor_id for _, neighbor_id in adjacent]
+        assert len(co_stars) == len(set(co_stars))
+        assert person_id not in co_stars
+        # every witness is a real shared movie
+        assert adjacent <= neighbors
+        assert set(co_stars) == {p for _, p in neighbors} - {person_id}
+    assert len(degrees.shortest_path('163', '705')) == 4
+
+    degrees.load_data('small')
+    assert degrees.adjacency is None
+
+
+def test_neighbor_cache(small_data):
+    cache = degrees.enable_neighbor_cache(2)
+    try:
+        first = degrees.neighbors_for_person('102')
+        assert degrees.neighbors_for_person('102') is first
+        degrees.neighbors_for_person('158')
+        degrees.neighbors_for_person('129')
+        assert cache.info()['hits'] == 1
+        assert cache.info()['misses'] == 3
+        assert cache.info()['evictions'] == 1
+        assert '102' not in cache
+        assert len(degrees.shortest_path('163', '705')) == 4
+    finally:
+        degrees.disable_neighbor_cache()
+
+
+def test_lru_cache_sizeof():
+    cache = LRUCache(10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    assert cache.get('a') == 'xxxx'
+    cache.put('c', 'xxxx')
+    # 'b' was least recently used
+    assert 'b' not in cache
+    assert cache.size == 8
+    assert cache.get('b') is None
+    assert cache.info()['misses'] == 1
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact'])
+def test_bipartite_scans_each_cast_once(reset_data, backend):
+    degrees.load_data('small', backend, use_snapshot=False)
+    for source in degrees.people:
+        for target in degrees.people:
+            bfs_path = degrees.shortest_path(source, target, 'bfs')
+            stats = degrees.SearchStats()
+            path = degrees.shortest_path(source, target, 'bipartite', stats)
+            assert (path is None) == (bfs_path is None)
+            if path is not None:
+                assert len(path) == len(bfs_path)
+            assert stats.cast_scans <= len(degrees.movies)
+
+    # Dustin Hoffman and Robin Wright: Tom Cruise and Kevin Bacon share
+    # A Few Good Men, so its cast is walked once and skipped afterwards
+    bfs_stats = degrees.SearchStats()
+    stats = degrees.SearchStats()
+    degrees.shortest_path('163', '705', 'bfs', bfs_stats)
+    degrees.shortest_path('163', '705', 'bipartite', stats)
+    assert stats.cast_scans_skipped > 0
+    assert stats.cast_scans < bfs_stats.cast_scans
+
+
+def test_landmark_bounds_and_search(data_copy):
+    degrees.load_data(str(data_copy))
+    assert 'landmark' not in degrees.available_strategies()
+    with pytest.raises(ValueError, match='landmark'):
+        degrees.shortest_path('102', '398', 'landmark')
+
+    index = degrees.build_landmarks(k=3)
+    assert len(index.landmarks) == 3
+    for source in degrees.people:
+        for target in degrees.people:
+            path = degrees.shortest_path(source, target, 'bfs')
+            lower, upper = degrees.distance_bounds(source, target)
+            landmark_path = degrees.shortest_path(source, target, 'landmark')
+            if path is None:
+                assert landmark_path is None
+                continue
+            if lower is not None:
+                assert lower <= len(path)
+            if upper is not None:
+                assert len(path) <= upper
+            assert len(landmark_path) == len(path)
+            assert_valid_path(source, target, landmark_path)
+
+    # Emma Watson shares no component with Kevin Bacon, a landmark
+    assert degrees.distance_bounds('914612', '102') == (None, None)
+
+    index.save(str(data_copy / 'degrees.landmarks'),
+               degrees.source_stats(str(data_copy)))
+    degrees.load_data(str(data_copy))
+    assert degrees.landmark_index is None
+    loaded = degrees.load_landmarks(str(data_copy))
+    assert loaded.landmarks == index.landmarks
+    assert 'landmark' in degrees.available_strategies()
+    assert len(degrees.shortest_path('163', '705', 'landmark')) == 4
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact'])
+def test_components(data_copy, monkeypatch, backend):
+    degrees.load_data(str(data_copy), backend, use_snapshot=False)
+    assert degrees.components is None
+    labels = degrees.build_components()
+    assert len(labels) == 2
+    assert labels.largest() == [15, 1]
+    assert labels.size('914612') == 1
+    assert labels.connected('102', '705')
+    assert not labels.connected('102', '914612')
+
+    # disconnected pairs are answered without expanding anyone
+    stats = degrees.SearchStats()
+    assert degrees.shortest_path('102', '914612', 'bfs', stats) is None
+    assert stats.expanded == 0
+
+    # the labels are cached with the snapshot
+    degrees.load_data(str(data_copy), backend, use_snapshot=True)
+    monkeypatch.setattr(degrees.ComponentIndex, 'build', None)
+    degrees.load_data(str(data_copy), backend, use_snapshot=True)
+    assert degrees.components.largest() == [15, 1]
+    assert not degrees.components.connected('102', '914612')
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_distances_from(small_data, compact):
+    tree = degrees.distances_from('102', compact=compact)
+    assert tree.complete
+    assert tree.level_sizes == [1, 6, 5, 3]
+    assert len(tree) == 15
+    assert '914612' not in tree
+    assert tree.distance('914612') is None
+    assert tree.path_to('914612') is None
+    assert tree.path_to('102') == []
+    for person_id in degrees.people:
+        path = degrees.shortest_path('102', person_id)
+        if path is None:
+            continue
+        assert tree.distance(person_id) == len(path)
+        assert_valid_path('102', person_id, tree.path_to(person_id))
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_distances_from_max_depth(small_data, compact):
+    tree = degrees.distances_from('102', max_depth=1, compact=compact)
+    assert not tree.complete
+    assert tree.level_sizes == [1, 6]
+    # Dustin Hoffman is 2 degrees away
+    assert tree.distance('163') is None
+    tree.expand_level()
+    assert tree.distance('163') == 2
+
+
+@pytest.fixture()
+def tree_cache():
+    cache = degrees.enable_tree_cache()
+    yield cache
+    degrees.disable_tree_cache()
+
+
+def test_tree_cache_matches_bfs(small_data, tree_cache):
+    for source in degrees.people:
+        for target in degrees.people:
+            path = degrees.shortest_path(source, target)
+            degrees.disable_tree_cache()
+            bfs_path = degrees.shortest_path(source, target)
+            degrees.tree_cache = tree_cache
+            if bfs_path is None:
+                assert path is None
+            else:
+                assert len(path) == len(bfs_path)
+                assert_valid_path(source, target, path)
+    # one tree per source, reused for every other target
+    assert len(tree_cache) == len(degrees.people)
+    assert tree_cache.info()['hits'] > 0
+
+
+def test_tree_cache_resumes_partial_tree(small_data, tree_cache):
+    # Kevin Bacon and Tom Cruise are 1 degree apart, Dustin Hoffman 2
+    assert len(degrees.shortest_path('102', '129')) == 1
+    tree = tree_cache.entries['102']
+    assert tree.depth == 1 and not tree.complete
+    stats = degrees.SearchStats()
+    assert len(degrees.shortest_path('102', '163', stats=stats)) == 2
+    assert tree_cache.entries['102'] is tree
+    assert tree.depth == 2
+    # only the second level was expanded
+    assert stats.expanded == tree.level_sizes[1]
+
+
+def test_tree_cache_reverses_target_tree(small_data, tree_cache):
+    path = degrees.shortest_path('102', '163')
+    reverse = degrees.shortest_path('163', '102')
+    assert '163' not in tree_cache
+    assert len(reverse) == len(path)
+    assert_valid_path('163', '102', reverse)
+
+
+def test_tree_cache_evicts(small_data):
+    cache = degrees.enable_tree_cache(max_bytes=1)
+    try:
+        degrees.shortest_path('102', '163')
+        degrees.shortest_path('129', '163')
+        assert list(cache.entries) == ['129']
+        assert cache.evictions == 1
+    finally:
+        degrees.disable_tree_cache()
+
+
+def test_tree_cache_compact(reset_data, tree_cache):
+    degrees.load_data('small', 'compact')
+    assert len(degrees.shortest_path('102', '163')) == 2
+    assert degrees.shortest_path('102', '102') == []
+    assert isinstance(tree_cache.entries['102'], degrees.DistanceTree)
+
+
+def distance_histogram(graph, person):
+    histogram = []
+    for distance in graph.distance_array(person):
+        if distance == graph_module.UNREACHABLE:
+            continue
+        histogram.extend([0] * (distance + 1 - len(histogram)))
+        histogram[distance] += 1
+    return histogram
+
+
+def test_multi_source_bfs(small_data):
+    graph = degrees.compact_graph()
+    sources = list(range(graph.num_people))
+    histograms = analytics.multi_source_bfs(graph, sources)
+    for person, histogram in zip(sources, histograms):
+        assert histogram == distance_histogram(graph, person)
+    with pytest.raises(ValueError):
+        analytics.multi_source_bfs(graph, [0] * (analytics.BATCH_SIZE + 1))
+
+
+def test_bit_counts():
+    masks = [0b101, 0b111, 0b100, 0]
+    assert analytics._bit_counts(masks, 4) == [2, 1, 3, 0]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_separation_histograms(small_data, monkeypatch, workers):
+    monkeypatch.setattr(analytics, 'BATCH_SIZE', 3)
+    graph = degrees.compact_graph()
+    sources = analytics.sample_sources(graph, 100)
+    histograms = analytics.separation_histograms(graph, sources, workers)
+    assert histograms == [distance_histogram(graph, s) for s in sources]
+
+
+def test_summarize():
+    # one source reaches 2 people at 1 and 1 at 2, the other 1 at 1
+    result = analytics.summarize([[1, 2, 1], [1, 1]])
+    assert result['histogram'] == [2, 3, 1]
+    assert result['pairs'] == 4
+    assert result['mean_separation'] == pytest.approx(5 / 4)
+    low, high = result['mean_separation_interval']
+    assert low <= 5 / 4 <= high
+    assert result['mean_eccentricity'] == 1.5
+    assert result['max_eccentricity'] == 2
+    assert result['effective_diameter'] == 2
+    with pytest.raises(ValueError):
+        analytics.summarize([])
+
+
+async def http_get(port, target):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b'\r\n\r\n', 1)
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_server(small_data):
+    async def run():
+        server_ = server.DegreesServer(workers=1)
+        listener = await server_.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            status, body = await http_get(
+                port, '/path?source=Kevin+Bacon&target=163')
+            assert status == 200
+            assert body['degrees'] == 2
+            assert_valid_path('102', '163', body['path'])
+            status, body = await http_get(port, '/people?name=tom+cruise')
+            assert status == 200
+            assert [person['id'] for person in body] == ['129']
+            status, body = await http_get(port,
+                                          '/path?source=nobody&target=102')
+            assert status == 404
+            status, _ = await http_get(port, '/path?source=102')
+            assert status == 400
+            status, _ = await http_get(port, '/nowhere')
+            assert status == 404
+            status, body = await http_get(port, '/metrics')
+            assert status == 200
+            assert body['/path']['requests'] == 3
+            assert body['/path']['errors'] == 2
+            assert body['/path']['p50_ms'] <= body['/path']['max_ms']
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server_.close()
+
+    asyncio.run(run())
+
+
+def test_synthetic_dataset(tmp_path, reset_data):
+    counts = synthetic.generate(tmp_path, people=500, movies=200, seed=1)
+    degrees.load_data(tmp_path, use_snapshot=False)
+    assert len(degrees.people) == counts['people'] == 500
+    assert len(degrees.movies) == counts['movies'] == 200
+    casts = [len(movie['stars']) for movie in degrees.movies.values()]
+    assert sum(casts) == counts['stars']
+    assert min(casts) >= 2
+    # a heavy tail: the largest cast dwarfs the typical one
+    assert max(casts) > 3 * sorted(casts)[len(casts) // 2]
+    # the same seed writes the same files
+    first = (tmp_path / 'stars.csv').read_text()
+    synthetic.generate(tmp_path, people=500, movies=200, seed=1)
+    assert (tmp_path / 'stars.csv').read_text() == first
+
+
+def test_benchmark_suite(reset_data):
+    results = benchmark.run_suite('small', queries=5)
+    json.dumps(results)
+    assert set(results['backends']) == set(degrees.BACKENDS)
+    for result in results['backends'].values():
+        assert result['load_seconds'] >= 0
+        assert result['neighbors']['count'] > 0
+        for summary in result['strategies'].values():
+            assert summary['count'] == 5
+            assert summary['p50_ms'] <= summary['p99_ms'] <= summary['max_ms']
+
+
+def write_delta(directory):
+    directory.mkdir()
+    (directory / 'people.csv').write_text(
+        'id,name,birth\n999,"New Actor",2000\n102,"Kevin Bacon",1958\n')
+    (directory / 'movies.csv').write_text(
+        'id,title,year\n5000,"Delta Movie",2024\n')
+    (directory / 'stars.csv').write_text(
+        'person_id,movie_id\n999,5000\n914612,5000\n102,5000\n163,5000\n'
+        '102,104257\n404,5000\n999,5000\n')
+
+
+def test_compact_graph_extended(small_data):
+    base = degrees.compact_graph()
+    edges = [(base.person_index['102'], base.movie_index['95953']),
+             (base.num_people, base.movie_index['95953']),
+             (base.num_people, base.num_movies)]
+    extended = base.extended(['999'], ['5000'], edges)
+    degrees.people['999'] = {'name': 'New', 'birth': '', 'movies': set()}
+    degrees.movies['5000'] = {'title': 'New', 'year': '', 'stars': set()}
+    for person_id, movie_id in [('102', '95953'), ('999', '95953'),
+                                ('999', '5000')]:
+        degrees.people[person_id]['movies'].add(movie_id)
+        degrees.movies[movie_id]['stars'].add(person_id)
+    rebuilt = degrees.CompactGraph.from_dicts(degrees.people, degrees.movies)
+    for person_id in degrees.people:
+        assert (extended.neighbors_for_person(person_id) ==
+                rebuilt.neighbors_for_person(person_id))
+    assert extended.person_ids[:base.num_people] == base.person_ids
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact'])
+def test_apply_delta(data_copy, tmp_path, backend):
+    degrees.load_data(str(data_copy), backend, use_snapshot=True)
+    degrees.build_adjacency()
+    degrees.enable_tree_cache()
+    try:
+        assert degrees.shortest_path('102', '914612') is None
+        assert len(degrees.shortest_path('102', '163')) == 2
+        write_delta(tmp_path / 'delta')
+        counts = degrees.apply_delta(str(tmp_path / 'delta'), str(data_copy))
+        assert counts == {'people': 1, 'movies': 1, 'stars': 4}
+        assert '102' not in degrees.tree_cache
+        assert len(degrees.components) == 1
+        assert degrees.names['new actor'] == {'999'}
+        path = degrees.shortest_path('102', '914612')
+        assert path == [('5000', '914612')]
+        assert len(degrees.shortest_path('102', '163')) == 1
+        assert ('5000', '999') in degrees.neighbors_for_person('163')
+    finally:
+        degrees.disable_tree_cache()
+
+    # the CSVs and snapshot now include the delta
+    assert (data_copy / 'stars.csv').read_text().endswith('163,5000\n')
+    for use_snapshot in [True, False]:
+        degrees.clear_data()
+        degrees.load_data(str(data_copy), backend, use_snapshot)
+        assert degrees.shortest_path('102', '914612') == [('5000', '914612')]
+        assert len(degrees.build_components()) == 1
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact', 'lazy'])
+def test_apply_delta_repeated_ids(data_copy, tmp_path, backend):
+    degrees.load_data(str(data_copy), backend)
+    degrees.build_adjacency()
+    delta = tmp_path / 'delta'
+    delta.mkdir()
+    (delta / 'people.csv').write_text(
+        'id,name,birth\n999,"New",2000\n999,"Again",2001\n')
+    (delta / 'movies.csv').write_text(
+        'id,title,year\n5000,"New",2024\n5000,"Again",2025\n')
+    (delta / 'stars.csv').write_text('person_id,movie_id\n999,5000\n'
+                                     '102,5000\n')
+    counts = degrees.apply_delta(str(delta))
+    assert counts == {'people': 1, 'movies': 1, 'stars': 2}
+    assert degrees.people['999']['name'] == 'New'
+    assert degrees.movies['5000']['title'] == 'New'
+    edges = degrees.compact_graph()
+    assert edges.num_people == len(degrees.people)
+    assert edges.num_movies == len(degrees.movies)
+    assert degrees.shortest_path('102', '999') == [('5000', '999')]
+
+
+def test_apply_delta_keeps_untouched_trees(data_copy, tmp_path):
+    degrees.load_data(str(data_copy), 'compact')
+    degrees.build_components()
+    degrees.enable_tree_cache()
+    try:
+        degrees.shortest_path('102', '163')
+        delta = tmp_path / 'delta'
+        delta.mkdir()
+        (delta / 'people.csv').write_text('id,name,birth\n999,"New",2000\n')
+        (delta / 'movies.csv').write_text('id,title,year\n5000,"New",2024\n')
+        (delta / 'stars.csv').write_text(
+            'person_id,movie_id\n999,5000\n914612,5000\n')
+        degrees.apply_delta(str(delta))
+        assert '102' in degrees.tree_cache
+        assert len(degrees.components) == 2
+        assert degrees.components.size('999') == 2
+        assert len(degrees.shortest_path('102', '163')) == 2
+        assert degrees.shortest_path('102', '999') is None
+        assert degrees.shortest_path('999', '914612') == [('5000', '914612')]
+    finally:
+        degrees.disable_tree_cache()
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact'])
+def test_constrained_path(reset_data, backend):
+    degrees.load_data('small', backend)
+    # Kevin Bacon reaches Sally Field through Apollo 13 (1995)
+    path = degrees.constrained_path('102', '398')
+    assert len(path) == len(degrees.shortest_path('102', '398')) == 2
+    assert path[0][0] == '112384'
+    assert degrees.constrained_path('102', '398', max_year=1994) is None
+    assert len(degrees.constrained_path('102', '398', min_year=1994)) == 2
+    # Dustin Hoffman is only reachable through Rain Man (1988)
+    assert degrees.constrained_path('102', '163', min_year=1990) is None
+    assert len(degrees.constrained_path('102', '163', 1988, 1992)) == 2
+    # Tom Hanks and Gary Sinise both link Apollo 13 and Forrest Gump
+    path = degrees.constrained_path('102', '398', exclude=['158'])
+    assert path == [('112384', '641'), ('109830', '398')]
+    assert degrees.constrained_path('102', '398',
+                                    exclude=['158', '641']) is None
+    assert degrees.constrained_path('102', '398', exclude=['398']) is None
+    with pytest.raises(ValueError):
+        degrees.constrained_path('102', '398', exclude=['404'])
+    assert degrees.constrained_path('102', '102', max_year=1900) == []
+
+
+@pytest.mark.parametrize('use_snapshot', [False, True])
+def test_lazy_backend(data_copy, use_snapshot):
+    degrees.load_data(str(data_copy), 'dict', use_snapshot=False)
+    expected_people = {i: dict(p, movies=None) for i, p in
+                       degrees.people.items()}
+    expected_movies = {i: dict(m, stars=None) for i, m in
+                       degrees.movies.items()}
+    degrees.clear_data()
+    if use_snapshot:
+        # a snapshot without row offsets is rewritten
+        degrees.load_data(str(data_copy), 'compact', use_snapshot=True)
+    degrees.load_data(str(data_copy), 'lazy', use_snapshot)
+    assert isinstance(degrees.people, metadata.LazyTable)
+    assert len(degrees.people) == len(expected_people)
+    for person_id, person in expected_people.items():
+        assert degrees.people[person_id] == {
+            'name': person['name'], 'birth': person['birth']}
+    for movie_id, movie in expected_movies.items():
+        assert degrees.movies[movie_id] == {
+            'title': movie['title'], 'year': movie['year']}
+    assert degrees.candidate_ids('Kevin Bacon') == ['102']
+    assert degrees.candidate_ids('nobody') == []
+    assert len(degrees.shortest_path('102', '398')) == 2
+    if use_snapshot:
+        degrees.clear_data()
+        degrees.load_data(str(data_copy), 'lazy')
+        assert degrees.people['914612']['name'] == 'Emma Watson'
+
+
+@pytest.mark.parametrize('use_snapshot', [False, True])
+@pytest.mark.parametrize('backend', ['dict', 'compact'])
+def test_reload_after_lazy(data_copy, backend, use_snapshot):
+    degrees.load_data(str(data_copy), 'lazy')
+    degrees.load_data(str(data_copy), backend, use_snapshot)
+    assert type(degrees.people) is dict
+    assert type(degrees.movies) is dict
+    assert type(degrees.names) is dict
+    assert degrees.people['914612']['name'] == 'Emma Watson'
+    assert degrees.candidate_ids('Kevin Bacon') == ['102']
+    assert len(degrees.shortest_path('102', '398')) == 2
+
+
+def test_lazy_main(capsys, reset_data):
+    input_values = ['Tom Cruise', 'Jack Nicholson']
+
+    def mock_input(s):
+        print(s, end='')
+        return input_values.pop(0)
+
+    degrees.input = mock_input
+    degrees.main('small', backend='lazy')
+
+    out, err = capsys.readouterr()
+    assert out.endswith(
+        '1: Tom Cruise and Jack Nicholson starred in A Few Good Men\n')
+
+
+def test_lazy_backend_apply_delta(data_copy, tmp_path):
+    degrees.load_data(str(data_copy), 'lazy')
+    write_delta(tmp_path / 'delta')
+    degrees.apply_delta(str(tmp_path / 'delta'), str(data_copy))
+    assert degrees.people['999'] == {'name': 'New Actor', 'birth': '2000'}
+    assert degrees.candidate_ids('new actor') == ['999']
+    assert degrees.shortest_path('102', '914612') == [('5000', '914612')]
+    degrees.clear_data()
+    degrees.load_data(str(data_copy), 'lazy')
+    assert degrees.movies['5000']['title'] == 'Delta Movie'
+
+
+def assert_connected_path(source, target, path):
+    person_id = source
+    for pair in path:
+        assert pair in degrees.neighbors_for_person(person_id)
+        person_id = pair[1]
+    assert person_id == target
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact', 'lazy'])
+def test_weighted_path(data_copy, backend):
+    degrees.load_data(str(data_copy), backend)
+    targets = ['129', '163', '398', '705', '1597']
+    for target in targets:
+        path = degrees.weighted_path('102', target, 'unit')
+        assert_connected_path('102', target, path)
+        assert len(path) == len(degrees.shortest_path('102', target))
+        assert degrees.path_cost(path, 'unit') == len(path)
+    # Apollo 13 is the only way from Kevin Bacon to Sally Field
+    apollo = lambda movie_id: 5.0 if movie_id == '112384' else 1.0
+    path = degrees.weighted_path('102', '398', apollo)
+    assert path[0][0] == '112384'
+    assert degrees.path_cost(path, apollo) == 6
+    assert degrees.weighted_path('102', '102') == []
+    assert degrees.weighted_path('102', '914612') is None
+    with pytest.raises(ValueError):
+        degrees.weighted_path('102', '398', 'heaviest')
+
+
+def test_weighted_path_backends_agree(data_copy):
+    degrees.load_data(str(data_copy), 'dict')
+    costs = {}
+    for weight in degrees.WEIGHTS:
+        stats = degrees.SearchStats()
+        path = degrees.weighted_path('102', '1597', weight, stats)
+        assert_connected_path('102', '1597', path)
+        assert stats.expanded > 0
+        costs[weight] = degrees.path_cost(path, weight)
+    degrees.load_data(str(data_copy), 'compact')
+    for weight, cost in costs.items():
+        path = degrees.weighted_path('102', '1597', weight)
+        assert degrees.path_cost(path, weight) == pytest.approx(cost)
+    assert degrees.cast_weight('112384') == 2
+    assert degrees.recency_weight('112384', reference_year=2005) == 2
+    fixed = functools.partial(degrees.recency_weight, reference_year=2005)
+    path = degrees.weighted_path('102', '1597', fixed)
+    assert_connected_path('102', '1597', path)
+
+
+def test_compare_weighted(reset_data):
+    results = benchmark.compare_weighted('small', queries=5)
+    assert set(results) == {'bfs', *degrees.WEIGHTS}
+    assert results['unit']['mean_degrees'] == results['bfs']['mean_degrees']
+    assert results['cast']['count'] == 5
+
+
+def simple_paths(edges, person, target, people_seen, movies_seen):
+    """Lists every simple path of the bipartite graph by brute force."""
+    if person == target:
+        return [[]]
+    paths = []
+    for movie in edges.movies_of(person):
+        if movie in movies_seen:
+            continue
+        for neighbor in edges.stars_of(movie):
+            if neighbor in people_seen:
+                continue
+            for path in simple_paths(edges, neighbor, target,
+                                     people_seen | {neighbor},
+                                     movies_seen | {movie}):
+                paths.append([(movie, neighbor)] + path)
+    return paths
+
+
+def test_shortest_paths_small(small_data):
+    paths = list(degrees.all_shortest_paths('102', '398'))
+    assert paths == sorted(paths)
+    assert sorted(paths) == [[('112384', '158'), ('109830', '398')],
+                             [('112384', '641'), ('109830', '398')]]
+    assert degrees.count_shortest_paths('102', '398') == 2
+    assert list(degrees.all_shortest_paths('102', '102')) == [[]]
+    assert degrees.count_shortest_paths('102', '102') == 1
+    assert list(degrees.all_shortest_paths('102', '914612')) == []
+    assert degrees.count_shortest_paths('102', '914612') == 0
+    # every other simple path would reuse Apollo 13 or Forrest Gump
+    assert sorted(degrees.k_shortest_paths('102', '398')) == paths
+    assert list(degrees.k_shortest_paths('102', '398', 1)) in ([paths[0]],
+                                                                [paths[1]])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_path_enumeration_matches_brute_force(tmp_path, reset_data, seed):
+    synthetic.generate(str(tmp_path), people=14, movies=9, max_cast=4,
+                       seed=seed)
+    degrees.load_data(str(tmp_path), 'compact', use_snapshot=False)
+    edges = degrees.compact_graph()
+    for source, target in [(0, 13), (1, 7), (2, 2), (5, 11)]:
+        expected = simple_paths(edges, source, target, {source}, set())
+        stats = degrees.SearchStats()
+        found = list(edges.k_shortest_paths(source, target, stats))
+        assert sorted(found) == sorted(expected)
+        assert [len(path) for path in found] == sorted(map(len, expected))
+        dag = edges.shortest_paths(source, target)
+        shortest = [path for path in expected
+                    if len(path) == len(found[0])] if found else []
+        assert dag.count() == len(shortest)
+        assert sorted(dag) == sorted(shortest)
+
+
+@pytest.mark.parametrize('k_shortest', [False, True])
+def test_main_paths(capsys, reset_data, k_shortest):
+    input_values = ['Kevin Bacon', 'Sally Field']
+
+    def mock_input(s):
+        print(s, end='')
+        return input_values.pop(0)
+
+    degrees.input = mock_input
+    degrees.main('small', paths=5, k_shortest=k_shortest)
+
+    out, err = capsys.readouterr()
+    # the answer, then both shortest paths, which are the only simple ones
+    assert out.count('and Sally Field starred in Forrest Gump') == 3
+    assert out.count('Gary Sinise and Sally Field') >= 1
+    assert 'Path 2 (2 degrees):' in out
+    assert 'Path 3' not in out
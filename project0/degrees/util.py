@@ -1,19 +1,29 @@
+import heapq
+from collections import Counter, OrderedDict, deque
+from itertools import count
+
+
 class Node():
-    def __init__(self, state, parent, action):
+    def __init__(self, state, parent, action, cost=0):
         self.state = state
         self.parent = parent
         self.action = action
+        # total edge weight from the root, used by PriorityFrontier
+        self.cost = cost
 
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # counts of the states currently in the frontier for O(1) membership
+        self.states = Counter()
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] += 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +32,15 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self._discard(node.state)
             return node
 
+    def _discard(self, state):
+        self.states[state] -= 1
+        if self.states[state] == 0:
+            del self.states[state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +48,120 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self._discard(node.state)
             return node
+
+
+class PriorityFrontier():
+    def __init__(self):
+        """Binary heap frontier that always removes the cheapest node.
+
+        Adding a cheaper node for a state already in the frontier does not
+        search the heap for the old node: the old one is left behind and
+        skipped when it reaches the top (lazy deletion).
+        """
+        self.heap = []
+        # the live node of every state in the frontier
+        self.best = {}
+        # tie breaker, so nodes themselves are never compared
+        self.counter = count()
+
+    def add(self, node):
+        """Adds a node unless its state is already in the frontier at the same
+        or a lower cost.
+
+        Returns:
+            bool: Whether the node was added.
+        """
+        best = self.best.get(node.state)
+        if best is not None and best.cost <= node.cost:
+            return False
+        self.best[node.state] = node
+        heapq.heappush(self.heap, (node.cost, next(self.counter), node))
+        return True
+
+    def contains_state(self, state):
+        return state in self.best
+
+    def cost(self, state):
+        return self.best[state].cost
+
+    def empty(self):
+        return len(self.best) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        while True:
+            _, _, node = heapq.heappop(self.heap)
+            # skip nodes that a cheaper one replaced
+            if self.best.get(node.state) is node:
+                del self.best[node.state]
+                return node
+
+
+class LRUCache():
+    def __init__(self, maxsize, sizeof=None):
+        """Mapping that evicts its least recently used entries.
+
+        Args:
+            maxsize: Largest total size kept in the cache.
+            sizeof: Function returning the size of a value. Defaults to
+            counting every entry as 1, so maxsize bounds the entry count.
+        """
+        self.maxsize = maxsize
+        self.sizeof = sizeof if sizeof is not None else lambda value: 1
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.pop(key)
+        size = self.sizeof(value)
+        self.entries[key] = value
+        self.sizes[key] = size
+        self.size += size
+        # never evict the entry that was just added
+        while self.size > self.maxsize and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            self.pop(oldest)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        if key not in self.entries:
+            return default
+        self.size -= self.sizes.pop(key)
+        return self.entries.pop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.sizes.clear()
+        self.size = 0
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "size": self.size,
+            "maxsize": self.maxsize
+        }
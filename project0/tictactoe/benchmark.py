@@ -0,0 +1,129 @@
+"""
+Compares the search speed of the list of lists and bitboard engines.
+
+Both engines run a full-window alpha-beta search from the same positions:
+the empty board and every position after the first one or two moves. The
+engines order moves differently, so they visit different numbers of nodes;
+nodes per second is the comparable figure.
+
+Examples:
+    $ python benchmark.py
+    $ python benchmark.py --depth 1 --repeat 5 --json
+"""
+import argparse
+import json
+import math
+import time
+
+import bitboard
+import tictactoe
+
+
+def positions(depth: int = 2) -> list:
+    """Returns every board reachable in at most depth moves, without
+    duplicates.
+
+    Args:
+        depth (int, optional): Number of moves. Defaults to 2.
+
+    Returns:
+        list: List of lists of lists boards.
+    """
+    layer = [tictactoe.initial_state()]
+    boards = list(layer)
+    for _ in range(depth):
+        seen = set()
+        next_layer = []
+        for board in layer:
+            if tictactoe.terminal(board):
+                continue
+            for action in sorted(tictactoe.actions(board)):
+                child = tictactoe.result(board, action)
+                key = str(child)
+                if key not in seen:
+                    seen.add(key)
+                    next_layer.append(child)
+        boards.extend(next_layer)
+        layer = next_layer
+    return boards
+
+
+def search_lists(board: list) -> int:
+    """Searches a board with tictactoe.py and returns the nodes visited."""
+    stats = tictactoe.SearchStats()
+    search = (tictactoe.max_value
+              if tictactoe.player(board) == tictactoe.X else
+              tictactoe.min_value)
+    search(board, -math.inf, math.inf, stats=stats)
+    return stats.nodes
+
+
+def search_bitboard(board: list) -> int:
+    """Searches a board with bitboard.py and returns the nodes visited."""
+    stats = tictactoe.SearchStats()
+    x, o = bitboard.to_masks(board)
+    search = (bitboard.max_value
+              if bitboard.mask_player(x, o) == tictactoe.X else
+              bitboard.min_value)
+    search(x, o, -math.inf, math.inf, stats)
+    return stats.nodes
+
+
+# Maps engine names to a function searching one board
+ENGINES = {"lists": search_lists, "bitboard": search_bitboard}
+
+
+def measure(boards: list, repeat: int = 3) -> dict:
+    """Times every engine on the same boards.
+
+    Args:
+        boards (list): Boards to search.
+        repeat (int, optional): Number of timed runs, the fastest of which
+        is kept. Defaults to 3.
+
+    Returns:
+        dict: Maps engine name to its nodes, seconds and nodes per second.
+    """
+    results = {}
+    for name, search in ENGINES.items():
+        best = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            nodes = sum(search(board) for board in boards)
+            best = min(best, time.perf_counter() - start)
+        results[name] = {
+            "nodes": nodes,
+            "seconds": best,
+            "nodes_per_second": nodes / best if best else None
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the nodes per second of the tictactoe engines.")
+    parser.add_argument("--depth",
+                        type=int,
+                        default=2,
+                        help="search every position up to this many moves in")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json",
+                        action="store_true",
+                        help="print the results as JSON")
+    args = parser.parse_args()
+
+    boards = positions(args.depth)
+    results = measure(boards, args.repeat)
+    if args.json:
+        print(json.dumps({"positions": len(boards), "engines": results},
+                         indent=2))
+        return
+    print(f"{len(boards)} positions")
+    print(f"{'engine':<10}{'nodes':>10}{'seconds':>10}{'nodes/s':>12}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['nodes']:>10}{result['seconds']:>10.3f}"
+              f"{result['nodes_per_second']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Tic Tac Toe engine on bitboards.
+
+A position is two 9-bit integers holding the cells taken by X and by O,
+with cell (i, j) at bit 3 * i + j. Moves are ORs, the free cells are the
+complement of both masks, the player to move comes from a popcount table
+and a win is a match against one of eight precomputed line masks, so the
+search never allocates a board.
+
+The public functions take and return the list of lists boards used by
+tictactoe.py and convert at the boundary, so runner.py can use either
+module.
+"""
+import math
+import time
+
+from tictactoe import EMPTY, O, X, SearchStats
+
+# Mask of all nine cells
+FULL = 0b111111111
+
+# Rows, columns and diagonals
+WIN_MASKS = (
+    0b000000111,
+    0b000111000,
+    0b111000000,
+    0b001001001,
+    0b010010010,
+    0b100100100,
+    0b100010001,
+    0b001010100,
+)
+
+# Number of bits set in every 9-bit mask
+POPCOUNT = bytes(bin(mask).count("1") for mask in range(FULL + 1))
+
+
+def to_masks(board: list) -> tuple:
+    """Converts a list of lists board into (X mask, O mask).
+
+    Args:
+        board (list): List of lists containing the game board.
+
+    Returns:
+        tuple: Cells taken by X and by O, as 9-bit integers.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, val in enumerate(row):
+            if val == X:
+                x |= 1 << (3 * i + j)
+            elif val == O:
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def to_board(x: int, o: int) -> list:
+    """Converts (X mask, O mask) into a list of lists board.
+
+    Args:
+        x (int): Cells taken by X.
+        o (int): Cells taken by O.
+
+    Returns:
+        list: List of lists containing the game board.
+    """
+    return [[
+        X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1 else EMPTY
+        for j in range(3)
+    ] for i in range(3)]
+
+
+def mask_player(x: int, o: int) -> str:
+    """Returns the player to move: X unless X has moved more often."""
+    return O if POPCOUNT[x] > POPCOUNT[o] else X
+
+
+def mask_actions(x: int, o: int):
+    """Yields the free cells, lowest bit first."""
+    free = FULL & ~(x | o)
+    while free:
+        bit = free & -free
+        yield bit.bit_length() - 1
+        free ^= bit
+
+
+def has_line(mask: int) -> bool:
+    """Returns True if a player's cells complete a row, column or diagonal."""
+    for line in WIN_MASKS:
+        if mask & line == line:
+            return True
+    return False
+
+
+def mask_winner(x: int, o: int) -> str:
+    """Returns the winner of a position, if there is one."""
+    if has_line(x):
+        return X
+    if has_line(o):
+        return O
+    return None
+
+
+def mask_utility(x: int, o: int) -> int:
+    """Returns 1 if X has won, -1 if O has won, 0 otherwise."""
+    if has_line(x):
+        return 1
+    if has_line(o):
+        return -1
+    return 0
+
+
+def min_value(x: int,
+              o: int,
+              alpha: float,
+              beta: float,
+              stats: SearchStats = None,
+              depth: int = 1) -> int:
+    """Min player's function to determine the value of a position.
+
+    Only X, who just moved, can have won when it is O's turn, so only X's
+    lines are checked.
+
+    Args:
+        x (int): Cells taken by X.
+        o (int): Cells taken by O, who moves next.
+        alpha (float): The value of the best choice found so far for the max
+        player.
+        beta (float): The value of the best choice found so far for the min
+        player.
+        stats (SearchStats, optional): Counters to record the search in.
+        Defaults to None.
+        depth (int, optional): Moves made since the root. Defaults to 1.
+
+    Returns:
+        int: Value of the position.
+    """
+    if stats is not None:
+        stats.nodes += 1
+
+    if has_line(x):
+        if stats is not None:
+            stats.terminals += 1
+        return 1
+    if x | o == FULL:
+        if stats is not None:
+            stats.terminals += 1
+        return 0
+    value = math.inf
+    free = FULL & ~(x | o)
+    while free:
+        bit = free & -free
+        free ^= bit
+        value = min(value, max_value(x, o | bit, alpha, beta, stats,
+                                     depth + 1))
+        if value <= alpha:
+            if stats is not None:
+                stats.cutoff(depth)
+            return value
+        beta = min(beta, value)
+    return value
+
+
+def max_value(x: int,
+              o: int,
+              alpha: float,
+              beta: float,
+              stats: SearchStats = None,
+              depth: int = 1) -> int:
+    """Max player's function to determine the value of a position.
+
+    Args:
+        x (int): Cells taken by X, who moves next.
+        o (int): Cells taken by O.
+        alpha (float): The value of the best choice found so far for the max
+        player.
+        beta (float): The value of the best choice found so far for the min
+        player.
+        stats (SearchStats, optional): Counters to record the search in.
+        Defaults to None.
+        depth (int, optional): Moves made since the root. Defaults to 1.
+
+    Returns:
+        int: Value of the position.
+    """
+    if stats is not None:
+        stats.nodes += 1
+
+    if has_line(o):
+        if stats is not None:
+            stats.terminals += 1
+        return -1
+    if x | o == FULL:
+        if stats is not None:
+            stats.terminals += 1
+        return 0
+    value = -math.inf
+    free = FULL & ~(x | o)
+    while free:
+        bit = free & -free
+        free ^= bit
+        value = max(value, min_value(x | bit, o, alpha, beta, stats,
+                                     depth + 1))
+        if value >= beta:
+            if stats is not None:
+                stats.cutoff(depth)
+            return value
+        alpha = max(alpha, value)
+    return value
+
+
+def best_cell(x: int, o: int, stats: SearchStats = None) -> int:
+    """Returns the optimal cell for the player to move, or None if the game
+    is over.
+
+    Args:
+        x (int): Cells taken by X.
+        o (int): Cells taken by O.
+        stats (SearchStats, optional): Counters to record the search in.
+        Defaults to None.
+
+    Returns:
+        int: Cell index from 0 to 8.
+    """
+    if mask_winner(x, o) is not None or x | o == FULL:
+        return None
+    best = None
+    if mask_player(x, o) == X:
+        best_value = -math.inf
+        for cell in mask_actions(x, o):
+            value = min_value(x | 1 << cell, o, -math.inf, math.inf, stats)
+            if value > best_value:
+                best, best_value = cell, value
+    else:
+        best_value = math.inf
+        for cell in mask_actions(x, o):
+            value = max_value(x, o | 1 << cell, -math.inf, math.inf, stats)
+            if value < best_value:
+                best, best_value = cell, value
+    return best
+
+
+def initial_state() -> list:
+    """Returns starting state of the board."""
+    return to_board(0, 0)
+
+
+def player(board: list) -> str:
+    """Returns player who has the next turn on a board."""
+    return mask_player(*to_masks(board))
+
+
+def actions(board: list) -> set:
+    """Returns set of all possible actions (i, j) available on the board."""
+    return {divmod(cell, 3) for cell in mask_actions(*to_masks(board))}
+
+
+def result(board: list, action: tuple) -> list:
+    """Returns the board that results from making move (i, j) on the board.
+
+    Raises:
+        ValueError: If action not in action set.
+    """
+    x, o = to_masks(board)
+    if action not in actions(board):
+        raise ValueError(f'{action} not in action set.')
+    bit = 1 << (3 * action[0] + action[1])
+    if mask_player(x, o) == X:
+        return to_board(x | bit, o)
+    return to_board(x, o | bit)
+
+
+def winner(board: list) -> str:
+    """Returns the winner of the game, if there is one."""
+    return mask_winner(*to_masks(board))
+
+
+def terminal(board: list) -> bool:
+    """Returns True if game is over, False otherwise."""
+    x, o = to_masks(board)
+    return mask_winner(x, o) is not None or x | o == FULL
+
+
+def utility(board: list) -> int:
+    """Returns 1 if X has won the game, -1 if O has won, 0 otherwise."""
+    return mask_utility(*to_masks(board))
+
+
+def minimax(board: list, stats: SearchStats = None) -> tuple:
+    """Returns the optimal action (i, j) for the current player on the board,
+    or None if the game is over.
+
+    Args:
+        board (list): List of lists containing the current game board.
+        stats (SearchStats, optional): Counters to add this search's nodes,
+        cutoffs, terminal evaluations and time to. Defaults to None.
+
+    Returns:
+        tuple: Best action (i, j) for the current player.
+    """
+    start = time.perf_counter()
+    cell = best_cell(*to_masks(board), stats)
+    if stats is not None:
+        stats.elapsed += time.perf_counter() - start
+    return None if cell is None else divmod(cell, 3)
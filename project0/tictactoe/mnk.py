@@ -0,0 +1,392 @@
+"""
+Tic Tac Toe generalised to m,n,k games: k marks in a row, column or
+diagonal win on a board of m rows and n columns.
+
+Exhaustive search is out of reach beyond 3x3, so moves are chosen by
+iterative-deepening alpha-beta search. The search is repeated one ply
+deeper each time, trying the previous iteration's best move first, until
+the time budget runs out, and the move of the deepest completed iteration
+is played. Positions at the depth limit are scored by a heuristic over
+the open lines, the k-cell windows only one player has marks in.
+
+Boards are the list of lists boards of tictactoe.py, so an MNKGame can
+stand in for the tictactoe module in runner.py.
+
+Examples:
+    $ python mnk.py --rows 4 --cols 4 --k 3 --time 2
+    $ python mnk.py --rows 5 --cols 5 --k 4 --time 1
+"""
+import argparse
+import copy
+import math
+import time
+
+from tictactoe import EMPTY, O, X, SearchStats, actions, player, result
+
+# Score of a won game, far above any heuristic score. Wins are scored
+# WIN - plies so that faster wins are preferred
+WIN = 10**12
+
+# Nodes searched between checks of the clock
+CLOCK_INTERVAL = 1024
+
+# Directions a line can run in: along a row, a column and both diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget has run out."""
+
+
+class MNKGame():
+    X = X
+    O = O
+    EMPTY = EMPTY
+
+    def __init__(self,
+                 rows: int = 3,
+                 cols: int = 3,
+                 k: int = 3,
+                 time_limit: float = 1.0) -> None:
+        """An m,n,k game and its search settings.
+
+        Args:
+            rows (int, optional): Number of rows. Defaults to 3.
+            cols (int, optional): Number of columns. Defaults to 3.
+            k (int, optional): Marks in a line needed to win. Defaults to 3.
+            time_limit (float, optional): Seconds minimax may search for.
+            Defaults to 1.0.
+
+        Raises:
+            ValueError: If the board is empty or k does not fit on it.
+        """
+        if rows < 1 or cols < 1:
+            raise ValueError(f'Board must have cells, got {rows}x{cols}')
+        if not 1 <= k <= max(rows, cols):
+            raise ValueError(f'k must be from 1 to {max(rows, cols)}, got '
+                             f'{k}')
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.time_limit = time_limit
+        self.lines = []
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in DIRECTIONS:
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < cols:
+                        self.lines.append(
+                            tuple((i + di * step, j + dj * step)
+                                  for step in range(k)))
+        self.lines_through = {(i, j): []
+                              for i in range(rows)
+                              for j in range(cols)}
+        for line in self.lines:
+            for cell in line:
+                self.lines_through[cell].append(line)
+        # cells on the most lines first, which favours the centre and makes
+        # alpha-beta cut off sooner
+        self.move_order = sorted(self.lines_through,
+                                 key=lambda cell: -len(self.lines_through[
+                                     cell]))
+        self.stats = SearchStats()
+        self.deadline = math.inf
+
+    def initial_state(self) -> list:
+        """Returns an empty board."""
+        return [[EMPTY] * self.cols for _ in range(self.rows)]
+
+    def player(self, board: list) -> str:
+        """Returns player who has the next turn on a board."""
+        return player(board)
+
+    def actions(self, board: list) -> set:
+        """Returns set of all possible actions (i, j) available on the board."""
+        return actions(board)
+
+    def result(self, board: list, action: tuple) -> list:
+        """Returns the board that results from making move (i, j) on the board.
+
+        Raises:
+            ValueError: If action not in action set.
+        """
+        return result(board, action)
+
+    def winner(self, board: list) -> str:
+        """Returns the winner of the game, if there is one."""
+        for line in self.lines:
+            i, j = line[0]
+            first = board[i][j]
+            if first != EMPTY and all(board[i][j] == first
+                                      for i, j in line[1:]):
+                return first
+        return None
+
+    def terminal(self, board: list) -> bool:
+        """Returns True if game is over, False otherwise."""
+        return (self.winner(board) is not None
+                or all(val != EMPTY for row in board for val in row))
+
+    def utility(self, board: list) -> int:
+        """Returns 1 if X has won the game, -1 if O has won, 0 otherwise."""
+        game_winner = self.winner(board)
+        if game_winner == X:
+            return 1
+        elif game_winner == O:
+            return -1
+        return 0
+
+    def evaluate(self, board: list) -> int:
+        """Heuristic value of a board for X.
+
+        Every line that only one player has marks in is still open to them
+        and scores 4**(marks - 1), positive for X and negative for O, so a
+        few nearly complete lines outweigh many barely started ones. Lines
+        with marks of both players can never be completed and score 0.
+
+        Args:
+            board (list): List of lists containing the current game board.
+
+        Returns:
+            int: Score, well below WIN in absolute value.
+        """
+        score = 0
+        for line in self.lines:
+            x_marks = o_marks = 0
+            for i, j in line:
+                val = board[i][j]
+                if val == X:
+                    x_marks += 1
+                elif val == O:
+                    o_marks += 1
+            if x_marks and not o_marks:
+                score += 4**(x_marks - 1)
+            elif o_marks and not x_marks:
+                score -= 4**(o_marks - 1)
+        return score
+
+    def completes_line(self, board: list, cell: tuple) -> bool:
+        """Returns True if the mark on cell is part of a complete line."""
+        mark = board[cell[0]][cell[1]]
+        return any(
+            all(board[i][j] == mark for i, j in line)
+            for line in self.lines_through[cell])
+
+    def minimax(self,
+                board: list,
+                time_limit: float = None,
+                stats: SearchStats = None) -> tuple:
+        """Returns the best action found for the current player within the
+        time budget, or None if the game is over.
+
+        Args:
+            board (list): List of lists containing the current game board.
+            time_limit (float, optional): Seconds to search for. Defaults to
+            the game's time_limit.
+            stats (SearchStats, optional): Counters to add the search to.
+            Defaults to None.
+
+        Returns:
+            tuple: Action (i, j).
+        """
+        action, _ = self.search(board, time_limit, stats=stats)
+        return action
+
+    def search(self,
+               board: list,
+               time_limit: float = None,
+               max_depth: int = None,
+               stats: SearchStats = None) -> tuple:
+        """Iterative-deepening alpha-beta search.
+
+        Every iteration searches one ply deeper than the last with the
+        previous best move first. When the time budget runs out in the
+        middle of an iteration, that iteration is abandoned and the best
+        move of the last completed one is returned. The search also stops
+        early once it finds a forced win or loss, or reaches the end of the
+        game.
+
+        Args:
+            board (list): List of lists containing the current game board.
+            time_limit (float, optional): Seconds to search for. Defaults to
+            the game's time_limit.
+            max_depth (int, optional): Deepest iteration. Defaults to None,
+            which is the number of empty cells.
+            stats (SearchStats, optional): Counters to add the search to,
+            abandoned iterations included. Defaults to None, which records
+            into a new SearchStats kept in the game's stats.
+
+        Returns:
+            tuple: (action, info) where info is a dict with the completed
+            "depth", its "value" for X, the "nodes" searched and the
+            "seconds" taken. action is None if the game is over.
+        """
+        start = time.perf_counter()
+        budget = self.time_limit if time_limit is None else time_limit
+        self.deadline = start + budget
+        self.stats = SearchStats() if stats is None else stats
+        nodes = self.stats.nodes
+        info = {"depth": 0, "value": None, "nodes": 0, "seconds": 0.0}
+        if self.terminal(board):
+            return None, info
+
+        # the search plays and takes back moves on its own copy
+        board = copy.deepcopy(board)
+        moves = [(i, j) for i, j in self.move_order if board[i][j] == EMPTY]
+        best = moves[0]
+        limit = len(moves) if max_depth is None else min(max_depth,
+                                                         len(moves))
+        for depth in range(1, limit + 1):
+            try:
+                value, action = self._search_root(board, moves, depth)
+            except SearchTimeout:
+                break
+            best = action
+            info["depth"] = depth
+            info["value"] = value
+            moves.remove(action)
+            moves.insert(0, action)
+            if abs(value) >= WIN - len(moves):
+                break
+        info["nodes"] = self.stats.nodes - nodes
+        info["seconds"] = time.perf_counter() - start
+        self.stats.elapsed += info["seconds"]
+        return best, info
+
+    def _search_root(self, board: list, moves: list, depth: int) -> tuple:
+        """Searches every root move to a depth and returns (value, move)."""
+        mark = player(board)
+        empty = len(moves)
+        alpha, beta = -math.inf, math.inf
+        best_value, best_move = None, None
+        for cell in moves:
+            board[cell[0]][cell[1]] = mark
+            try:
+                if mark == X:
+                    value = self._min_value(board, cell, depth - 1, alpha,
+                                            beta, 1, empty - 1)
+                else:
+                    value = self._max_value(board, cell, depth - 1, alpha,
+                                            beta, 1, empty - 1)
+            finally:
+                board[cell[0]][cell[1]] = EMPTY
+            if mark == X and (best_value is None or value > best_value):
+                best_value, best_move = value, cell
+                alpha = max(alpha, value)
+            elif mark == O and (best_value is None or value < best_value):
+                best_value, best_move = value, cell
+                beta = min(beta, value)
+        return best_value, best_move
+
+    def _visit(self) -> None:
+        """Counts a node and checks the clock every CLOCK_INTERVAL nodes."""
+        self.stats.nodes += 1
+        if (self.stats.nodes % CLOCK_INTERVAL == 0
+                and time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+    def _min_value(self, board: list, last: tuple, depth: int, alpha: float,
+                   beta: float, ply: int, empty: int) -> float:
+        """Value of a board where O moves next and X just played last.
+
+        Args:
+            board (list): Board, modified in place and restored.
+            last (tuple): Cell X just played.
+            depth (int): Plies left to search before evaluating.
+            alpha (float): Best value for X found so far.
+            beta (float): Best value for O found so far.
+            ply (int): Plies played since the root.
+            empty (int): Number of empty cells.
+
+        Returns:
+            float: Value of the board for X.
+        """
+        self._visit()
+        if self.completes_line(board, last):
+            self.stats.terminals += 1
+            return WIN - ply
+        if empty == 0:
+            self.stats.terminals += 1
+            return 0
+        if depth == 0:
+            return self.evaluate(board)
+        value = math.inf
+        for i, j in self.move_order:
+            if board[i][j] != EMPTY:
+                continue
+            board[i][j] = O
+            try:
+                value = min(
+                    value,
+                    self._max_value(board, (i, j), depth - 1, alpha, beta,
+                                    ply + 1, empty - 1))
+            finally:
+                board[i][j] = EMPTY
+            if value <= alpha:
+                self.stats.cutoff(ply)
+                return value
+            beta = min(beta, value)
+        return value
+
+    def _max_value(self, board: list, last: tuple, depth: int, alpha: float,
+                   beta: float, ply: int, empty: int) -> float:
+        """Value of a board where X moves next and O just played last.
+
+        Args:
+            board (list): Board, modified in place and restored.
+            last (tuple): Cell O just played.
+            depth (int): Plies left to search before evaluating.
+            alpha (float): Best value for X found so far.
+            beta (float): Best value for O found so far.
+            ply (int): Plies played since the root.
+            empty (int): Number of empty cells.
+
+        Returns:
+            float: Value of the board for X.
+        """
+        self._visit()
+        if self.completes_line(board, last):
+            self.stats.terminals += 1
+            return -(WIN - ply)
+        if empty == 0:
+            self.stats.terminals += 1
+            return 0
+        if depth == 0:
+            return self.evaluate(board)
+        value = -math.inf
+        for i, j in self.move_order:
+            if board[i][j] != EMPTY:
+                continue
+            board[i][j] = X
+            try:
+                value = max(
+                    value,
+                    self._min_value(board, (i, j), depth - 1, alpha, beta,
+                                    ply + 1, empty - 1))
+            finally:
+                board[i][j] = EMPTY
+            if value >= beta:
+                self.stats.cutoff(ply)
+                return value
+            alpha = max(alpha, value)
+        return value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Search the opening move of an m,n,k game.")
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int, default=3)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--time", type=float, default=1.0)
+    args = parser.parse_args()
+
+    game = MNKGame(args.rows, args.cols, args.k, args.time)
+    action, info = game.search(game.initial_state())
+    print(f"Best move {action} at depth {info['depth']}, value "
+          f"{info['value']}, {info['nodes']} nodes in "
+          f"{info['seconds']:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
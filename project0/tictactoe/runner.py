@@ -1,8 +1,37 @@
+import argparse
 import pygame
 import sys
 import time
 
-import tictactoe as ttt
+parser = argparse.ArgumentParser(description="Play Tic-Tac-Toe.")
+parser.add_argument("--engine",
+                    choices=("lists", "bitboard", "mnk"),
+                    default="lists",
+                    help="board representation the computer searches with")
+parser.add_argument("--rows", type=int, default=3)
+parser.add_argument("--cols", type=int, default=3)
+parser.add_argument("--k",
+                    type=int,
+                    default=3,
+                    help="marks in a line needed to win")
+parser.add_argument("--time",
+                    type=float,
+                    default=1.0,
+                    help="seconds the computer may think per move on an "
+                    "m,n,k board")
+args = parser.parse_args()
+
+if (args.rows, args.cols, args.k) != (3, 3, 3):
+    # only the m,n,k engine plays other boards
+    args.engine = "mnk"
+
+if args.engine == "mnk":
+    import mnk
+    ttt = mnk.MNKGame(args.rows, args.cols, args.k, args.time)
+elif args.engine == "bitboard":
+    import bitboard as ttt
+else:
+    import tictactoe as ttt
 
 pygame.init()
 size = width, height = 600, 400
@@ -15,11 +44,16 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+
+# Shrink the tiles to fit larger boards on the screen
+tile_size = min(80, (height - 140) // args.rows, (width - 40) // args.cols)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
 
 user = None
 board = ttt.initial_state()
 ai_turn = False
+# positions searched by the AI, kept across moves and games
+cache = ttt.TranspositionTable() if args.engine == "lists" else None
 
 while True:
 
@@ -67,13 +101,12 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (args.cols / 2 * tile_size),
+                       height / 2 - (args.rows / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(args.rows):
             row = []
-            for j in range(3):
+            for j in range(args.cols):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -112,7 +145,8 @@ while True:
         if user != player and not game_over:
             if ai_turn:
                 time.sleep(0.5)
-                move = ttt.minimax(board)
+                move = (ttt.minimax(board)
+                        if cache is None else ttt.minimax(board, cache))
                 board = ttt.result(board, move)
                 ai_turn = False
             else:
@@ -122,8 +156,8 @@ while True:
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
+            for i in range(args.rows):
+                for j in range(args.cols):
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
@@ -0,0 +1,96 @@
+"""
+Solves every reachable Tic Tac Toe position and writes the perfect-play
+table that tictactoe.minimax looks moves up in.
+
+Only 5,478 positions can be reached from the empty board, so they are all
+solved once with a memoised search on bitboards. The table has one byte
+for each of the 3**9 base-3 board indexes (see tictactoe.board_index):
+(value + 1) << 4 | cell, where value is 1, 0 or -1 as for utility and cell
+is 3 * i + j of the optimal move, or NO_MOVE once the game is over. Boards
+that cannot be reached hold UNREACHABLE.
+
+Among equally good moves the fastest win, or the slowest loss, is chosen,
+then the lowest cell.
+
+Examples:
+    $ python solve.py
+    $ python solve.py --output /tmp/perfect_play.bin
+"""
+import argparse
+
+import bitboard
+from tictactoe import NO_MOVE, TABLE_FILE, TABLE_SIZE, UNREACHABLE, X
+
+# Powers of 3 of every cell, to index boards straight from their masks
+POWERS = tuple(3**cell for cell in range(9))
+
+
+def mask_index(x: int, o: int) -> int:
+    """Returns the base-3 board index of a position given as masks."""
+    index = 0
+    for cell in range(9):
+        if x >> cell & 1:
+            index += POWERS[cell]
+        elif o >> cell & 1:
+            index += 2 * POWERS[cell]
+    return index
+
+
+def solve() -> dict:
+    """Solves every position reachable from the empty board.
+
+    Returns:
+        dict: Maps (X mask, O mask) to (value, plies, cell): the value
+        under perfect play, the number of moves until the game ends and
+        the optimal cell, None once the game is over.
+    """
+    solved = {}
+
+    def search(x: int, o: int) -> tuple:
+        if (x, o) in solved:
+            return solved[(x, o)]
+        if bitboard.mask_winner(x, o) is not None or x | o == bitboard.FULL:
+            solved[(x, o)] = (bitboard.mask_utility(x, o), 0, None)
+            return solved[(x, o)]
+        sign = 1 if bitboard.mask_player(x, o) == X else -1
+        best = None
+        for cell in bitboard.mask_actions(x, o):
+            if sign == 1:
+                value, plies, _ = search(x | 1 << cell, o)
+            else:
+                value, plies, _ = search(x, o | 1 << cell)
+            # win sooner, lose later, then the lowest cell
+            score = (sign * value, -plies if sign * value > 0 else plies)
+            if best is None or score > best[0]:
+                best = (score, value, plies + 1, cell)
+        solved[(x, o)] = best[1:]
+        return solved[(x, o)]
+
+    search(0, 0)
+    return solved
+
+
+def build_table() -> bytes:
+    """Returns the perfect-play table of every board index."""
+    table = bytearray([UNREACHABLE]) * TABLE_SIZE
+    for (x, o), (value, _, cell) in solve().items():
+        table[mask_index(x, o)] = (value + 1) << 4 | (
+            NO_MOVE if cell is None else cell)
+    return bytes(table)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write the Tic Tac Toe perfect-play table.")
+    parser.add_argument("--output", default=TABLE_FILE)
+    args = parser.parse_args()
+
+    table = build_table()
+    with open(args.output, "wb") as f:
+        f.write(table)
+    reachable = sum(entry != UNREACHABLE for entry in table)
+    print(f"Wrote {reachable} positions to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,26 @@
+import json
+import random
 import time
 
 import pytest
 
+import benchmark
+import bitboard
+import mnk
+import solve
+import tictactoe
 from tictactoe import initial_state, player, actions, result, winner, terminal, utility, minimax
 from tictactoe import X, O, EMPTY
 
 
+@pytest.fixture(autouse=True)
+def no_perfect_play(monkeypatch, tmp_path):
+    # search unless a test builds its own table, even if solve.py was run
+    monkeypatch.setattr(tictactoe, 'TABLE_FILE', str(tmp_path / 'none.bin'))
+    monkeypatch.setattr(tictactoe, 'perfect_play', None)
+    monkeypatch.setattr(tictactoe, 'missing_table', None)
+
+
 @pytest.fixture()
 def O_goes():
     return [[X, EMPTY, EMPTY], [EMPTY, EMPTY, EMPTY], [EMPTY, EMPTY, EMPTY]]
@@ -182,13 +197,263 @@ def test_utility_no_winner(full_board_no_winner):
 
 
 def test_minimax_empty_board(capsys):
-    global recursion_counter
-    recursion_counter = 0
+    stats = tictactoe.SearchStats()
     board = initial_state()
     start = time.time()
-    action = minimax(board)
+    action = minimax(board, stats=stats)
     end = time.time()
     duration = end - start
     assert duration < 3
+    assert stats.nodes == 40107
     out, err = capsys.readouterr()
-    assert out == '40107\n'
\ No newline at end of file
+    assert out == ''
+
+
+def test_search_stats():
+    stats = tictactoe.SearchStats()
+    minimax(initial_state(), stats=stats)
+    assert 0 < stats.terminals < stats.nodes
+    assert min(stats.cutoffs) >= 1 and max(stats.cutoffs) <= 9
+    assert stats.transposition_hits == 0
+    assert 0 < stats.elapsed < 3
+    exported = json.loads(stats.to_json())
+    assert exported['nodes'] == 40107
+    assert sum(exported['cutoffs'].values()) == sum(stats.cutoffs.values())
+    # counts add up over searches, and the bitboard engine fills them too
+    bitboard_stats = tictactoe.SearchStats()
+    bitboard.minimax(initial_state(), bitboard_stats)
+    bitboard.minimax(initial_state(), bitboard_stats)
+    assert bitboard_stats.nodes % 2 == 0 and bitboard_stats.nodes > 0
+    assert bitboard_stats.cutoffs
+
+
+def exact_values():
+    """Values of every reachable position by plain memoised minimax."""
+    values = {}
+
+    def value(board):
+        key = tuple(cell for row in board for cell in row)
+        if key not in values:
+            if terminal(board):
+                values[key] = utility(board)
+            else:
+                children = [value(result(board, action))
+                            for action in actions(board)]
+                values[key] = (max if player(board) == X else min)(children)
+        return values[key]
+
+    value(initial_state())
+    return values
+
+
+def board_from_key(key):
+    return [list(key[i:i + 3]) for i in range(0, 9, 3)]
+
+
+def test_canonical_key_symmetries():
+    board = [[X, O, EMPTY], [EMPTY, EMPTY, EMPTY], [EMPTY, EMPTY, EMPTY]]
+    rotated = [[EMPTY, EMPTY, X], [EMPTY, EMPTY, O], [EMPTY, EMPTY, EMPTY]]
+    mirrored = [[EMPTY, O, X], [EMPTY, EMPTY, EMPTY], [EMPTY, EMPTY, EMPTY]]
+    key = tictactoe.canonical_key(board)
+    assert tictactoe.canonical_key(rotated) == key
+    assert tictactoe.canonical_key(mirrored) == key
+    other = [[X, EMPTY, O], [EMPTY, EMPTY, EMPTY], [EMPTY, EMPTY, EMPTY]]
+    assert tictactoe.canonical_key(other) != key
+
+
+def test_transposition_table_values():
+    cache = tictactoe.TranspositionTable()
+    for key, expected in exact_values().items():
+        board = board_from_key(key)
+        search = (tictactoe.max_value
+                  if player(board) == X else tictactoe.min_value)
+        assert search(board, -float('inf'), float('inf'), cache) == expected
+        # narrow windows store bounds, which must not corrupt later answers
+        search(board, 0, 1, cache)
+        search(board, -1, 0, cache)
+    stats = cache.stats()
+    # 765 positions are distinct up to symmetry
+    assert stats['entries'] <= 765
+    assert 0 < stats['hit_rate'] < 1
+    assert stats['cutoffs'] > 0
+
+
+def test_minimax_transposition_table():
+    cache = tictactoe.TranspositionTable()
+    values = exact_values()
+    board = initial_state()
+    first = tictactoe.SearchStats()
+    action = minimax(board, cache, first)
+    assert first.nodes < 40107
+    child = tuple(cell for row in result(board, action) for cell in row)
+    assert values[child] == 0
+    # a second search reuses the table
+    second = tictactoe.SearchStats()
+    minimax(board, cache, second)
+    assert second.nodes < first.nodes
+    assert second.transposition_hits > 0
+    assert cache.stats()['hits'] > 0
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()['hits'] == 0
+
+
+def test_bitboard_matches_lists():
+    values = exact_values()
+    for key, expected in values.items():
+        board = board_from_key(key)
+        x, o = bitboard.to_masks(board)
+        assert bitboard.to_board(x, o) == board
+        assert bitboard.player(board) == player(board)
+        assert bitboard.actions(board) == actions(board)
+        assert bitboard.winner(board) == winner(board)
+        assert bitboard.terminal(board) == terminal(board)
+        if terminal(board):
+            assert bitboard.utility(board) == utility(board)
+            assert bitboard.minimax(board) is None
+            continue
+        search = (bitboard.max_value
+                  if player(board) == X else bitboard.min_value)
+        assert search(x, o, -float('inf'), float('inf')) == expected
+        for action in actions(board):
+            assert bitboard.result(board, action) == result(board, action)
+
+
+def test_bitboard_minimax_is_optimal():
+    values = exact_values()
+    for key, expected in values.items():
+        board = board_from_key(key)
+        if terminal(board):
+            continue
+        child = result(board, bitboard.minimax(board))
+        assert values[tuple(cell for row in child for cell in row)] == expected
+
+
+def test_bitboard_result_valueerror(O_goes):
+    with pytest.raises(ValueError, match=r'\(0, 0\) not in action set.'):
+        bitboard.result(O_goes, (0, 0))
+
+
+def test_engine_benchmark():
+    boards = benchmark.positions(1)
+    assert len(boards) == 10
+    results = benchmark.measure(boards, repeat=1)
+    assert set(results) == {'lists', 'bitboard'}
+    assert all(result['nodes'] > 0 for result in results.values())
+
+
+def test_perfect_play_table(tmp_path):
+    table = solve.build_table()
+    assert len(table) == tictactoe.TABLE_SIZE
+    assert sum(entry != tictactoe.UNREACHABLE for entry in table) == 5478
+    path = tmp_path / 'perfect_play.bin'
+    path.write_bytes(table)
+    tictactoe.TABLE_FILE = str(path)
+
+    values = exact_values()
+    for key, expected in values.items():
+        board = board_from_key(key)
+        entry = table[tictactoe.board_index(board)]
+        assert (entry >> 4) - 1 == expected
+        if terminal(board):
+            assert entry & 0xF == tictactoe.NO_MOVE
+            continue
+        stats = tictactoe.SearchStats()
+        child = result(board, minimax(board, stats=stats))
+        assert values[tuple(cell for row in child for cell in row)] == expected
+        # lookups do not search
+        assert stats.nodes == 0
+        assert stats.table_hits == 1 and stats.elapsed > 0
+    # X takes the win at once rather than a slower one
+    board = [[X, X, EMPTY], [O, O, EMPTY], [EMPTY, EMPTY, EMPTY]]
+    assert minimax(board) == (0, 2)
+
+
+def test_perfect_play_table_missing(monkeypatch):
+    assert tictactoe.load_table() is None
+    assert tictactoe.missing_table == (tictactoe.TABLE_FILE, None)
+    board = [[X, X, EMPTY], [O, O, EMPTY], [EMPTY, EMPTY, EMPTY]]
+    stats = tictactoe.SearchStats()
+    # the miss is remembered, so the file is not opened on every move
+    with monkeypatch.context() as m:
+        m.setattr('builtins.open', None)
+        assert minimax(board, stats=stats) == (0, 2)
+    assert stats.nodes > 0 and stats.table_hits == 0
+
+    # a table written later is picked up, an invalid one is not
+    with open(tictactoe.TABLE_FILE, 'wb') as f:
+        f.write(b'truncated')
+    assert tictactoe.load_table() is None
+    with open(tictactoe.TABLE_FILE, 'wb') as f:
+        f.write(solve.build_table())
+    assert tictactoe.load_table() is not None
+    stats = tictactoe.SearchStats()
+    assert minimax(board, stats=stats) == (0, 2)
+    assert stats.nodes == 0 and stats.table_hits == 1
+
+
+def test_mnk_rules():
+    game = mnk.MNKGame(4, 5, 4)
+    board = game.initial_state()
+    assert len(board) == 4 and all(len(row) == 5 for row in board)
+    assert len(game.actions(board)) == 20
+    for action in [(0, 1), (0, 0), (1, 2), (1, 0), (2, 3), (2, 0), (3, 4)]:
+        board = game.result(board, action)
+    assert game.winner(board) == X
+    assert game.terminal(board)
+    assert game.utility(board) == 1
+    assert game.minimax(board) is None
+    with pytest.raises(ValueError):
+        mnk.MNKGame(3, 3, 4)
+
+
+def test_mnk_matches_perfect_play():
+    game = mnk.MNKGame()
+    values = exact_values()
+    for key in random.Random(0).sample(sorted(values, key=str), 200):
+        board = board_from_key(key)
+        if terminal(board):
+            continue
+        action, info = game.search(board, time_limit=10)
+        child = result(board, action)
+        assert values[tuple(cell for row in child
+                            for cell in row)] == values[key]
+    _, info = game.search(initial_state(), time_limit=10)
+    assert info['depth'] == 9 and info['value'] == 0
+
+
+def test_mnk_tactics():
+    game = mnk.MNKGame(5, 5, 4)
+    board = game.initial_state()
+    # X takes the open four, O blocks it when it is O's turn
+    for action in [(1, 1), (0, 4), (2, 2), (4, 0), (3, 3)]:
+        board = game.result(board, action)
+    assert game.minimax(board, time_limit=5) in {(0, 0), (4, 4)}
+    board = game.result(board, (0, 0))
+    assert game.minimax(board, time_limit=5) == (4, 4)
+
+
+def test_mnk_time_budget():
+    game = mnk.MNKGame(7, 7, 5, time_limit=0.2)
+    start = time.time()
+    action, info = game.search(game.initial_state())
+    assert time.time() - start < 1
+    assert action == (3, 3)
+    assert 1 <= info['depth'] < 49
+    assert game.stats.nodes == info['nodes'] and game.stats.cutoffs
+    # the best move of the deepest finished iteration is kept
+    action, info = game.search(game.initial_state(), max_depth=2)
+    assert info['depth'] == 2 and action in game.actions(
+        game.initial_state())
+
+
+def test_search_restores_board(X_goes):
+    board = [row[:] for row in X_goes]
+    assert tictactoe.max_value(board, -float('inf'), float('inf')) == 1
+    assert board == X_goes
+    assert minimax(board) is not None
+    assert board == X_goes
+    # result still copies and validates for callers outside the search
+    child = result(board, (1, 1))
+    assert board == X_goes and child[1][1] == X
+    with pytest.raises(ValueError):
+        result(board, (0, 0))
@@ -3,12 +3,53 @@ Tic Tac Toe Player
 """
 
 import copy
+import json
 import math
+import os
+import time
 
 X = "X"
 O = "O"
 EMPTY = None
-recursion_counter = 0
+
+# Bound types of transposition table values under alpha-beta pruning
+EXACT = "exact"
+LOWER = "lower"
+UPPER = "upper"
+
+# The 8 rotations and reflections of the board, as permutations of the
+# cells numbered 0 to 8 row by row: cell i of a transformed board is cell
+# SYMMETRIES[k][i] of the original
+SYMMETRIES = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),  # identity
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),  # rotate 90
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),  # rotate 180
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),  # rotate 270
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),  # mirror left-right
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),  # mirror top-bottom
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),  # transpose
+    (8, 5, 2, 7, 4, 1, 6, 3, 0),  # anti-transpose
+)
+
+# Digit of every cell value in a base-3 board key
+CELL_DIGITS = {EMPTY: 0, X: 1, O: 2}
+
+# Perfect-play table written by solve.py: one byte per base-3 board index
+# holding (value + 1) << 4 | cell of the optimal move, see board_index
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "perfect_play.bin")
+TABLE_SIZE = 3**9
+# Table entry of boards that cannot be reached in a game
+UNREACHABLE = 0xFF
+# Cell of table entries for finished games, which have no move
+NO_MOVE = 0xF
+
+# Contents of TABLE_FILE once loaded, see load_table
+perfect_play = None
+# (path, modification time) of the table file last found missing or
+# invalid, the time being None for a missing file, so it is only opened
+# again once it changes
+missing_table = None
 
 
 def initial_state() -> list:
@@ -166,68 +207,368 @@ def utility(board: list) -> int:
         return 0
 
 
-def min_value(board: list, alpha: int, beta: int) -> int:
+def board_index(board: list) -> int:
+    """Returns the board read as a base-3 number, cell (i, j) being digit
+    3 * i + j.
+
+    Args:
+        board (list): List of lists containing the current game board.
+
+    Returns:
+        int: Index from 0 to 3**9 - 1.
+    """
+    cells = [CELL_DIGITS[val] for row in board for val in row]
+    return sum(cell * 3**i for i, cell in enumerate(cells))
+
+
+def load_table(path: str = None) -> bytes:
+    """Loads the perfect-play table written by solve.py.
+
+    The table is read once and kept in perfect_play. A missing or invalid
+    file is remembered in missing_table and only opened again once it is
+    created or modified, for example by running solve.py.
+
+    Args:
+        path (str, optional): Table file. Defaults to TABLE_FILE.
+
+    Returns:
+        bytes: The table, or None if there is no valid table file.
+    """
+    global perfect_play, missing_table
+    path = path or TABLE_FILE
+    if perfect_play is None:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if missing_table == (path, mtime):
+            return None
+        try:
+            with open(path, "rb") as f:
+                table = f.read()
+        except FileNotFoundError:
+            missing_table = (path, None)
+            return None
+        if len(table) != TABLE_SIZE:
+            missing_table = (path, mtime)
+            return None
+        perfect_play = table
+    return perfect_play
+
+
+def canonical_key(board: list) -> int:
+    """Returns a key shared by a board and all its rotations and reflections.
+
+    Every symmetric variant is read as a base-3 number and the smallest one
+    is the key, so positions that only differ by symmetry share one
+    transposition table entry.
+
+    Args:
+        board (list): List of lists containing the current game board.
+
+    Returns:
+        int: Canonical key of the board.
+    """
+    cells = [CELL_DIGITS[val] for row in board for val in row]
+    return min(
+        sum(cells[cell] * 3**i for i, cell in enumerate(symmetry))
+        for symmetry in SYMMETRIES)
+
+
+class TranspositionTable():
+    def __init__(self) -> None:
+        """Values of searched positions, shared across searches.
+
+        Values are stored with their bound type, since alpha-beta returns a
+        value that is only exact when it fell inside the search window:
+        a value at or above beta is a lower bound (LOWER) and one at or
+        below alpha is an upper bound (UPPER). Positions that are
+        symmetric share an entry, which is safe because the value of a
+        position does not depend on its orientation.
+        """
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        # hits that answered a node without searching it
+        self.cutoffs = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, board: list) -> tuple:
+        """Returns the (value, bound) stored for a board, or None.
+
+        Args:
+            board (list): List of lists containing the current game board.
+
+        Returns:
+            tuple: (value, bound type), or None if the board was never
+            stored.
+        """
+        entry = self.entries.get(canonical_key(board))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, board: list, value: int, bound: str) -> None:
+        """Stores the value of a board.
+
+        Args:
+            board (list): List of lists containing the current game board.
+            value (int): Value returned by the search.
+            bound (str): EXACT, LOWER or UPPER.
+        """
+        self.entries[canonical_key(board)] = (value, bound)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.cutoffs = 0
+
+    def stats(self) -> dict:
+        """Returns the entry count, hits, misses, cutoffs and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "cutoffs": self.cutoffs,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class SearchStats():
+    def __init__(self) -> None:
+        """Counters filled in by a search, in place of printing a node count.
+
+        Pass one to minimax to record what the search did. Counts add up
+        over every search the object is passed to, so a single SearchStats
+        can also profile a whole game.
+        """
+        self.nodes = 0
+        # alpha-beta cutoffs by the depth of the node that was cut off,
+        # the root's children being depth 1
+        self.cutoffs = {}
+        self.terminals = 0
+        self.transposition_hits = 0
+        # moves answered by the perfect-play table without searching
+        self.table_hits = 0
+        self.elapsed = 0.0
+
+    def cutoff(self, depth: int) -> None:
+        """Records an alpha-beta cutoff at a depth."""
+        self.cutoffs[depth] = self.cutoffs.get(depth, 0) + 1
+
+    def as_dict(self) -> dict:
+        """Returns the counters, with cutoffs sorted by depth."""
+        return {
+            "nodes": self.nodes,
+            "cutoffs": dict(sorted(self.cutoffs.items())),
+            "terminals": self.terminals,
+            "transposition_hits": self.transposition_hits,
+            "table_hits": self.table_hits,
+            "elapsed": self.elapsed
+        }
+
+    def to_json(self, **kwargs) -> str:
+        """Returns the counters as a JSON string.
+
+        Args:
+            **kwargs: Passed on to json.dumps, e.g. indent.
+        """
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+def _probe(cache: TranspositionTable,
+           board: list,
+           alpha: int,
+           beta: int,
+           stats: SearchStats = None) -> tuple:
+    """Narrows a search window with a transposition table entry.
+
+    Returns:
+        tuple: (value, alpha, beta). value is not None if the entry settles
+        the node, in which case it is the node's value.
+    """
+    entry = cache.lookup(board)
+    if entry is None:
+        return None, alpha, beta
+    if stats is not None:
+        stats.transposition_hits += 1
+    value, bound = entry
+    if bound == EXACT:
+        cache.cutoffs += 1
+        return value, alpha, beta
+    if bound == LOWER:
+        alpha = max(alpha, value)
+    else:
+        beta = min(beta, value)
+    if alpha >= beta:
+        cache.cutoffs += 1
+        return value, alpha, beta
+    return None, alpha, beta
+
+
+def _bound(value: int, alpha: int, beta: int) -> str:
+    """Returns the bound type of a value searched with window (alpha, beta)."""
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+def _make(board: list, action: tuple, mark: str) -> None:
+    """Plays a move in place, without the validation of result.
+
+    Only for moves the search generated itself with actions, which are
+    always on empty cells. Undo it with _unmake.
+    """
+    board[action[0]][action[1]] = mark
+
+
+def _unmake(board: list, action: tuple) -> None:
+    """Takes back a move played with _make."""
+    board[action[0]][action[1]] = EMPTY
+
+
+def min_value(board: list,
+              alpha: int,
+              beta: int,
+              cache: TranspositionTable = None,
+              stats: SearchStats = None,
+              depth: int = 1) -> int:
     """Min player's function to determine the value of the current board state.
 
+    Moves are played on the board in place and taken back, so the board is
+    modified during the search but restored before this returns.
+
     Args:
         board (list): List of lists containing the current game board.
         alpha (int): The value of the best choice found so far for the max 
         player.
         beta (int): The value of the best choice found so far for the min 
         player.
+        cache (TranspositionTable, optional): Table of positions already
+        searched. Defaults to None.
+        stats (SearchStats, optional): Counters to record the search in.
+        Defaults to None.
+        depth (int, optional): Moves made since the root. Defaults to 1.
 
     Returns:
         int: Value of the current board state.
     """
-    #recording metrics
-    global recursion_counter
-    recursion_counter += 1
+    if stats is not None:
+        stats.nodes += 1
 
     if terminal(board):
+        if stats is not None:
+            stats.terminals += 1
         return utility(board)
+    if cache is not None:
+        value, alpha, beta = _probe(cache, board, alpha, beta, stats)
+        if value is not None:
+            return value
+    alpha_original, beta_original = alpha, beta
     value = float('inf')
     for action in actions(board):
-        value = min(value, max_value(result(board, action), alpha, beta))
+        _make(board, action, O)
+        try:
+            value = min(
+                value,
+                max_value(board, alpha, beta, cache, stats, depth + 1))
+        finally:
+            _unmake(board, action)
         if value <= alpha:
-            return value
+            if stats is not None:
+                stats.cutoff(depth)
+            break
         beta = min(beta, value)
+    if cache is not None:
+        cache.store(board, value, _bound(value, alpha_original,
+                                         beta_original))
     return value
 
 
-def max_value(board: list, alpha: int, beta: int) -> int:
+def max_value(board: list,
+              alpha: int,
+              beta: int,
+              cache: TranspositionTable = None,
+              stats: SearchStats = None,
+              depth: int = 1) -> int:
     """Max player's function to determine the value of the current board state.
 
+    Moves are played on the board in place and taken back, so the board is
+    modified during the search but restored before this returns.
+
     Args:
         board (list): List of lists containing the current game board.
         alpha (int): The value of the best choice found so far for the max 
         player.
         beta (int): The value of the best choice found so far for the min 
         player.
+        cache (TranspositionTable, optional): Table of positions already
+        searched. Defaults to None.
+        stats (SearchStats, optional): Counters to record the search in.
+        Defaults to None.
+        depth (int, optional): Moves made since the root. Defaults to 1.
 
     Returns:
         int: Value of the current board state.
     """
-    # recording metrics
-    global recursion_counter
-    recursion_counter += 1
+    if stats is not None:
+        stats.nodes += 1
 
     if terminal(board):
+        if stats is not None:
+            stats.terminals += 1
         return utility(board)
+    if cache is not None:
+        value, alpha, beta = _probe(cache, board, alpha, beta, stats)
+        if value is not None:
+            return value
+    alpha_original, beta_original = alpha, beta
     value = -float('inf')
     for action in actions(board):
-        value = max(value, min_value(result(board, action), alpha, beta))
+        _make(board, action, X)
+        try:
+            value = max(
+                value,
+                min_value(board, alpha, beta, cache, stats, depth + 1))
+        finally:
+            _unmake(board, action)
         if value >= beta:
-            return value
+            if stats is not None:
+                stats.cutoff(depth)
+            break
         alpha = max(alpha, value)
+    if cache is not None:
+        cache.store(board, value, _bound(value, alpha_original,
+                                         beta_original))
     return value
 
 
-def minimax(board: int) -> tuple:
+def minimax(board: int,
+            cache: TranspositionTable = None,
+            stats: SearchStats = None) -> tuple:
     """Returns the optimal action for the current player on the board. This
     function uses Alpha-Beta pruning to reduce computation.
 
+    When the perfect-play table built by solve.py is available the move is
+    looked up in it instead, without searching.
+
     Args:
         board (int): List of lists containing the current game board.
+        cache (TranspositionTable, optional): Table of positions already
+        searched, which can be reused across moves and games. Defaults to
+        None.
+        stats (SearchStats, optional): Counters to add this search's nodes,
+        cutoffs, terminal evaluations, transposition hits and time to. A
+        move looked up in the perfect-play table adds a table hit instead.
+        Defaults to None.
 
     Returns:
         tuple: Best action (i, j) for the current player.
@@ -235,38 +576,49 @@ def minimax(board: int) -> tuple:
     if terminal(board):
         return None
 
+    start = time.perf_counter()
+    table = load_table()
+    if table is not None:
+        entry = table[board_index(board)]
+        if entry != UNREACHABLE:
+            if stats is not None:
+                stats.table_hits += 1
+                stats.elapsed += time.perf_counter() - start
+            return divmod(entry & NO_MOVE, 3)
+
     # whose turn is it?
     current_player = player(board)
+    # the search plays and takes back moves on its own copy of the board
+    board = copy.deepcopy(board)
 
-    # recording metrics
-    global recursion_counter
     if current_player == X:
-        max_action = None
+        best_action = None
         max_utility = -float('inf')
         for action in actions(board):
-            action_utility = min_value(result(board, action), -float('inf'),
-                                       float('inf'))
+            _make(board, action, X)
+            action_utility = min_value(board, -float('inf'), float('inf'),
+                                       cache, stats)
+            _unmake(board, action)
             if action_utility > max_utility:
-                max_action = action
+                best_action = action
                 max_utility = action_utility
-        # recording metrics
-        print(recursion_counter)
-        recursion_counter = 0
-        return max_action
     else:
-        min_action = None
+        best_action = None
         min_utility = float('inf')
         for action in actions(board):
-            action_utility = max_value(result(board, action), -float('inf'),
-                                       float('inf'))
+            _make(board, action, O)
+            action_utility = max_value(board, -float('inf'), float('inf'),
+                                       cache, stats)
+            _unmake(board, action)
             if action_utility < min_utility:
-                min_action = action
+                best_action = action
                 min_utility = action_utility
-        # recording metrics
-        print(recursion_counter)
-        recursion_counter = 0
-        return min_action
+    if stats is not None:
+        stats.elapsed += time.perf_counter() - start
+    return best_action
 
 
 if __name__ == '__main__':
-    minimax(initial_state())
\ No newline at end of file
+    stats = SearchStats()
+    minimax(initial_state(), stats=stats)
+    print(stats.to_json(indent=2))